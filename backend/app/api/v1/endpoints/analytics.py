@@ -0,0 +1,56 @@
+"""Analytics page endpoints, answered from the in-memory snapshot."""
+from datetime import datetime, timezone
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.schemas.schemas import AnalyticsMetrics, CoverageResponse, FundingTrendResponse
+from app.services.analytics import Scope, analytics_snapshot
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def analytics_scope(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    country: Optional[str] = None,
+    region: Optional[str] = None,
+    community_id: Optional[int] = None,
+    campaign_id: Optional[int] = None
+) -> Scope:
+    """Filters: donations created in [start, end), and campaigns in the given place."""
+    start, end = _naive_utc(start), _naive_utc(end)
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    return Scope(start, end, country, region, community_id, campaign_id)
+
+
+@router.get("/metrics", response_model=AnalyticsMetrics)
+def get_analytics_metrics(scope: Scope = Depends(analytics_scope)):
+    """Headline KPIs: funding, donors, campaigns, beneficiaries and success rate."""
+    return analytics_snapshot.dashboard(scope)
+
+
+@router.get("/coverage", response_model=CoverageResponse)
+def get_coverage(
+    group_by: Literal["community", "country", "region"] = "community",
+    scope: Scope = Depends(analytics_scope)
+):
+    """Campaigns, beneficiaries and completed funding per community, country or region."""
+    return analytics_snapshot.coverage(group_by, scope)
+
+
+@router.get("/funding-trends", response_model=FundingTrendResponse)
+def get_funding_trends(
+    interval: Literal["day", "week", "month"] = "month",
+    scope: Scope = Depends(analytics_scope)
+):
+    """Completed funding, donations and distinct donors per day, week or month."""
+    return analytics_snapshot.funding_trend(interval, scope)
@@ -0,0 +1,136 @@
+"""Authentication endpoints."""
+from datetime import timedelta
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_db
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.security import (
+    create_access_token, get_current_user, get_current_user_id,
+    get_password_hash_async, revoke_token, security, verify_password_async
+)
+from app.models.models import User, UserRole
+from app.schemas.schemas import LoginRequest, RegisterRequest, TokenResponse, UserResponse
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+# These handlers are async so that bcrypt waits on the dedicated hashing pool
+# instead of holding a worker of the threadpool that serves sync endpoints.
+# Database calls are short and are pushed to that threadpool explicitly.
+
+
+def _token_response(user: User) -> TokenResponse:
+    expires = timedelta(minutes=settings.access_token_expire_minutes)
+    token = create_access_token(
+        {"sub": str(user.id), "role": user.role.value if user.role else None},
+        expires_delta=expires
+    )
+    return TokenResponse(
+        access_token=token,
+        expires_in=int(expires.total_seconds()),
+        user=UserResponse.model_validate(user)
+    )
+
+
+def _get_user_by_email(db: Session, email: str) -> User:
+    """
+    Load a user and hand the connection back to the pool, so a request
+    waiting on bcrypt does not hold a pooled connection other routes need.
+    """
+    user = db.query(User).filter(User.email == email).first()
+    db.close()
+    return user
+
+
+@router.post("/login", response_model=TokenResponse)
+async def login(
+    credentials: LoginRequest,
+    db: Session = Depends(get_db)
+):
+    """Exchange email and password for an access token."""
+    user = await run_in_threadpool(_get_user_by_email, db, credentials.email)
+    valid = await verify_password_async(
+        credentials.password,
+        user.hashed_password if user else None
+    )
+    if not user or not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+        )
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Account is disabled",
+        )
+    return _token_response(user)
+
+
+@router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
+async def register(
+    registration: RegisterRequest,
+    db: Session = Depends(get_db)
+):
+    """Create a donor account and return an access token."""
+    existing = await run_in_threadpool(_get_user_by_email, db, registration.email)
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        )
+
+    hashed_password = await get_password_hash_async(registration.password)
+
+    def _create() -> User:
+        user = User(
+            email=registration.email,
+            full_name=registration.name,
+            hashed_password=hashed_password,
+            role=UserRole.DONOR,
+            is_active=True,
+        )
+        db.add(user)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return None
+        db.refresh(user)
+        return user
+
+    user = await run_in_threadpool(_create)
+    if user is None:
+        # Lost a race with a concurrent registration of the same email
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        )
+    return _token_response(user)
+
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """Issue a fresh access token for the bearer of a valid one."""
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.id == user_id).first()
+    )
+    if not user or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+        )
+    return _token_response(user)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(get_current_user)
+):
+    """Revoke the bearer token for the rest of its lifetime."""
+    revoke_token(credentials.credentials, current_user["payload"])
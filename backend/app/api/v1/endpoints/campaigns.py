@@ -1,25 +1,48 @@
 """Campaign endpoints."""
-from typing import List
+from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models.models import Campaign, CampaignStatus
-from app.schemas.schemas import CampaignCreate, CampaignUpdate, CampaignResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session, joinedload
+from app.api.v1.params import id_list, list_limit
+from app.core.database import get_db, get_read_db
+from app.core.security import get_current_user, get_current_user_id
+from app.models.models import Campaign, CampaignStatus, UserRole
+from app.schemas.schemas import (
+    CampaignCreate, CampaignUpdate, CampaignResponse,
+    CampaignSearchResponse, CampaignSearchResult,
+    CampaignBulkRequest, CampaignBulkResponse, CampaignWithCommunityResponse
+)
+from app.services.campaign_ops import apply_bulk_action
+from app.services.search import campaign_search
 
 router = APIRouter(prefix="/campaigns", tags=["campaigns"])
 
 
+def _in_request_order(rows, ids: List[int]) -> list:
+    """Rows for `ids` in the order requested; unknown ids are left out."""
+    by_id = {row.id: row for row in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+
 @router.get("", response_model=List[CampaignResponse])
 def list_campaigns(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Depends(list_limit),
     status_filter: str = None,
-    db: Session = Depends(get_db)
+    ids: Optional[List[int]] = Depends(id_list),
+    db: Session = Depends(get_read_db)
 ):
-    """List all campaigns with optional filtering."""
+    """
+    List all campaigns with optional filtering.
+    With `ids`, return those campaigns in the order given; views are not counted.
+    """
     query = db.query(Campaign)
     
+    if ids is not None:
+        if status_filter:
+            query = query.filter(Campaign.status == status_filter)
+        return _in_request_order(query.filter(Campaign.id.in_(ids)).all(), ids)
+    
     if status_filter:
         query = query.filter(Campaign.status == status_filter)
     
@@ -43,6 +66,64 @@ def create_campaign(
     return db_campaign
 
 
+@router.get("/search", response_model=CampaignSearchResponse)
+def search_campaigns(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    status_filter: str = None,
+    db: Session = Depends(get_read_db)
+):
+    """Full-text search over campaign title, description and story, best match first."""
+    campaign_status = None
+    if status_filter:
+        try:
+            campaign_status = CampaignStatus(status_filter)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown status: {status_filter}"
+            )
+    
+    total, hits = campaign_search.search(db, q, skip, limit, campaign_status)
+    return CampaignSearchResponse(
+        query=q,
+        total=total,
+        skip=skip,
+        limit=limit,
+        results=[
+            CampaignSearchResult(
+                **CampaignResponse.model_validate(campaign).model_dump(),
+                score=score
+            )
+            for campaign, score in hits
+        ]
+    )
+
+
+@router.get("/batch", response_model=List[CampaignWithCommunityResponse])
+def get_campaigns_with_communities(
+    ids: Optional[List[int]] = Depends(id_list),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Campaigns by id with their community embedded, in the order given.
+    Served by one query joining communities; views are not counted.
+    """
+    if not ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids is required"
+        )
+    campaigns = (
+        db.query(Campaign)
+        .options(joinedload(Campaign.community))
+        .filter(Campaign.id.in_(ids))
+        .all()
+    )
+    return _in_request_order(campaigns, ids)
+
+
 @router.get("/{campaign_id}", response_model=CampaignResponse)
 def get_campaign(
     campaign_id: int,
@@ -81,7 +162,7 @@ def update_campaign(
     for key, value in update_data.items():
         setattr(campaign, key, value)
     
-    campaign.updated_at = datetime.utcnow()
+    campaign.updated_at = campaign.content_updated_at = datetime.utcnow()
     db.commit()
     db.refresh(campaign)
     return campaign
@@ -107,13 +188,43 @@ def publish_campaign(
         )
     
     campaign.status = CampaignStatus.ACTIVE
-    campaign.updated_at = datetime.utcnow()
+    campaign.updated_at = campaign.content_updated_at = datetime.utcnow()
     db.commit()
     db.refresh(campaign)
     
     return {"message": "Campaign published successfully", "campaign": campaign}
 
 
+@router.post("/bulk", response_model=CampaignBulkResponse)
+def bulk_campaign_action(
+    request: CampaignBulkRequest,
+    current_user: dict = Depends(get_current_user),
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Publish, pause, archive or delete many campaigns in one transaction.
+    NGO users may change their own organizations' campaigns; admins any.
+    """
+    role = current_user["payload"].get("role")
+    if role not in (UserRole.NGO.value, UserRole.ADMIN.value):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only NGO and admin accounts can manage campaigns"
+        )
+    
+    results = apply_bulk_action(
+        db, request.campaign_ids, request.action, user_id, role
+    )
+    succeeded = sum(1 for r in results if r["result"] in ("updated", "deleted"))
+    return CampaignBulkResponse(
+        action=request.action,
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
+
+
 @router.delete("/{campaign_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_campaign(
     campaign_id: int,
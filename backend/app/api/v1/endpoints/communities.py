@@ -1,8 +1,10 @@
 """Community endpoints."""
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.api.v1.params import id_list, list_limit
+from app.core.cache import community_cache
+from app.core.database import get_db, get_read_db
 from app.models.models import Community
 from app.schemas.schemas import CommunityCreate, CommunityUpdate, CommunityResponse
 
@@ -11,14 +13,22 @@ router = APIRouter(prefix="/communities", tags=["communities"])
 
 @router.get("", response_model=List[CommunityResponse])
 def list_communities(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Depends(list_limit),
     country: str = None,
-    db: Session = Depends(get_db)
+    ids: Optional[List[int]] = Depends(id_list),
+    db: Session = Depends(get_read_db)
 ):
-    """List all communities with optional filtering."""
+    """
+    List all communities with optional filtering.
+    With `ids`, return those communities in the order given.
+    """
     query = db.query(Community)
     
+    if ids is not None:
+        by_id = {community.id: community for community in query.filter(Community.id.in_(ids))}
+        return [by_id[i] for i in ids if i in by_id]
+    
     if country:
         query = query.filter(Community.country == country)
     
@@ -39,13 +49,32 @@ def create_community(
     return db_community
 
 
+@router.get("/priority", response_model=List[CommunityResponse])
+def list_priority_communities(
+    limit: int = Query(10, ge=1, le=100),
+    country: str = None,
+    region: str = None,
+    db: Session = Depends(get_read_db)
+):
+    """Communities with the highest need score, optionally within a country or region."""
+    query = db.query(Community).filter(Community.need_score.is_not(None))
+    
+    # Country, and country plus region, filters have indexes ending in need_score
+    if country:
+        query = query.filter(Community.country == country)
+    if region:
+        query = query.filter(Community.region == region)
+    
+    return query.order_by(Community.need_score.desc()).limit(limit).all()
+
+
 @router.get("/{community_id}", response_model=CommunityResponse)
 def get_community(
     community_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get a specific community by ID."""
-    community = db.query(Community).filter(Community.id == community_id).first()
+    community = community_cache.get(db, community_id)
     if not community:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,20 +1,29 @@
 """ML/Analytics endpoints."""
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.security import get_current_user_id
 from app.schemas.schemas import (
     DonorMatchRequest, DonorMatchResponse,
     ImpactPredictionRequest, ImpactPredictionResponse,
     StoryGenerationRequest, StoryGenerationResponse,
-    DashboardMetrics
+    DashboardMetrics, FundingForecastResponse, ImpactTotalsResponse,
+    DonationTrendPoint, DonationTrendResponse
 )
 from app.ml.predictor import DonorMatcher, ImpactPredictor, StoryGenerator
+from app.services import impact
+from app.services.archive import completed_donations, daily_totals
+from app.services.forecasts import forecast_campaigns
+from app.services.recommendations import recommendation_service
 
 router = APIRouter(prefix="/ml", tags=["machine-learning"])
 
 
 # Initialize ML components
-donor_matcher = DonorMatcher()
+donor_matcher = DonorMatcher(completed_donations)
 impact_predictor = ImpactPredictor()
 story_generator = StoryGenerator()
 
@@ -38,6 +47,19 @@ def match_donors(
         )
 
 
+@router.get("/recommendations", response_model=list[DonorMatchResponse])
+def get_recommendations(
+    limit: int = Query(10, ge=1, le=50),
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get the signed-in donor's precomputed campaign matches, best first.
+    Refreshed in the background by the recommendations job.
+    """
+    return recommendation_service.for_donor(db, user_id, limit)
+
+
 @router.post("/predict-impact", response_model=ImpactPredictionResponse)
 def predict_impact(
     request: ImpactPredictionRequest,
@@ -62,6 +84,30 @@ def predict_impact(
         )
 
 
+@router.get("/funding-forecast/{campaign_id}", response_model=FundingForecastResponse)
+def get_funding_forecast(
+    campaign_id: int,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Simulate the campaign's remaining days from its donation history.
+    Returns the probability of reaching the goal and P10/P50/P90 of the final amount.
+    """
+    forecast = forecast_campaigns(db, [campaign_id])
+    if not len(forecast.campaign_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campaign not found"
+        )
+    history = forecast.history
+    return FundingForecastResponse(
+        goal_amount=float(history.goal_amount[0]),
+        current_amount=float(history.current_amount[0]),
+        days_remaining=float(history.days_remaining[0]),
+        **forecast.as_dict(0)
+    )
+
+
 @router.post("/generate-story", response_model=StoryGenerationResponse)
 def generate_story(
     request: StoryGenerationRequest,
@@ -88,27 +134,91 @@ def generate_story(
 
 
 @router.get("/dashboard-metrics", response_model=DashboardMetrics)
-def get_dashboard_metrics(db: Session = Depends(get_db)):
+def get_dashboard_metrics(
+    verified_only: bool = Query(False, description="Count only verified impact metrics"),
+    db: Session = Depends(get_read_db)
+):
     """Get dashboard metrics and KPIs."""
-    from app.models.models import Community, Campaign, Donation, User
+    from app.models.models import Community, Campaign, Donation, DonationRollup
     
     total_communities = db.query(Community).count()
     active_campaigns = db.query(Campaign).filter(
         Campaign.status == "active"
     ).count()
-    total_funding = db.query(Donation).filter(
+    total_funding = db.query(func.sum(Donation.amount)).filter(
         Donation.status == "completed"
-    ).with_entities(
-        lambda: db.func.sum(Donation.amount)
     ).scalar() or 0
+    # Donations moved to the archive are counted from their daily rollups
+    total_funding += db.query(func.sum(DonationRollup.amount_sum)).filter(
+        DonationRollup.status == "completed"
+    ).scalar() or 0
+    # Maintained incrementally; no scan of impact_metrics
+    totals = impact.get_totals(db, verified_only=verified_only)
+    success_rate = impact.get_success_rate(db)
     
     return DashboardMetrics(
         total_communities=total_communities,
         active_campaigns=active_campaigns,
         total_funding=float(total_funding),
-        girls_helped=0,  # To be calculated from impact metrics
-        pads_distributed=0,  # To be calculated from impact metrics
-        avg_campaign_success_rate=0.72,  # Placeholder
+        girls_helped=int(totals.get("girls_helped", 0)),
+        pads_distributed=int(totals.get("pads_distributed", 0)),
+        avg_campaign_success_rate=success_rate or 0.0,
         top_donors=[],
         trending_campaigns=[]
     )
+
+
+@router.get("/impact-totals", response_model=ImpactTotalsResponse)
+def get_impact_totals(
+    campaign_id: Optional[int] = None,
+    community_id: Optional[int] = None,
+    verified_only: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    """Summed impact metrics for a campaign, a community, or the whole platform."""
+    if campaign_id is not None and community_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass campaign_id or community_id, not both"
+        )
+    if campaign_id is not None:
+        scope, scope_id = impact.CAMPAIGN, campaign_id
+    elif community_id is not None:
+        scope, scope_id = impact.COMMUNITY, community_id
+    else:
+        scope, scope_id = impact.GLOBAL, 0
+    
+    return ImpactTotalsResponse(
+        scope=scope,
+        scope_id=scope_id,
+        verified_only=verified_only,
+        totals=impact.get_totals(db, scope, scope_id, verified_only),
+        # Per-campaign success is not tracked; see the campaign itself
+        success_rate=None if scope == impact.CAMPAIGN else impact.get_success_rate(db, scope, scope_id)
+    )
+
+
+@router.get("/donation-trend", response_model=DonationTrendResponse)
+def get_donation_trend(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: Literal["day", "week", "month"] = "month",
+    campaign_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Completed donations per day, week or month in [start, end).
+    Archived history is read from its daily rollups, so old ranges cost no more than recent ones.
+    """
+    daily = daily_totals(db, start, end, campaign_id)
+    if not daily.empty:
+        rule = {"day": "D", "week": "W-MON", "month": "MS"}[interval]
+        daily = daily.resample(rule, label="left", closed="left").sum()
+    return DonationTrendResponse(
+        interval=interval,
+        campaign_id=campaign_id,
+        points=[
+            DonationTrendPoint(period=day.date(), donation_count=int(row.donation_count), amount=float(row.amount))
+            for day, row in daily.iterrows()
+        ]
+    )
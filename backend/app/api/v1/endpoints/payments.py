@@ -0,0 +1,60 @@
+"""Payment provider webhook endpoints."""
+import json
+from fastapi import APIRouter, HTTPException, Request, status
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.schemas.schemas import PaymentWebhookResponse
+from app.services.payments import (
+    IngestQueueFull, SignatureError, parse_event, payment_ingestor, verify_signature
+)
+
+router = APIRouter(prefix="/payments", tags=["payments"])
+
+
+@router.post("/webhook", response_model=PaymentWebhookResponse)
+async def payment_webhook(request: Request):
+    """
+    Receive a Stripe event.
+
+    Successful payments are recorded as donations. The response is sent once
+    the donation is committed; other event types are acknowledged and ignored.
+    """
+    if not settings.stripe_webhook_secret:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payment webhooks are not configured"
+        )
+
+    payload = await request.body()
+    try:
+        verify_signature(
+            payload,
+            request.headers.get("stripe-signature"),
+            settings.stripe_webhook_secret,
+            tolerance=settings.payment_webhook_tolerance_seconds
+        )
+        event = json.loads(payload)
+    except (SignatureError, ValueError) as exc:
+        metrics.inc(
+            "payment_webhook_events_total",
+            help_text="Payment webhook events by outcome.",
+            outcome="invalid"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc) if isinstance(exc, SignatureError) else "Invalid payload"
+        )
+
+    record = parse_event(event) if isinstance(event, dict) else None
+    if record is None:
+        return PaymentWebhookResponse(outcome="ignored")
+
+    try:
+        outcome = await payment_ingestor.submit(record)
+    except IngestQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payment ingestion is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    return PaymentWebhookResponse(outcome=outcome)
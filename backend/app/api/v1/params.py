@@ -0,0 +1,42 @@
+"""Shared query parameter dependencies."""
+from typing import List, Optional
+from fastapi import HTTPException, Query, status
+from app.core.config import settings
+
+
+def id_list(
+    ids: Optional[List[str]] = Query(
+        None,
+        description="Ids to fetch, comma-separated or repeated (?ids=1,2&ids=3)"
+    )
+) -> Optional[List[int]]:
+    """Parse `ids` into unique integers, keeping the order they were given in."""
+    if ids is None:
+        return None
+    parsed: List[int] = []
+    for value in ids:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                parsed.append(int(part))
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid id: {part}"
+                )
+    parsed = list(dict.fromkeys(parsed))
+    if len(parsed) > settings.multi_get_max_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.multi_get_max_ids} ids per request"
+        )
+    return parsed
+
+
+def list_limit(
+    limit: int = Query(100, ge=1, description="Page size; capped by the server")
+) -> int:
+    """Page size for list endpoints, capped at `settings.list_max_limit`."""
+    return min(limit, settings.list_max_limit)
@@ -0,0 +1,299 @@
+"""
+Process-local read-through cache of ORM rows, kept coherent across workers.
+
+`ModelCache.get` returns a detached copy of the row's columns. Copies are for
+reading; relationships are not loaded. A miss reads the row with `db.get` and
+stores its column values. Entries expire after `ttl` seconds as a safety net.
+
+ORM updates and deletes of the model are collected per session and
+invalidated when the session commits. With the "redis" backend, the ids are
+also published on a pub/sub channel, and every worker drops them from its
+own cache. A worker serves from its cache only while it is subscribed. When
+the subscription is (re)established, it clears the cache, because messages
+may have been missed while it was down. Writes made with Core statements
+must call `invalidate` or `invalidate_all` themselves. Invalidations are
+published from the commit hook; after a failed publish, the worker skips
+publishing for `retry_redis_after` seconds, so commits do not each wait out
+the Redis timeout while it is down.
+
+Rows read on a replica session are stored too, unless their key was
+invalidated within `replica_lag_seconds`: a lagging replica could still
+return the row from before that invalidation.
+
+Backends: "redis" (multiple workers), "local" (single process, no Redis) and
+"none" (every get reads the database).
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.models import Community
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """LRU cache of one model's rows by primary key."""
+
+    def __init__(
+        self,
+        model,
+        name: str,
+        backend: str = "local",
+        maxsize: int = 10_000,
+        ttl_seconds: float = 300.0,
+        redis_url: Optional[str] = None,
+        redis_timeout: float = 0.2,
+        retry_redis_after: float = 5.0,
+        replica_lag_seconds: float = 5.0
+    ):
+        if backend not in ("redis", "local", "none"):
+            raise ValueError(f"Unknown cache backend {backend!r}")
+        self.model = model
+        self.name = name
+        self.backend = backend
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self.redis_url = redis_url
+        self.redis_timeout = redis_timeout
+        self.retry_redis_after = retry_redis_after
+        self.replica_lag = replica_lag_seconds
+        self.channel = f"laafitech:cache:{name}"
+        self.node = uuid.uuid4().hex
+        self._mapper = inspect(model)
+        self._columns = [attr.key for attr in self._mapper.column_attrs]
+        self._entries: "OrderedDict[Any, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0  # bumped by every invalidation
+        # When keys, or the whole cache, were last invalidated, for replica reads
+        self._invalidated_at: Dict[Any, float] = {}
+        self._cleared_at = float("-inf")
+        self._publish_down_until = 0.0
+        self._subscribed = False
+        self._task: Optional[asyncio.Task] = None
+        self._publisher = None
+        self._session_key = f"cache_invalidations:{name}"
+        if backend != "none":
+            self._register_events()
+
+    @property
+    def active(self) -> bool:
+        """Whether entries may be served; a Redis cache needs its subscription."""
+        return self.backend == "local" or (self.backend == "redis" and self._subscribed)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _count(self, result: str) -> None:
+        metrics.inc(
+            "cache_requests_total",
+            help_text="Cache lookups by result (hit, miss, bypass).",
+            cache=self.name, result=result
+        )
+
+    def get(self, db: Session, key: Any):
+        """The row with primary key `key`, or None."""
+        if key is None:
+            return None
+        if not self.active:
+            self._count("bypass")
+            return db.get(self.model, key)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                values = entry[1]
+            else:
+                values = None
+            version = self._version
+        if values is not None:
+            self._count("hit")
+            return self._build(values)
+
+        self._count("miss")
+        row = db.get(self.model, key)
+        if row is not None:
+            replica = bool(db.info.get("replica"))
+            values = {name: getattr(row, name) for name in self._columns}
+            with self._lock:
+                # Skip the store if an invalidation ran while we were reading,
+                # or if a lagging replica could predate a recent one
+                if version == self._version and not (replica and self._recently_invalidated(key)):
+                    self._entries[key] = (now + self.ttl, values)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+            self._gauge()
+        return row
+
+    def _recently_invalidated(self, key: Any) -> bool:
+        since = time.monotonic() - self.replica_lag
+        return self._cleared_at > since or self._invalidated_at.get(key, since) > since
+
+    def _build(self, values: Dict[str, Any]):
+        instance = self._mapper.class_manager.new_instance()
+        for name, value in values.items():
+            set_committed_value(instance, name, value)
+        return instance
+
+    def _gauge(self) -> None:
+        metrics.set(
+            "cache_entries", len(self._entries),
+            help_text="Entries held in each process-local cache.",
+            cache=self.name
+        )
+
+    def _drop(self, keys: Optional[Iterable[Any]], source: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._version += 1
+            if keys is None:
+                self._entries.clear()
+                self._invalidated_at.clear()
+                self._cleared_at = now
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+                    self._invalidated_at[key] = now
+                # Marks older than the replica lag no longer hold back replica reads
+                expired = now - self.replica_lag
+                for key in [k for k, at in self._invalidated_at.items() if at <= expired]:
+                    del self._invalidated_at[key]
+        metrics.inc(
+            "cache_invalidations_total",
+            help_text="Cache invalidations applied, by origin.",
+            cache=self.name, source=source
+        )
+        self._gauge()
+
+    def invalidate(self, keys: Iterable[Any]) -> None:
+        """Drop `keys` here and, with Redis, in every other worker."""
+        keys = list(keys)
+        if not keys or self.backend == "none":
+            return
+        self._drop(keys, "local")
+        self._publish({"keys": keys})
+
+    def invalidate_all(self) -> None:
+        if self.backend == "none":
+            return
+        self._drop(None, "local")
+        self._publish({"all": True})
+
+    def _publish(self, message: Dict[str, Any]) -> None:
+        if self.backend != "redis":
+            return
+        if time.monotonic() < self._publish_down_until:
+            self._count_publish_skip()
+            return
+        try:
+            if self._publisher is None:
+                import redis
+
+                self._publisher = redis.Redis.from_url(
+                    self.redis_url,
+                    socket_timeout=self.redis_timeout,
+                    socket_connect_timeout=self.redis_timeout,
+                )
+            self._publisher.publish(self.channel, json.dumps({**message, "origin": self.node}))
+        except Exception as exc:
+            # Other workers catch up when their entries expire
+            self._publish_down_until = time.monotonic() + self.retry_redis_after
+            self._count_publish_skip()
+            logger.warning("Could not publish %s cache invalidation: %s", self.name, exc)
+
+    def _count_publish_skip(self) -> None:
+        metrics.inc(
+            "cache_publish_failures_total",
+            help_text="Cache invalidations not published to other workers.",
+            cache=self.name
+        )
+
+    async def start(self) -> None:
+        """Subscribe to invalidations from other workers (Redis backend only)."""
+        if self.backend == "redis" and self._task is None:
+            self._task = asyncio.create_task(self._listen(), name=f"cache:{self.name}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._subscribed = False
+
+    async def _listen(self) -> None:
+        import redis.asyncio as redis
+
+        delay = 0.5
+        while True:
+            client = redis.from_url(self.redis_url, socket_connect_timeout=self.redis_timeout)
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        # Anything published while we were away is lost
+                        self._drop(None, "resubscribe")
+                        self._subscribed = True
+                        delay = 0.5
+                    elif message["type"] == "message":
+                        data = json.loads(message["data"])
+                        if data.get("origin") != self.node:
+                            self._drop(None if data.get("all") else data.get("keys", []), "remote")
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("%s cache subscription lost: %s", self.name, exc)
+            finally:
+                self._subscribed = False
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _register_events(self) -> None:
+        def collect(mapper, connection, target) -> None:
+            session = object_session(target)
+            if session is not None:
+                key = self._mapper.primary_key_from_instance(target)
+                session.info.setdefault(self._session_key, set()).add(
+                    key[0] if len(key) == 1 else tuple(key)
+                )
+
+        def committed(session: Session) -> None:
+            keys = session.info.pop(self._session_key, None)
+            if keys:
+                self.invalidate(keys)
+
+        event.listen(self.model, "after_update", collect)
+        event.listen(self.model, "after_delete", collect)
+        # Keys from rolled-back flushes stay queued; dropping them later is harmless
+        event.listen(Session, "after_commit", committed)
+
+
+community_cache = ModelCache(
+    Community,
+    "communities",
+    backend=settings.community_cache_backend,
+    maxsize=settings.community_cache_size,
+    ttl_seconds=settings.community_cache_ttl_seconds,
+    redis_url=settings.redis_url,
+    redis_timeout=settings.cache_redis_timeout_ms / 1000.0,
+    replica_lag_seconds=settings.read_your_writes_seconds,
+)
@@ -12,18 +12,87 @@ class Settings(BaseSettings):
     
     # API
     api_v1_prefix: str = "/api/v1"
+    multi_get_max_ids: int = 200  # ids accepted by ?ids= multi-get requests
+    list_max_limit: int = 100  # larger ?limit= values on list endpoints are capped to this
     
     # Database
     database_url: str
     database_echo: bool = False
+    database_replica_url: Optional[str] = None  # read-only GET endpoints are routed here when set
+    database_replica_retry_seconds: float = 30.0  # primary-only period after a replica error
+    read_your_writes_seconds: int = 5  # reads stay on the primary this long after a client writes
+    
+    # SQL profiling (debug): per-request statement grouping and N+1 detection
+    sql_profiling_enabled: bool = False
+    sql_slow_query_ms: float = 100.0
+    sql_repeat_threshold: int = 3
+    
+    # Overload protection: statement time budgets by route template under
+    # api_v1_prefix (ms, 0 = none) and requests served at once before new
+    # ones get 503 (0 = unlimited)
+    statement_timeout_ms: int = 5000
+    statement_timeout_routes: dict = {
+        "/ml/dashboard-metrics": 15000,
+        "/ml/impact-totals": 15000,
+        "/ml/funding-forecast/{campaign_id}": 15000,
+        "/ml/donation-trend": 15000,
+        "/campaigns/search": 10000,
+    }
+    max_in_flight_requests: int = 256
     
     # Redis
     redis_url: str = "redis://localhost:6379/0"
     
+    # Community cache: process-local, invalidated over Redis pub/sub (redis, local or none)
+    community_cache_backend: str = "redis"
+    community_cache_size: int = 10000
+    community_cache_ttl_seconds: float = 300.0  # bounds staleness if an invalidation is lost
+    cache_redis_timeout_ms: int = 200
+    
+    # Rate limiting: token buckets per client and per client+route ("count/period")
+    rate_limit_enabled: bool = True
+    rate_limit_default: str = "300/minute"
+    rate_limit_routes: dict = {
+        "/api/v1/ml/match-donors": "30/minute",
+        "/api/v1/ml/generate-story": "10/minute",
+    }
+    rate_limit_use_redis: bool = True  # falls back to in-process buckets when unreachable
+    rate_limit_redis_timeout_ms: int = 50
+    rate_limit_local_max_keys: int = 100000
+    rate_limit_trust_forwarded: bool = False
+    
+    # Background jobs: run on the worker holding the leader lock (redis, database or none)
+    scheduler_enabled: bool = True
+    scheduler_leader_lock: str = "redis"
+    # Redis unreachable at startup: use the PostgreSQL advisory lock instead.
+    # Other databases have no fallback; the worker waits for Redis as a follower
+    scheduler_lock_fallback: bool = False
+    scheduler_lock_ttl_seconds: float = 30.0
+    scheduler_tick_seconds: float = 5.0
+    campaign_expiry_interval_seconds: float = 300.0
+    recommendations_interval_seconds: float = 900.0
+    impact_totals_rebuild_interval_seconds: float = 86400.0  # corrects drift in incremental totals
+    need_score_interval_seconds: float = 3600.0  # rescoring of communities written outside the ORM
+    funding_forecast_interval_seconds: float = 3600.0  # refreshes Campaign.predicted_funding
+    donation_archive_interval_seconds: float = 86400.0
+    
+    # Community need score: weighted mean of 0-1 components (see app/services/priority.py)
+    need_score_weights: dict = {
+        "poverty": 0.35,
+        "menstrual_health": 0.3,
+        "school_enrollment": 0.15,
+        "girls": 0.2,
+    }
+    need_score_girls_scale: int = 10000  # girls_count that scores 1.0 on the girls component
+    
     # Security
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    token_cache_size: int = 10000  # verified JWT payloads kept in memory; 0 disables
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64  # queued hash jobs before auth returns 503
     
     # CORS
     cors_origins: list = ["http://localhost:3000", "http://localhost:8000"]
@@ -44,11 +113,50 @@ class Settings(BaseSettings):
     # ML Models
     ml_models_path: str = "./ml-models"
     predict_endpoint: str = "http://localhost:5000"
+    recommendations_top_n: int = 10  # precomputed matches kept per donor
+    recommendations_batch_size: int = 1000  # donors refreshed per transaction
+    collaborative_neighbours: int = 50  # similar campaigns kept per campaign
+    collaborative_weight: float = 0.3  # share of the match score from similar donors
+    ann_enabled: bool = True  # retrieve match candidates from the campaign IVF index
+    ann_min_campaigns: int = 2000  # below this, every active campaign is scored
+    ann_candidates: int = 200  # campaigns retrieved per donor for exact re-ranking
+    ann_probe: int = 8  # IVF lists scanned per query
+    
+    # Donation archive: history past the cutoff moves to month-partitioned Parquet files
+    donation_archive_enabled: bool = False
+    donation_archive_path: str = "./archive/donations"  # shared storage when workers run on several hosts
+    donation_archive_after_days: int = 730
+    donation_archive_batch_size: int = 50000
+    donation_archive_compression: str = "zstd"
+    
+    # Analytics snapshot: per-worker columnar copy of donations, campaigns and communities
+    analytics_snapshot_max_age_seconds: float = 60.0  # older snapshots are refreshed by the next request
+    analytics_snapshot_overlap_seconds: float = 300.0  # re-read behind each high-water mark for late commits
+    analytics_snapshot_reload_seconds: float = 3600.0  # full rebuild; picks up deletes and status changes
+    
+    # Funding forecast: Monte Carlo trajectories per campaign, shrinkage toward platform priors
+    forecast_simulations: int = 2000
+    forecast_prior_days: float = 14.0  # pseudo-days of the platform donation rate
+    forecast_prior_donations: float = 2.0  # pseudo-donations of the platform amount distribution
+    forecast_priors_ttl_seconds: float = 3600.0  # workers other than the leader refit their priors this often
+    
+    # Monitoring
+    metrics_enabled: bool = True
+    metrics_latency_buckets: list = [
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+    ]
     
     # External APIs
     stripe_api_key: Optional[str] = None
     stripe_webhook_secret: Optional[str] = None
     
+    # Payment webhooks: verified events are committed in micro-batches
+    payment_webhook_batch_size: int = 200
+    payment_webhook_flush_ms: float = 50.0  # longest wait for a batch to fill
+    payment_webhook_max_pending: int = 5000  # queued events before the webhook returns 503
+    payment_webhook_seen_size: int = 100000  # committed transaction ids kept for deduplication
+    payment_webhook_tolerance_seconds: int = 300  # accepted signature age
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
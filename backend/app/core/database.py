@@ -1,6 +1,37 @@
+"""
+Database engines and session dependencies.
+
+Writes and anything that must see them use `get_db`, which always talks to
+the primary. Read-only endpoints use `get_read_db`, which is routed to the
+replica at DATABASE_REPLICA_URL when one is configured. Reads go to the
+primary instead when:
+
+- the client wrote recently. Unsafe requests through `get_db` set a short
+  read-your-writes cookie, so replication lag cannot hide the client's own
+  changes. Clients may also send `X-Read-Your-Writes: 1`.
+- the replica is unreachable. It is then skipped for
+  DATABASE_REPLICA_RETRY_SECONDS before being tried again.
+
+Both dependencies give their session the statement time budget of the
+route being served (see app/core/overload.py).
+"""
+import logging
+import time
+from typing import Optional
+from fastapi import Request, Response
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import declarative_base, sessionmaker
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.overload import statement_timeouts
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+READ_YOUR_WRITES_COOKIE = "laafitech_rw"
+READ_YOUR_WRITES_HEADER = "x-read-your-writes"
 
 # Create database engine
 engine = create_engine(
@@ -9,17 +40,99 @@ engine = create_engine(
     pool_pre_ping=True,
 )
 
-# Create session factory
+# Optional read replica
+replica_engine: Optional[Engine] = None
+if settings.database_replica_url:
+    replica_engine = create_engine(
+        settings.database_replica_url,
+        echo=settings.database_echo,
+        pool_pre_ping=True,
+    )
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=replica_engine or engine,
+    info={"replica": replica_engine is not None}
+)
 
 # Base class for models
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency for getting database session."""
+class ReplicaHealth:
+    """Tracks whether the replica may be used; it is skipped for a while after a failure."""
+
+    def __init__(self, engine: Optional[Engine], retry_seconds: float = 30.0):
+        self.engine = engine
+        self.retry_seconds = retry_seconds
+        self._down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.engine is not None and time.monotonic() >= self._down_until
+
+    def mark_down(self, exc: Exception) -> None:
+        if self.available:
+            logger.warning(
+                "Read replica unreachable, using the primary for %.0fs: %s",
+                self.retry_seconds, exc
+            )
+        self._down_until = time.monotonic() + self.retry_seconds
+        metrics.inc(
+            "db_replica_failures_total",
+            help_text="Replica errors; reads use the primary until the retry delay passes."
+        )
+
+
+replica_health = ReplicaHealth(replica_engine, settings.database_replica_retry_seconds)
+
+
+def wrote_recently(request: Request) -> bool:
+    """Whether the client asked for, or recently earned, read-your-writes."""
+    return (
+        READ_YOUR_WRITES_COOKIE in request.cookies
+        or request.headers.get(READ_YOUR_WRITES_HEADER, "").lower() in ("1", "true")
+    )
+
+
+def get_db(request: Request, response: Response):
+    """Dependency for getting a session on the primary database."""
+    if replica_engine is not None and request.method not in SAFE_METHODS:
+        # Steer this client's reads to the primary until the replica has caught up
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, "1",
+            max_age=settings.read_your_writes_seconds, httponly=True, samesite="lax"
+        )
     db = SessionLocal()
+    statement_timeouts.apply(db, request.scope)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db(request: Request):
+    """Dependency for getting a read-only session, on the replica when possible."""
+    db = None
+    if replica_health.available and not wrote_recently(request):
+        db = ReplicaSessionLocal()
+        statement_timeouts.apply(db, request.scope)
+        try:
+            # Connect now so an unreachable replica falls back before the endpoint runs
+            db.connection()
+        except OperationalError as exc:
+            db.close()
+            replica_health.mark_down(exc)
+            db = None
+    if db is None:
+        db = SessionLocal()
+        statement_timeouts.apply(db, request.scope)
     try:
         yield db
+    except OperationalError as exc:
+        if db.info.get("replica"):
+            replica_health.mark_down(exc)
+        raise
     finally:
         db.close()
@@ -0,0 +1,258 @@
+"""
+Request and database metrics exposed in Prometheus text format.
+
+`MetricsMiddleware` times every request and labels it with the matched route
+template (e.g. `/api/v1/campaigns/{campaign_id}`), while SQLAlchemy cursor hooks
+installed by `instrument_engine` count statements and time spent in the
+database for the request that issued them. Statements are also counted per
+engine (primary, replica), including those issued outside requests.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    """Mutable per-request accumulator shared with the DB hooks."""
+    __slots__ = ("queries", "query_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+
+
+# Holds a mutable object, so hooks running in the threadpool update the
+# same instance the middleware reads after the response
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "laafitech_request_stats", default=None
+)
+
+
+class RouteMetrics:
+    """Aggregates for one (method, route) pair."""
+    __slots__ = ("buckets", "duration_sum", "count", "statuses", "queries", "query_time")
+
+    def __init__(self, bucket_count: int):
+        self.buckets = [0] * (bucket_count + 1)  # last slot is +Inf
+        self.duration_sum = 0.0
+        self.count = 0
+        self.statuses: Dict[int, int] = {}
+        self.queries = 0
+        self.query_time = 0.0
+
+
+class MetricsRegistry:
+    """Thread-safe store of per-route request and query metrics."""
+
+    def __init__(self, buckets: Sequence[float], namespace: str = "laafitech"):
+        self.buckets = sorted(float(b) for b in buckets)
+        self.namespace = namespace
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def observe_request(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        duration: float,
+        stats: RequestStats
+    ) -> None:
+        """Record one finished request."""
+        index = bisect_left(self.buckets, duration)
+        with self._lock:
+            metrics = self._routes.get((method, route))
+            if metrics is None:
+                metrics = self._routes[(method, route)] = RouteMetrics(len(self.buckets))
+            metrics.buckets[index] += 1
+            metrics.duration_sum += duration
+            metrics.count += 1
+            metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+            metrics.queries += stats.queries
+            metrics.query_time += stats.query_time
+
+    def inc(self, name: str, value: float = 1.0, help_text: str = "", **labels: str) -> None:
+        """Increment a free-form counter, e.g. from other subsystems."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+            if help_text:
+                self._help[name] = help_text
+
+    def set(self, name: str, value: float, help_text: str = "", **labels: str) -> None:
+        """Set a free-form gauge, e.g. a last-success timestamp."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = float(value)
+            if help_text:
+                self._help[name] = help_text
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        ns = self.namespace
+        with self._lock:
+            routes = sorted(self._routes.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            help_texts = dict(self._help)
+
+        lines: List[str] = []
+        duration = f"{ns}_http_request_duration_seconds"
+        lines.append(f"# HELP {duration} Request latency by route template.")
+        lines.append(f"# TYPE {duration} histogram")
+        for (method, route), m in routes:
+            labels = f'method="{method}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, m.buckets):
+                cumulative += bucket
+                lines.append(f'{duration}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{duration}_bucket{{{labels},le="+Inf"}} {m.count}')
+            lines.append(f"{duration}_sum{{{labels}}} {m.duration_sum:.6f}")
+            lines.append(f"{duration}_count{{{labels}}} {m.count}")
+
+        requests = f"{ns}_http_requests_total"
+        lines.append(f"# HELP {requests} Requests by route template and status code.")
+        lines.append(f"# TYPE {requests} counter")
+        for (method, route), m in routes:
+            for status_code, count in sorted(m.statuses.items()):
+                lines.append(
+                    f'{requests}{{method="{method}",route="{_escape(route)}",'
+                    f'status="{status_code}"}} {count}'
+                )
+
+        queries = f"{ns}_db_queries_total"
+        lines.append(f"# HELP {queries} SQL statements executed by route template.")
+        lines.append(f"# TYPE {queries} counter")
+        for (method, route), m in routes:
+            lines.append(f'{queries}{{method="{method}",route="{_escape(route)}"}} {m.queries}')
+
+        query_time = f"{ns}_db_query_duration_seconds_total"
+        lines.append(f"# HELP {query_time} Time spent executing SQL by route template.")
+        lines.append(f"# TYPE {query_time} counter")
+        for (method, route), m in routes:
+            lines.append(
+                f'{query_time}{{method="{method}",route="{_escape(route)}"}} '
+                f"{m.query_time:.6f}"
+            )
+
+        seen = set()
+        for kind, series in (("counter", counters), ("gauge", gauges)):
+            for (name, labels), value in series:
+                full_name = f"{ns}_{name}"
+                if name not in seen:
+                    seen.add(name)
+                    if name in help_texts:
+                        lines.append(f"# HELP {full_name} {help_texts[name]}")
+                    lines.append(f"# TYPE {full_name} {kind}")
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                suffix = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{full_name}{suffix} {value:.15g}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_request.get() is not None:
+        conn.info.setdefault("laafitech_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics.inc(
+        "db_statements_total",
+        help_text="SQL statements executed, by engine.",
+        engine=_engine_names.get(conn.engine, "primary")
+    )
+    stats = _current_request.get()
+    if stats is None:
+        return
+    starts = conn.info.get("laafitech_query_start")
+    if starts:
+        stats.query_time += time.perf_counter() - starts.pop()
+    stats.queries += 1
+
+
+def _handle_error(context):
+    # after_cursor_execute does not run for a failed statement; drop its start
+    # here, or it would stay on the pooled connection and skew the next timing
+    conn = context.connection
+    stats = _current_request.get()
+    if conn is None or stats is None:
+        return
+    starts = conn.info.get("laafitech_query_start")
+    if starts:
+        stats.query_time += time.perf_counter() - starts.pop()
+        stats.queries += 1
+
+
+# Label of each instrumented engine in db_statements_total
+_engine_names: Dict[Engine, str] = {}
+
+
+def instrument_engine(engine: Engine, name: str = "primary") -> None:
+    """Attach the query counting hooks to an engine (idempotent)."""
+    _engine_names[engine] = name
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and query stats per route."""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            _current_request.reset(token)
+            route = scope.get("route")
+            self.registry.observe_request(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status_holder[0],
+                duration,
+                stats,
+            )
+
+
+# Process-wide registry
+metrics = MetricsRegistry(settings.metrics_latency_buckets)
@@ -0,0 +1,243 @@
+"""
+Versioned schema migrations.
+
+`Base.metadata.create_all` creates missing tables with all their columns and
+indexes, but it leaves tables that already exist alone. Columns and indexes
+added to the models later are therefore also listed here, by name, under a
+new version number. For every version not yet recorded in
+`schema_migrations`, `migrate` runs the version's prepare step, if any (e.g.
+removing rows a new unique index would reject), adds the missing columns
+with ALTER TABLE, creates the indexes and then runs its backfill. On
+PostgreSQL indexes are built with CREATE INDEX CONCURRENTLY, so writes to
+large tables are not blocked. Columns already present are skipped, indexes
+are IF NOT EXISTS and backfills only fill rows still unset, which makes it
+safe for several workers to start at once.
+
+The app migrates on startup. To run it beforehand:
+
+    python -m app.core.migrations
+    python -m app.core.migrations --list
+"""
+import argparse
+import logging
+import re
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import Column, Index, insert, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+from app.core.database import Base
+from app.models.models import Campaign, Donation, SchemaMigration
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    indexes: Tuple[str, ...] = ()  # names of Index objects declared on the models
+    columns: Tuple[str, ...] = ()  # "table.column" of Columns declared on the models
+    backfill: Optional[Callable[[Engine], None]] = None  # fills the new columns
+    prepare: Optional[Callable[[Engine], None]] = None  # runs before the DDL
+
+
+def _backfill_campaign_content_updated_at(engine: Engine) -> None:
+    # updated_at is kept as it is, not bumped by its onupdate
+    with engine.begin() as conn:
+        conn.execute(
+            update(Campaign)
+            .where(Campaign.content_updated_at.is_(None))
+            .values(content_updated_at=Campaign.updated_at, updated_at=Campaign.updated_at)
+        )
+
+
+def _backfill_donation_updated_at(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            update(Donation)
+            .where(Donation.updated_at.is_(None))
+            .values(updated_at=Donation.created_at)
+        )
+
+
+def _backfill_need_scores(engine: Engine) -> None:
+    # Imported here: the service layer imports the models this module sets up
+    from app.services.priority import refresh_need_scores
+
+    db = Session(bind=engine)
+    try:
+        refresh_need_scores(db)
+    finally:
+        db.close()
+
+
+def _dedupe_matching_records(engine: Engine) -> None:
+    # Keep one record per donor and campaign: a decided one over a pending
+    # one, then the oldest
+    with engine.begin() as conn:
+        conn.execute(text("""
+            DELETE FROM matching_records WHERE id IN (
+                SELECT m.id FROM matching_records m
+                JOIN matching_records o
+                  ON o.donor_id = m.donor_id AND o.campaign_id = m.campaign_id AND o.id <> m.id
+                WHERE (coalesce(o.status, 'pending') <> 'pending'
+                       AND coalesce(m.status, 'pending') = 'pending')
+                   OR ((coalesce(o.status, 'pending') = 'pending')
+                       = (coalesce(m.status, 'pending') = 'pending') AND o.id < m.id)
+            )
+        """))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Hot filter indexes", (
+        "ix_campaigns_status_end_date",
+        "ix_campaigns_community_id",
+        "ix_campaigns_updated_at",
+        "ix_donations_campaign_status",
+        "ix_donations_donor_created_at",
+        "ix_donations_status_created_at",
+        "ix_matching_records_campaign_id",
+        "ix_impact_metrics_campaign_metric",
+    )),
+    Migration(2, "Analytics snapshot watermarks", (
+        "ix_communities_updated_at",
+    )),
+    Migration(
+        3, "Campaign content watermark for recommendations",
+        indexes=("ix_campaigns_content_updated_at",),
+        columns=("campaigns.content_updated_at",),
+        backfill=_backfill_campaign_content_updated_at,
+    ),
+    Migration(
+        4, "Community need score",
+        indexes=(
+            "ix_communities_need_score",
+            "ix_communities_country_need_score",
+            "ix_communities_country_region_need_score",
+        ),
+        columns=("communities.need_score", "communities.need_score_key"),
+        backfill=_backfill_need_scores,
+    ),
+    Migration(
+        5, "Remaining indexes on matching records and rollups",
+        indexes=(
+            "uq_matching_records_donor_campaign",
+            "ix_matching_records_donor_score",
+            "ix_donation_rollups_campaign_day",
+            "ix_donation_rollups_status_day",
+        ),
+        prepare=_dedupe_matching_records,
+    ),
+    Migration(
+        6, "Donation update watermark for the analytics snapshot",
+        indexes=("ix_donations_status_updated_at",),
+        columns=("donations.updated_at",),
+        backfill=_backfill_donation_updated_at,
+    ),
+]
+
+
+def _declared_indexes() -> Dict[str, Index]:
+    return {
+        index.name: index
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+    }
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        return list(conn.execute(
+            select(SchemaMigration.version).order_by(SchemaMigration.version)
+        ).scalars())
+
+
+def _column_names(engine: Engine, table: str) -> List[str]:
+    return [column["name"] for column in inspect(engine).get_columns(table)]
+
+
+def _add_column(engine: Engine, column: Column) -> None:
+    table = column.table.name
+    if column.name in _column_names(engine, table):
+        return
+    quote = engine.dialect.identifier_preparer.quote
+    ddl = (
+        f"ALTER TABLE {quote(table)} ADD COLUMN {quote(column.name)} "
+        f"{column.type.compile(dialect=engine.dialect)}"
+    )
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(ddl)
+    except (OperationalError, ProgrammingError):
+        # Another worker added it first
+        if column.name not in _column_names(engine, table):
+            raise
+
+
+def _create_index(engine: Engine, index: Index) -> None:
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY cannot run inside a transaction block
+        ddl = re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl, count=1)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql(ddl)
+    else:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(ddl)
+
+
+def migrate(engine: Engine) -> List[int]:
+    """Apply pending migrations in version order; returns the versions applied."""
+    done = set(applied_versions(engine))
+    indexes = _declared_indexes()
+    applied = []
+    for migration in sorted(MIGRATIONS):
+        if migration.version in done:
+            continue
+        if migration.prepare is not None:
+            migration.prepare(engine)
+        for name in migration.columns:
+            table, column = name.split(".")
+            _add_column(engine, Base.metadata.tables[table].c[column])
+        for name in migration.indexes:
+            _create_index(engine, indexes[name])
+        if migration.backfill is not None:
+            migration.backfill(engine)
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(SchemaMigration).values(
+                    version=migration.version,
+                    description=migration.description,
+                    applied_at=datetime.utcnow(),
+                ))
+        except IntegrityError:
+            # Another worker recorded it first
+            continue
+        logger.info("Applied migration %d: %s", migration.version, migration.description)
+        applied.append(migration.version)
+    return applied
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--list", action="store_true", help="Show migrations and exit")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    from app.core.database import engine
+
+    if args.list:
+        done = set(applied_versions(engine))
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version in done else "pending"
+            print(f"{migration.version:>4}  {state:<8} {migration.description}")
+        return 0
+    print(f"Applied: {migrate(engine) or 'nothing to do'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
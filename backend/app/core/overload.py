@@ -0,0 +1,160 @@
+"""
+Overload protection: per-route statement timeouts and an in-flight request cap.
+
+Sessions from `get_db` and `get_read_db` carry the time budget of the route
+that opened them, looked up by route template in
+`settings.statement_timeout_routes`, else `settings.statement_timeout_ms`.
+Those templates are relative to `settings.api_v1_prefix`.
+PostgreSQL enforces it with `SET LOCAL statement_timeout` at the start of
+each transaction. SQLite enforces it with a progress handler that interrupts
+a statement once its deadline passes. A statement that runs out of time
+raises `QueryTimeout`, which the app turns into a 503. Background jobs open
+their own sessions and have no budget.
+
+`LoadSheddingMiddleware` answers 503 straight away once
+`settings.max_in_flight_requests` requests are already being served, rather
+than letting them queue for the threadpool and the connection pool.
+"""
+import sqlite3
+import time
+from typing import Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+from app.core.config import settings
+from app.core.metrics import metrics
+
+TIMEOUT_KEY = "laafitech_statement_timeout"  # (milliseconds, route) in session and connection info
+DEADLINE_KEY = "laafitech_statement_deadline"
+POSTGRES_QUERY_CANCELED = "57014"
+# Served even when the in-flight limit is reached
+EXEMPT_PATHS = {"/health", "/metrics"}
+
+
+class QueryTimeout(Exception):
+    """A statement exceeded the time budget of the route that issued it."""
+
+    def __init__(self, route: str, timeout_ms: int):
+        super().__init__(f"Statement exceeded the {timeout_ms}ms budget of {route}")
+        self.route = route
+        self.timeout_ms = timeout_ms
+
+
+class StatementTimeouts:
+    """Time budgets by route template, in milliseconds; 0 means no budget."""
+
+    def __init__(self, default_ms: int, routes: Optional[Dict[str, int]] = None, prefix: str = ""):
+        self.default_ms = default_ms
+        self.routes = {prefix + route: int(ms) for route, ms in (routes or {}).items()}
+
+    def budget_ms(self, route: str) -> int:
+        return self.routes.get(route, self.default_ms)
+
+    def apply(self, session: Session, scope) -> None:
+        """Give `session` the budget of the route matched for this request."""
+        route = getattr(scope.get("route"), "path", scope.get("path", ""))
+        timeout_ms = self.budget_ms(route)
+        if timeout_ms > 0:
+            session.info[TIMEOUT_KEY] = (timeout_ms, route)
+
+
+statement_timeouts = StatementTimeouts(
+    settings.statement_timeout_ms,
+    settings.statement_timeout_routes,
+    prefix=settings.api_v1_prefix,
+)
+
+
+@event.listens_for(Session, "after_begin")
+def _begin_with_timeout(session, transaction, connection) -> None:
+    budget = session.info.get(TIMEOUT_KEY)
+    if budget is None:
+        return
+    info = connection.info
+    info[TIMEOUT_KEY] = budget
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        # Scoped to this transaction, so pooled connections are left unchanged
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(budget[0])}")
+    elif dialect == "sqlite":
+        info[DEADLINE_KEY] = time.perf_counter() + budget[0] / 1000.0
+        connection.connection.driver_connection.set_progress_handler(
+            lambda: time.perf_counter() > info.get(DEADLINE_KEY, float("inf")), 10_000
+        )
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_deadline(conn, cursor, statement, parameters, context, executemany) -> None:
+    if DEADLINE_KEY in conn.info:
+        conn.info[DEADLINE_KEY] = time.perf_counter() + conn.info[TIMEOUT_KEY][0] / 1000.0
+
+
+@event.listens_for(Pool, "checkin")
+def _clear_timeout(dbapi_connection, connection_record) -> None:
+    if connection_record is None or TIMEOUT_KEY not in connection_record.info:
+        return
+    connection_record.info.pop(TIMEOUT_KEY, None)
+    if connection_record.info.pop(DEADLINE_KEY, None) is not None and dbapi_connection is not None:
+        dbapi_connection.set_progress_handler(None, 0)
+
+
+@event.listens_for(Engine, "handle_error")
+def _translate_timeout(context):
+    connection = context.connection
+    budget = connection.info.get(TIMEOUT_KEY) if connection is not None else None
+    if budget is None:
+        return None
+    error = context.original_exception
+    timed_out = (
+        getattr(error, "pgcode", None) == POSTGRES_QUERY_CANCELED
+        or (isinstance(error, sqlite3.OperationalError) and str(error) == "interrupted")
+    )
+    if not timed_out:
+        return None
+    timeout_ms, route = budget
+    metrics.inc(
+        "db_statement_timeouts_total",
+        help_text="Statements cancelled for exceeding their route's time budget.",
+        route=route
+    )
+    return QueryTimeout(route, timeout_ms)
+
+
+class LoadSheddingMiddleware:
+    """Pure ASGI middleware returning 503 while too many requests are in flight."""
+
+    def __init__(self, app, max_in_flight: int, retry_after: int = 1):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.in_flight = 0  # only touched on the event loop
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        if self.in_flight >= self.max_in_flight:
+            metrics.inc(
+                "requests_shed_total",
+                help_text="Requests rejected with 503 because the in-flight limit was reached."
+            )
+            body = b'{"detail":"Server is overloaded, retry shortly"}'
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"retry-after", str(self.retry_after).encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
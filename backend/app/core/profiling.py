@@ -0,0 +1,226 @@
+"""
+Per-request SQL profiling and N+1 detection (opt-in, for debugging).
+
+With `settings.sql_profiling_enabled`, every statement executed while serving
+a request is collected and grouped by normalized SQL. Groups executed at least
+`sql_repeat_threshold` times are flagged as likely N+1 patterns (e.g. lazy
+loads of `Campaign.community` in a loop), and statements slower than
+`sql_slow_query_ms` are flagged as slow. A compact summary is returned in the
+`X-SQL-Profile` response header and the full report is logged as JSON.
+
+`capture_queries` and `assert_max_queries` let tests pin the number of
+statements an endpoint may issue.
+"""
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-sql-profile"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|:\w+|__\[POSTCOMPILE_\w+\])\s*,?)+\)", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Collapse literals, IN-lists and whitespace so equivalent queries group together."""
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _IN_LIST.sub("IN (...)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+class RequestProfile:
+    """Statements executed while serving one request."""
+
+    def __init__(self):
+        self.statements: List[Tuple[str, float]] = []
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements.append((statement, duration))
+
+    def summary(
+        self,
+        slow_ms: float,
+        repeat_threshold: int
+    ) -> Dict[str, Any]:
+        """Group statements and flag N+1 candidates and slow queries."""
+        groups: Dict[str, Dict[str, Any]] = {}
+        slow = []
+        total = 0.0
+        for statement, duration in self.statements:
+            total += duration
+            key = normalize_sql(statement)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {"sql": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            ms = duration * 1000.0
+            group["count"] += 1
+            group["total_ms"] += ms
+            group["max_ms"] = max(group["max_ms"], ms)
+            if ms >= slow_ms:
+                slow.append({"sql": key, "ms": round(ms, 3)})
+
+        ordered = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
+        for group in ordered:
+            group["total_ms"] = round(group["total_ms"], 3)
+            group["max_ms"] = round(group["max_ms"], 3)
+        return {
+            "queries": len(self.statements),
+            "distinct": len(groups),
+            "time_ms": round(total * 1000.0, 3),
+            "repeated": [g for g in ordered if g["count"] >= repeat_threshold],
+            "slow": slow,
+            "groups": ordered,
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "laafitech_sql_profile", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("laafitech_profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    starts = conn.info.get("laafitech_profile_start")
+    duration = time.perf_counter() - starts.pop() if starts else 0.0
+    profile.record(statement, duration)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach the profiling hooks to an engine (idempotent)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SQLProfilingMiddleware:
+    """Pure ASGI middleware that profiles the SQL issued by each request."""
+
+    def __init__(
+        self,
+        app,
+        slow_ms: float = 100.0,
+        repeat_threshold: int = 3
+    ):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        summary: Dict[str, Any] = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                summary.update(profile.summary(self.slow_ms, self.repeat_threshold))
+                header = (
+                    f"queries={summary['queries']};distinct={summary['distinct']};"
+                    f"time_ms={summary['time_ms']};repeated={len(summary['repeated'])};"
+                    f"slow={len(summary['slow'])}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_HEADER, header.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            if summary:
+                route = getattr(scope.get("route"), "path", scope["path"])
+                record = {
+                    "event": "sql_profile",
+                    "method": scope["method"],
+                    "route": route,
+                    **{k: v for k, v in summary.items() if k != "groups"},
+                }
+                level = logging.WARNING if summary["repeated"] or summary["slow"] else logging.INFO
+                logger.log(level, json.dumps(record))
+
+
+class QueryCapture:
+    """Statements captured by `capture_queries`."""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def grouped(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for statement in self.statements:
+            key = normalize_sql(statement)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+@contextmanager
+def capture_queries(engine: Engine = None) -> Iterator[QueryCapture]:
+    """Capture every statement executed on `engine` inside the block."""
+    if engine is None:
+        from app.core.database import engine
+
+    capture = QueryCapture()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        capture.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield capture
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+def assert_max_queries(
+    client,
+    max_queries: int,
+    method: str,
+    url: str,
+    engine: Engine = None,
+    **kwargs
+):
+    """
+    Issue a request through a test client and fail if it executed more than
+    `max_queries` statements. Returns the response.
+
+        assert_max_queries(client, 2, "GET", "/api/v1/campaigns")
+    """
+    with capture_queries(engine) as capture:
+        response = client.request(method, url, **kwargs)
+    if capture.count > max_queries:
+        details = "\n".join(
+            f"  {count}x {sql}" for sql, count in
+            sorted(capture.grouped().items(), key=lambda item: -item[1])
+        )
+        raise AssertionError(
+            f"{method} {url} executed {capture.count} queries "
+            f"(max {max_queries}):\n{details}"
+        )
+    return response
+
@@ -0,0 +1,251 @@
+"""
+Token-bucket rate limiting.
+
+Every request draws one token from a per-client bucket and, for routes listed
+in `settings.rate_limit_routes`, from a per-client-per-route bucket as well.
+Buckets live in Redis and are updated by one atomic Lua script; while Redis
+is unreachable an in-process limiter with the same semantics takes over.
+Limits are written as "<count>/<period>", e.g. "20/minute".
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+# The payment webhook is signed by the provider and sheds load with its own queue
+EXEMPT_PATHS = {"/health", "/metrics", f"{settings.api_v1_prefix}/payments/webhook"}
+
+# KEYS: bucket keys; ARGV: capacity_1, rate_per_ms_1, capacity_2, rate_per_ms_2, ...
+# Returns {allowed, remaining, retry_after_ms}
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local allowed = 1
+local retry = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[2 * i - 1])
+  local rate = tonumber(ARGV[2 * i])
+  local state = redis.call('HMGET', key, 't', 'ts')
+  local tokens = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now_ms
+  tokens = math.min(capacity, tokens + math.max(0, now_ms - ts) * rate)
+  levels[i] = tokens
+  if tokens < 1 then
+    allowed = 0
+    retry = math.max(retry, math.ceil((1 - tokens) / rate))
+  end
+end
+local remaining = -1
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[2 * i - 1])
+  local rate = tonumber(ARGV[2 * i])
+  local tokens = levels[i]
+  if allowed == 1 then
+    tokens = tokens - 1
+  end
+  redis.call('HSET', key, 't', tostring(tokens), 'ts', now_ms)
+  redis.call('PEXPIRE', key, math.ceil(capacity / rate) + 1000)
+  if remaining < 0 or tokens < remaining then
+    remaining = tokens
+  end
+end
+return {allowed, math.floor(remaining), retry}
+"""
+
+
+def parse_limit(limit: str) -> Tuple[int, float]:
+    """Parse "20/minute" into (capacity, tokens per second)."""
+    count, _, period = limit.partition("/")
+    period = period.strip().rstrip("s") or "second"
+    if period not in PERIODS:
+        raise ValueError(f"Unknown rate limit period in {limit!r}")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period]
+
+
+# A bucket is (key, capacity, tokens per second)
+Bucket = Tuple[str, int, float]
+
+
+class RateLimitResult:
+    __slots__ = ("allowed", "limit", "remaining", "retry_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, retry_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+
+class LocalRateLimiter:
+    """In-process token buckets with LRU eviction of idle clients."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def hit(self, buckets: Sequence[Bucket]) -> RateLimitResult:
+        now = time.monotonic()
+        levels = []
+        retry = 0.0
+        for key, capacity, rate in buckets:
+            state = self._buckets.get(key)
+            tokens = capacity if state is None else min(
+                capacity, state[0] + (now - state[1]) * rate
+            )
+            levels.append(tokens)
+            if tokens < 1:
+                retry = max(retry, (1 - tokens) / rate)
+        allowed = retry == 0.0
+        remaining = None
+        for (key, _, _), tokens in zip(buckets, levels):
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = [tokens, now]
+            self._buckets.move_to_end(key)
+            remaining = tokens if remaining is None else min(remaining, tokens)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        limit = min(capacity for _, capacity, _ in buckets)
+        return RateLimitResult(allowed, limit, int(remaining), retry)
+
+
+class RedisRateLimiter:
+    """Token buckets in Redis, updated atomically by a Lua script."""
+
+    def __init__(self, url: str, timeout: float):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(
+            url,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+        )
+        self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def hit(self, buckets: Sequence[Bucket]) -> RateLimitResult:
+        keys = [key for key, _, _ in buckets]
+        args: List[float] = []
+        for _, capacity, rate in buckets:
+            args.extend((capacity, rate / 1000.0))
+        allowed, remaining, retry_ms = await self._script(keys=keys, args=args)
+        limit = min(capacity for _, capacity, _ in buckets)
+        return RateLimitResult(bool(allowed), limit, max(int(remaining), 0), retry_ms / 1000.0)
+
+    async def close(self) -> None:
+        await self._client.close()
+
+
+class RateLimiter:
+    """Redis-backed limiter that degrades to the local limiter on failure."""
+
+    def __init__(
+        self,
+        default_limit: str,
+        route_limits: Dict[str, str],
+        redis_url: Optional[str] = None,
+        redis_timeout: float = 0.05,
+        retry_redis_after: float = 5.0,
+        local_max_keys: int = 100_000
+    ):
+        self.default = parse_limit(default_limit)
+        self.routes = {path: parse_limit(limit) for path, limit in route_limits.items()}
+        self.local = LocalRateLimiter(local_max_keys)
+        self.redis = RedisRateLimiter(redis_url, redis_timeout) if redis_url else None
+        self.retry_redis_after = retry_redis_after
+        self._redis_down_until = 0.0
+
+    def buckets_for(self, client: str, path: str) -> List[Bucket]:
+        # The {client} hash tag keeps all of a client's keys in one cluster slot
+        capacity, rate = self.default
+        buckets = [(f"rl:{{{client}}}", capacity, rate)]
+        route = self.routes.get(path)
+        if route is not None:
+            buckets.append((f"rl:{{{client}}}:{path}", route[0], route[1]))
+        return buckets
+
+    async def hit(self, client: str, path: str) -> RateLimitResult:
+        buckets = self.buckets_for(client, path)
+        if self.redis is not None and time.monotonic() >= self._redis_down_until:
+            try:
+                return await self.redis.hit(buckets)
+            except Exception as exc:  # connection errors, timeouts, script errors
+                self._redis_down_until = time.monotonic() + self.retry_redis_after
+                metrics.inc(
+                    "rate_limit_fallbacks_total",
+                    help_text="Times the rate limiter fell back to in-process buckets."
+                )
+                logger.warning("Rate limiter using local buckets: %s", exc)
+        return self.local.hit(buckets)
+
+
+def client_identifier(scope) -> str:
+    """Client IP, taken from X-Forwarded-For when running behind a trusted proxy."""
+    if settings.rate_limit_trust_forwarded:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware enforcing the token buckets, returning 429 when empty."""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        result = await self.limiter.hit(client_identifier(scope), scope["path"])
+        headers = [
+            (b"x-ratelimit-limit", str(result.limit).encode()),
+            (b"x-ratelimit-remaining", str(result.remaining).encode()),
+        ]
+
+        if not result.allowed:
+            metrics.inc(
+                "rate_limit_rejections_total",
+                help_text="Requests rejected with 429 by the rate limiter.",
+                path=scope["path"] if scope["path"] in self.limiter.routes else "default"
+            )
+            retry_after = max(1, int(result.retry_after + 0.999))
+            body = b'{"detail":"Rate limit exceeded"}'
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"retry-after", str(retry_after).encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def create_rate_limiter() -> RateLimiter:
+    return RateLimiter(
+        settings.rate_limit_default,
+        settings.rate_limit_routes,
+        redis_url=settings.redis_url if settings.rate_limit_use_redis else None,
+        redis_timeout=settings.rate_limit_redis_timeout_ms / 1000.0,
+        local_max_keys=settings.rate_limit_local_max_keys,
+    )
@@ -0,0 +1,374 @@
+"""
+In-process periodic job scheduler.
+
+One asyncio task per worker process polls a leader lock. Only the leader runs
+jobs, so running several uvicorn workers or replicas does not repeat them.
+Supported locks:
+- "redis": SET NX PX lease, renewed every tick, released on shutdown
+- "database": PostgreSQL session advisory lock on a dedicated connection
+- "none": always leader, for single-process deployments
+
+The lock is probed once on start. If its backend is unreachable then, the
+scheduler switches to its fallback lock if it has one. The app can fall back
+from Redis to the PostgreSQL advisory lock; there is no fallback on other
+databases, since a process-local lock would make every worker leader.
+Without a fallback, or if the backend is lost later, the worker is not
+leader and logs it once, retrying every tick until the lock is back.
+
+Jobs are plain functions taking a Session. They run in a worker thread with
+their own session, one run per job at a time. Every run is recorded in
+JobState and in the metrics registry. When a worker becomes leader, it
+schedules each job from its JobState.last_started_at, so a failover does
+not re-run everything at once.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.metrics import metrics
+from app.models.models import JobState
+
+logger = logging.getLogger(__name__)
+
+ADVISORY_LOCK_KEY = 0x1AAF1
+
+# Release and renew only while the lease still holds our token
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class LocalLeaderLock:
+    """Always leader; for a single process."""
+
+    async def acquire(self) -> bool:
+        return True
+
+    async def release(self) -> None:
+        return None
+
+
+class RedisLeaderLock:
+    """Leader lease stored in Redis under `key` with a TTL."""
+
+    def __init__(self, url: str, key: str, ttl_seconds: float):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self.key = key
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.token = uuid.uuid4().hex
+        self._held = False
+        self._renew = self._client.register_script(RENEW_SCRIPT)
+        self._release = self._client.register_script(RELEASE_SCRIPT)
+
+    async def acquire(self) -> bool:
+        """Take the lease, or renew it if held; False if another worker holds it."""
+        if self._held:
+            self._held = bool(await self._renew(keys=[self.key], args=[self.token, self.ttl_ms]))
+        if not self._held:
+            self._held = bool(await self._client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+        return self._held
+
+    async def release(self) -> None:
+        if self._held:
+            self._held = False
+            await self._release(keys=[self.key], args=[self.token])
+        await self._client.close()
+
+
+class AdvisoryLeaderLock:
+    """PostgreSQL session advisory lock held on a dedicated connection."""
+
+    def __init__(self, engine: Engine, key: int):
+        self.engine = engine
+        self.key = key
+        self._connection = None
+
+    def _acquire_sync(self) -> bool:
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT 1"))
+                return True
+            except Exception:
+                # The session, and with it the lock, is gone
+                self._discard()
+        connection = self.engine.connect()
+        locked = connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+        ).scalar()
+        connection.commit()
+        if locked:
+            self._connection = connection
+        else:
+            connection.close()
+        return bool(locked)
+
+    def _discard(self) -> None:
+        try:
+            self._connection.invalidate()
+        finally:
+            self._connection = None
+
+    def _release_sync(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self._connection.close()
+        finally:
+            self._connection = None
+
+    async def acquire(self) -> bool:
+        return await asyncio.to_thread(self._acquire_sync)
+
+    async def release(self) -> None:
+        await asyncio.to_thread(self._release_sync)
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[Session], Any]
+    interval: float  # seconds between the start of consecutive runs
+    next_run: float = 0.0
+    running: bool = False
+    last_result: Any = field(default=None, repr=False)
+
+
+class Scheduler:
+    """Runs registered jobs on the leader worker only."""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        lock,
+        tick_seconds: float = 5.0,
+        fallback_lock=None
+    ):
+        self.session_factory = session_factory
+        self.lock = lock
+        self.fallback_lock = fallback_lock
+        self.tick = tick_seconds
+        self.jobs: Dict[str, Job] = {}
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._running: List[asyncio.Task] = []
+        self._stop = asyncio.Event()
+        self._lock_unavailable = False
+
+    def add_job(self, name: str, func: Callable[[Session], Any], interval: float) -> Job:
+        job = self.jobs[name] = Job(name, func, interval)
+        return job
+
+    def job(self, name: str, interval: float):
+        """Decorator form of `add_job`."""
+        def register(func):
+            self.add_job(name, func, interval)
+            return func
+        return register
+
+    async def start(self) -> None:
+        await self._check_lock()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name="scheduler")
+
+    async def _check_lock(self) -> None:
+        """Switch to the fallback lock, if any, when the lock's backend is unreachable."""
+        try:
+            await self.lock.acquire()
+            return
+        except Exception as exc:
+            if self.fallback_lock is None:
+                # Stay a follower; the loop keeps retrying the lock
+                logger.warning("Scheduler lock unavailable, not running jobs: %s", exc)
+                self._lock_unavailable = True
+                return
+            logger.warning(
+                "Scheduler lock unavailable, using %s instead: %s",
+                type(self.fallback_lock).__name__, exc
+            )
+        try:
+            await self.lock.release()
+        except Exception:
+            pass
+        self.lock = self.fallback_lock
+
+    async def stop(self) -> None:
+        """Stop polling, wait for running jobs and give up leadership."""
+        self._stop.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        try:
+            await self.lock.release()
+        except Exception as exc:
+            logger.warning("Could not release scheduler lock: %s", exc)
+        self.is_leader = False
+
+    async def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                leader = await self.lock.acquire()
+            except Exception as exc:  # lock backend unreachable: not leader
+                if not self._lock_unavailable:
+                    logger.warning("Scheduler lock unavailable, not running jobs: %s", exc)
+                    self._lock_unavailable = True
+                leader = False
+            else:
+                if self._lock_unavailable:
+                    logger.info("Scheduler lock reachable again")
+                    self._lock_unavailable = False
+            if leader and not self.is_leader:
+                logger.info("Scheduler acquired leadership")
+                await asyncio.to_thread(self._schedule_from_state)
+            elif self.is_leader and not leader:
+                logger.warning("Scheduler lost leadership")
+            self.is_leader = leader
+            metrics.set(
+                "scheduler_leader", 1 if leader else 0,
+                help_text="1 while this worker holds the scheduler lock."
+            )
+
+            if leader:
+                now = time.monotonic()
+                for job in self.jobs.values():
+                    if not job.running and now >= job.next_run:
+                        job.running = True
+                        task = asyncio.create_task(self._run_job(job), name=f"job:{job.name}")
+                        self._running.append(task)
+                        task.add_done_callback(self._running.remove)
+
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.tick)
+            except asyncio.TimeoutError:
+                pass
+
+    def _schedule_from_state(self) -> None:
+        """Continue each job's cadence from its last recorded start."""
+        now = time.monotonic()
+        utc_now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            states = {
+                state.name: state for state in
+                db.query(JobState).filter(JobState.name.in_(list(self.jobs)))
+            }
+        except Exception as exc:
+            logger.warning("Could not read job state, running all jobs now: %s", exc)
+            states = {}
+        finally:
+            db.close()
+        for job in self.jobs.values():
+            state = states.get(job.name)
+            if state is None or state.last_started_at is None:
+                job.next_run = now
+            else:
+                elapsed = (utc_now - state.last_started_at).total_seconds()
+                job.next_run = now + max(0.0, job.interval - elapsed)
+
+    async def _run_job(self, job: Job) -> None:
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            job.last_result = await asyncio.to_thread(self._execute, job)
+            logger.info("Job %s finished: %s", job.name, job.last_result)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            logger.exception("Job %s failed", job.name)
+        duration = time.perf_counter() - started
+        job.next_run = time.monotonic() + max(0.0, job.interval - duration)
+        job.running = False
+
+        outcome = "failure" if error else "success"
+        metrics.inc(
+            "scheduler_job_runs_total",
+            help_text="Scheduled job runs by outcome.",
+            job=job.name, outcome=outcome
+        )
+        metrics.inc(
+            "scheduler_job_duration_seconds_total", duration,
+            help_text="Time spent running scheduled jobs.",
+            job=job.name
+        )
+        metrics.set(
+            "scheduler_job_last_duration_seconds", duration,
+            help_text="Duration of the most recent run of each job.",
+            job=job.name
+        )
+        if not error:
+            metrics.set(
+                "scheduler_job_last_success_timestamp_seconds", time.time(),
+                help_text="Unix time of the last successful run of each job.",
+                job=job.name
+            )
+        try:
+            await asyncio.to_thread(self._record, job.name, started_at, duration, error)
+        except Exception as exc:
+            logger.warning("Could not record state of job %s: %s", job.name, exc)
+
+    def _execute(self, job: Job) -> Any:
+        db = self.session_factory()
+        try:
+            return job.func(db)
+        finally:
+            db.close()
+
+    def _record(self, name: str, started_at: datetime, duration: float, error: Optional[str]) -> None:
+        db = self.session_factory()
+        try:
+            state = db.get(JobState, name)
+            if state is None:
+                state = JobState(name=name, run_count=0, failure_count=0)
+                db.add(state)
+            state.last_started_at = started_at
+            state.last_duration_ms = duration * 1000.0
+            state.run_count = (state.run_count or 0) + 1
+            if error:
+                state.last_error = error
+                state.failure_count = (state.failure_count or 0) + 1
+            else:
+                state.last_error = None
+                # Jobs that keep their own watermark may have set a later one
+                if state.last_success_at is None or state.last_success_at < started_at:
+                    state.last_success_at = started_at
+            db.commit()
+        finally:
+            db.close()
+
+
+def create_leader_lock(kind: str, engine: Engine, redis_url: str, ttl_seconds: float):
+    if kind == "redis":
+        return RedisLeaderLock(redis_url, "laafitech:scheduler:leader", ttl_seconds)
+    if kind == "database":
+        if engine.dialect.name != "postgresql":
+            raise ValueError("The database scheduler lock needs PostgreSQL")
+        return AdvisoryLeaderLock(engine, key=ADVISORY_LOCK_KEY)
+    if kind == "none":
+        return LocalLeaderLock()
+    raise ValueError(f"Unknown scheduler lock {kind!r}")
+
+
+def create_fallback_lock(engine: Engine):
+    """Lock to use when Redis is unreachable: advisory on PostgreSQL, else none."""
+    if engine.dialect.name == "postgresql":
+        return AdvisoryLeaderLock(engine, key=ADVISORY_LOCK_KEY)
+    return None
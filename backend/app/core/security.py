@@ -1,15 +1,37 @@
+import asyncio
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthCredentials
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from app.core.config import settings
+from app.models.models import User
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds
+)
 security = HTTPBearer()
 
+# bcrypt runs in its own small pool so hashing never occupies the event loop
+# or the threadpool that serves synchronous endpoints
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="password-hash"
+)
+_hash_pending = 0
+_dummy_hash: Optional[str] = None
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
@@ -21,6 +43,50 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _run_hashing(func, *args):
+    """Run a bcrypt call in the hashing pool, shedding load when it is saturated."""
+    global _hash_pending
+    if _hash_pending >= settings.password_hash_max_pending:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password off the event loop."""
+    return await _run_hashing(get_password_hash, password)
+
+
+async def verify_password_async(
+    plain_password: str,
+    hashed_password: Optional[str]
+) -> bool:
+    """
+    Verify a password off the event loop. When there is no stored hash
+    (unknown user) a dummy hash is checked so response time does not reveal
+    whether the account exists.
+    """
+    global _dummy_hash
+    if not hashed_password:
+        if _dummy_hash is None:
+            _dummy_hash = await get_password_hash_async("laafitech-dummy-password")
+        await _run_hashing(verify_password, plain_password, _dummy_hash)
+        return False
+    try:
+        return await _run_hashing(verify_password, plain_password, hashed_password)
+    except ValueError:
+        # Not a bcrypt hash (e.g. a disabled account marker)
+        return False
+
+
 def create_access_token(
     data: dict,
     expires_delta: Optional[timedelta] = None
@@ -35,7 +101,13 @@ def create_access_token(
             minutes=settings.access_token_expire_minutes
         )
     
-    to_encode.update({"exp": expire})
+    # `iat` lets a subject revocation reject only tokens issued before it;
+    # `jti` keeps two tokens issued in the same second apart for logout
+    to_encode.update({
+        "exp": expire,
+        "iat": datetime.now(timezone.utc),
+        "jti": secrets.token_hex(8),
+    })
     encoded_jwt = jwt.encode(
         to_encode,
         settings.secret_key,
@@ -45,6 +117,130 @@ def create_access_token(
     return encoded_jwt
 
 
+class TokenCache:
+    """
+    Bounded LRU cache of verified token payloads, keyed by a SHA-256 digest
+    of the token so raw tokens are never held in memory.
+    Entries expire at the token's `exp` claim.
+    
+    Also holds the revocation denylist: digests of logged-out tokens until
+    their `exp`, and per-subject cutoffs that reject every token issued
+    before them, kept for the longest token lifetime. The denylist is
+    process-local, like the cache, so a revocation reaches the worker that
+    made it; other workers keep accepting the token until it expires.
+    """
+    
+    def __init__(self, maxsize: int, max_lifetime_seconds: float):
+        self.maxsize = maxsize
+        self.max_lifetime = max_lifetime_seconds
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}  # token digest -> exp
+        self._cutoffs: Dict[str, Tuple[float, float]] = {}  # subject -> (cutoff, forget at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def get(self, token: str) -> Optional[dict]:
+        """Return the cached payload, or None if absent or expired."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+    
+    def put(self, token: str, payload: dict) -> None:
+        """Cache a verified payload until its `exp` claim."""
+        expires_at = payload.get("exp")
+        if self.maxsize <= 0 or expires_at is None:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def revoke(self, token: str, expires_at: Optional[float] = None) -> None:
+        """Deny one token until `expires_at` (its `exp`), e.g. on logout."""
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + self.max_lifetime
+        key = self._key(token)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._prune(now)
+            self._revoked[key] = float(expires_at)
+    
+    def revoke_subject(self, subject: str) -> int:
+        """
+        Deny every token issued to a user until now, e.g. when the account
+        is disabled. Returns the number of cached tokens removed.
+        """
+        subject = str(subject)
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._cutoffs[subject] = (now, now + self.max_lifetime)
+            keys = [
+                key for key, (payload, _) in self._entries.items()
+                if str(payload.get("sub")) == subject
+            ]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+    
+    def is_revoked(self, token: str) -> bool:
+        """Whether the token itself was revoked; checked before decoding."""
+        if not self._revoked:
+            return False
+        expires_at = self._revoked.get(self._key(token))
+        return expires_at is not None and time.time() < expires_at
+    
+    def subject_revoked(self, payload: dict) -> bool:
+        """Whether the token was issued before its subject's cutoff."""
+        if not self._cutoffs:
+            return False
+        cutoff = self._cutoffs.get(str(payload.get("sub")))
+        if cutoff is None or time.time() >= cutoff[1]:
+            return False
+        issued_at = payload.get("iat")
+        return issued_at is None or float(issued_at) <= cutoff[0]
+    
+    def _prune(self, now: float) -> None:
+        """Forget denylist entries whose tokens have expired anyway."""
+        for key in [key for key, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[key]
+        for subject in [s for s, (_, forget_at) in self._cutoffs.items() if forget_at <= now]:
+            del self._cutoffs[subject]
+    
+    def clear(self) -> None:
+        """Drop cached payloads; the denylist is kept."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    settings.token_cache_size,
+    max_lifetime_seconds=settings.access_token_expire_minutes * 60
+)
+
+
 def verify_token(token: str) -> dict:
     """Verify and decode a JWT token."""
     try:
@@ -61,10 +257,44 @@ def verify_token(token: str) -> dict:
         )
 
 
-async def get_current_user(credentials: HTTPAuthCredentials = Depends(security)) -> dict:
+def verify_token_cached(token: str) -> dict:
+    """Verify a JWT token, reusing the payload of an earlier verification."""
+    if token_cache.is_revoked(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+        )
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verify_token(token)
+        token_cache.put(token, payload)
+    if token_cache.subject_revoked(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+        )
+    return dict(payload)
+
+
+def revoke_token(token: str, payload: Optional[dict] = None) -> None:
+    """Deny a token for the rest of its lifetime."""
+    token_cache.revoke(token, (payload or {}).get("exp"))
+
+
+@event.listens_for(User, "after_update")
+def _revoke_disabled_user(mapper, connection, target: User) -> None:
+    # Runs at flush, so a disable that is rolled back still ends the sessions
+    history = inspect(target).attrs.is_active.history
+    if history.has_changes() and not target.is_active:
+        token_cache.revoke_subject(target.id)
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
     """Get current authenticated user from token."""
     token = credentials.credentials
-    payload = verify_token(token)
+    payload = verify_token_cached(token)
     user_id: str = payload.get("sub")
     
     if user_id is None:
@@ -74,3 +304,14 @@ async def get_current_user(credentials: HTTPAuthCredentials = Depends(security))
         )
     
     return {"user_id": user_id, "payload": payload}
+
+
+async def get_current_user_id(current_user: dict = Depends(get_current_user)) -> int:
+    """The authenticated user's id; 401 for a token whose subject is not one."""
+    try:
+        return int(current_user["user_id"])
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+        )
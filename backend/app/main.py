@@ -1,12 +1,44 @@
 """Main FastAPI application."""
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.core.cache import community_cache
 from app.core.config import settings
-from app.core.database import Base, engine
-from app.api.v1.endpoints import communities, campaigns, ml
+from app.core.database import Base, engine, replica_engine
+from app.core.metrics import MetricsMiddleware, instrument_engine, metrics
+from app.core.migrations import migrate
+from app.core.overload import LoadSheddingMiddleware, QueryTimeout
+from app.core import profiling
+from app.core.rate_limit import RateLimitMiddleware, create_rate_limiter
+from app.services.maintenance import create_scheduler
+from app.services.payments import payment_ingestor
+from app.services.search import campaign_search
+from app.api.v1.endpoints import analytics, auth, communities, campaigns, ml, payments
 
-# Create database tables
+# Create database tables, then add indexes introduced since they were created
 Base.metadata.create_all(bind=engine)
+migrate(engine)
+
+# Create the campaign full-text index for this database if missing
+campaign_search.setup(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run periodic maintenance jobs and cache invalidation for the lifetime of the worker."""
+    await community_cache.start()
+    scheduler = create_scheduler() if settings.scheduler_enabled else None
+    if scheduler is not None:
+        await scheduler.start()
+    app.state.scheduler = scheduler
+    yield
+    if scheduler is not None:
+        await scheduler.stop()
+    # Commit payment events that are still queued
+    await payment_ingestor.stop()
+    await community_cache.stop()
+
 
 # Initialize app
 app = FastAPI(
@@ -14,9 +46,18 @@ app = FastAPI(
     description="AI-enabled period-poverty campaign platform",
     version=settings.app_version,
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan
 )
 
+# Rate limiting sits inside CORS so 429 responses still carry CORS headers
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware, limiter=create_rate_limiter())
+
+# Shed load before rate limiting does any work; also inside CORS
+if settings.max_in_flight_requests > 0:
+    app.add_middleware(LoadSheddingMiddleware, max_in_flight=settings.max_in_flight_requests)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -26,8 +67,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request/DB metrics; nothing is installed when disabled
+if settings.metrics_enabled:
+    instrument_engine(engine)
+    if replica_engine is not None:
+        instrument_engine(replica_engine, "replica")
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
+# Per-request SQL profiling for debugging N+1 and slow queries
+if settings.sql_profiling_enabled:
+    profiling.instrument_engine(engine)
+    if replica_engine is not None:
+        profiling.instrument_engine(replica_engine)
+    app.add_middleware(
+        profiling.SQLProfilingMiddleware,
+        slow_ms=settings.sql_slow_query_ms,
+        repeat_threshold=settings.sql_repeat_threshold,
+    )
+
+
+@app.exception_handler(QueryTimeout)
+async def query_timeout_handler(request: Request, exc: QueryTimeout):
+    """A statement ran past its route's budget; the client may retry later."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Query time budget exceeded"},
+        headers={"Retry-After": "1"},
+    )
+
 
 # Include routers
+app.include_router(
+    auth.router,
+    prefix=settings.api_v1_prefix
+)
 app.include_router(
     communities.router,
     prefix=settings.api_v1_prefix
@@ -40,6 +113,14 @@ app.include_router(
     ml.router,
     prefix=settings.api_v1_prefix
 )
+app.include_router(
+    payments.router,
+    prefix=settings.api_v1_prefix
+)
+app.include_router(
+    analytics.router,
+    prefix=settings.api_v1_prefix
+)
 
 
 @app.get("/")
@@ -58,6 +139,16 @@ def health_check():
     return {"status": "healthy"}
 
 
+if settings.metrics_enabled:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def metrics_endpoint():
+        """Prometheus metrics endpoint."""
+        return PlainTextResponse(
+            metrics.render(),
+            media_type="text/plain; version=0.0.4"
+        )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
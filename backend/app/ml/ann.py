@@ -0,0 +1,446 @@
+"""
+Approximate nearest-neighbour candidate retrieval for donor matching.
+
+Campaigns and donors are embedded in one fixed-length space:
+
+- need: community poverty index / donor interest in education, water, sanitation
+- health gap: 100 - menstrual health score / donor interest in health
+- reach: girls in the community / donor interest in girls
+- small and large goal / donor budget range
+- hashed country and region buckets / donor preferred regions
+
+Vectors are L2-normalized, so inner product is cosine similarity. Active
+campaigns are held in an IVF index: spherical k-means splits them into
+about sqrt(n) lists, and a query scans only the `n_probe` lists whose
+centroids are closest. Adds and removes go to the nearest existing list;
+once the list count is more than `RETRAIN_FACTOR` away from sqrt(n), the
+centroids are retrained, so an index started on a small catalogue does not
+stay a linear scan. DonorMatcher re-ranks the retrieved candidates with its
+exact scorer.
+
+Campaign vectors include their community's attributes, so a community
+update re-indexes that community's active campaigns.
+"""
+import logging
+import math
+import os
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import Campaign, CampaignStatus, Community
+
+logger = logging.getLogger(__name__)
+
+REGION_BUCKETS = 16
+DIMENSIONS = 5 + REGION_BUCKETS
+NEED, HEALTH_GAP, REACH, SMALL_GOAL, LARGE_GOAL = range(5)
+CAUSE_DIMENSIONS = {
+    "education": NEED, "water": NEED, "sanitation": NEED,
+    "health": HEALTH_GAP, "girls": REACH,
+}
+BUDGET_GOALS = {"small": (1.0, 0.0), "medium": (0.5, 0.5), "large": (0.0, 1.0)}
+FORMAT_VERSION = 1
+INDEXED_ATTRIBUTES = ("status", "goal_amount", "community_id")
+COMMUNITY_ATTRIBUTES = ("poverty_index", "menstrual_health_score", "girls_count", "country", "region")
+# Retrain once the list count is off from sqrt(n) by more than this factor
+RETRAIN_FACTOR = 2.0
+
+
+def _region_bucket(name: str) -> int:
+    return 5 + zlib.crc32(name.strip().lower().encode()) % REGION_BUCKETS
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def campaign_vector(
+    goal_amount: Optional[float],
+    poverty_index: Optional[float],
+    menstrual_health_score: Optional[float],
+    girls_count: Optional[int],
+    country: Optional[str],
+    region: Optional[str]
+) -> np.ndarray:
+    """Embed a campaign from its goal and its community's attributes."""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    vector[NEED] = 0.5 if poverty_index is None else min(max(poverty_index, 0.0), 1.0)
+    vector[HEALTH_GAP] = 0.5 if menstrual_health_score is None else min(
+        max(1.0 - menstrual_health_score / 100.0, 0.0), 1.0
+    )
+    vector[REACH] = 0.5 if not girls_count else min(
+        math.log1p(girls_count) / math.log1p(50_000), 1.0
+    )
+    # $1k goals map to 0 and $100k goals to 1
+    size = 0.5 if not goal_amount else min(max((math.log10(goal_amount) - 3) / 2, 0.0), 1.0)
+    vector[SMALL_GOAL] = 1.0 - size
+    vector[LARGE_GOAL] = size
+    if country:
+        vector[_region_bucket(country)] += 1.0
+    if region:
+        vector[_region_bucket(region)] += 0.5
+    return _normalize(vector)
+
+
+def donor_vector(
+    causes: Optional[Iterable[str]],
+    budget_range: Optional[str],
+    preferred_regions: Optional[Iterable[str]]
+) -> np.ndarray:
+    """Embed a donor from their causes, budget range and preferred regions."""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for cause in causes or ():
+        dimension = CAUSE_DIMENSIONS.get(str(cause).lower())
+        if dimension is not None:
+            vector[dimension] = 1.0
+    if not vector[:SMALL_GOAL].any():
+        vector[:SMALL_GOAL] = 0.5
+    small, large = BUDGET_GOALS.get(budget_range or "", (0.5, 0.5))
+    vector[SMALL_GOAL] = small
+    vector[LARGE_GOAL] = large
+    for region in preferred_regions or ():
+        vector[_region_bucket(str(region))] = 1.0
+    return _normalize(vector)
+
+
+class IVFIndex:
+    """Inverted-file index over normalized vectors with incremental add/remove."""
+
+    def __init__(self, dimensions: int = DIMENSIONS, n_probe: int = 8, seed: int = 0):
+        self.dimensions = dimensions
+        self.n_probe = n_probe
+        self.seed = seed
+        self.centroids = np.zeros((1, dimensions), dtype=np.float32)
+        self._ids: List[np.ndarray] = [np.empty(0, dtype=np.int64)]
+        self._vectors: List[np.ndarray] = [np.empty((0, dimensions), dtype=np.float32)]
+        self._list_of: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._list_of)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._list_of
+
+    def ids(self) -> List[int]:
+        return list(self._list_of)
+
+    @staticmethod
+    def target_lists(n: int) -> int:
+        return max(1, int(math.sqrt(n)))
+
+    def drifted(self) -> bool:
+        """Whether the list count is more than RETRAIN_FACTOR away from sqrt(n)."""
+        ratio = len(self.centroids) / self.target_lists(len(self))
+        return ratio > RETRAIN_FACTOR or ratio * RETRAIN_FACTOR < 1
+
+    def retrain(self) -> "IVFIndex":
+        """Rebuild the lists from the vectors held."""
+        return self.build(np.concatenate(self._ids), np.concatenate(self._vectors))
+
+    def build(self, ids: Sequence[int], vectors: np.ndarray, iterations: int = 10) -> "IVFIndex":
+        """Train the centroids with spherical k-means and assign every vector."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        n_lists = self.target_lists(len(ids))
+        rng = np.random.default_rng(self.seed)
+        if len(ids) > n_lists:
+            centroids = vectors[rng.choice(len(ids), n_lists, replace=False)].copy()
+            # Train on a sample; assignment quality barely improves past ~256 per list
+            sample = vectors[rng.choice(len(ids), min(len(ids), n_lists * 256), replace=False)]
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                filled = norms[:, 0] > 0
+                centroids[filled] = sums[filled] / norms[filled]
+        else:
+            centroids = np.zeros((1, self.dimensions), dtype=np.float32)
+        self.centroids = centroids.astype(np.float32)
+        labels = self._assign(vectors)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(len(self.centroids) + 1))
+        self._ids = [ids[order[bounds[i]:bounds[i + 1]]] for i in range(len(self.centroids))]
+        self._vectors = [vectors[order[bounds[i]:bounds[i + 1]]] for i in range(len(self.centroids))]
+        self._list_of = {int(item): int(label) for item, label in zip(ids, labels)}
+        return self
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if len(self.centroids) == 1:
+            return np.zeros(len(vectors), dtype=np.int64)
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def add(self, item_id: int, vector: np.ndarray) -> None:
+        """Insert or replace one vector."""
+        self._remove(item_id)
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, self.dimensions)
+        label = int(self._assign(vector)[0])
+        self._ids[label] = np.append(self._ids[label], item_id)
+        self._vectors[label] = np.concatenate([self._vectors[label], vector])
+        self._list_of[item_id] = label
+        if self.drifted():
+            self.retrain()
+
+    def remove(self, item_id: int) -> bool:
+        removed = self._remove(item_id)
+        if removed and self.drifted():
+            self.retrain()
+        return removed
+
+    def _remove(self, item_id: int) -> bool:
+        label = self._list_of.pop(item_id, None)
+        if label is None:
+            return False
+        keep = self._ids[label] != item_id
+        self._ids[label] = self._ids[label][keep]
+        self._vectors[label] = self._vectors[label][keep]
+        return True
+
+    def search(self, query: np.ndarray, k: int, n_probe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Approximate top-k by inner product, scanning the closest lists only."""
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        probes = np.argsort(-(self.centroids @ query))[:n_probe]
+        return self._top_k(
+            np.concatenate([self._ids[p] for p in probes]),
+            np.concatenate([self._vectors[p] for p in probes]),
+            query, k,
+        )
+
+    def exact_search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        return self._top_k(np.concatenate(self._ids), np.concatenate(self._vectors), query, k)
+
+    @staticmethod
+    def _top_k(ids: np.ndarray, vectors: np.ndarray, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if not len(ids):
+            return []
+        scores = vectors @ query
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return list(zip(ids[top].tolist(), scores[top].tolist()))
+
+    def recall(self, queries: Iterable[np.ndarray], k: int, n_probe: Optional[int] = None) -> float:
+        """Mean recall@k of `search` against `exact_search`.
+
+        Items tied with the k-th exact score count as correct.
+        """
+        recalls = []
+        for query in queries:
+            exact = self.exact_search(query, k)
+            if not exact:
+                continue
+            threshold = exact[-1][1] - 1e-6
+            found = self.search(query, k, n_probe)
+            recalls.append(sum(1 for _, score in found if score >= threshold) / len(exact))
+        return float(np.mean(recalls)) if recalls else 1.0
+
+    def save(self, path: str) -> None:
+        """Write the index atomically as a .npz file."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        sizes = np.array([len(ids) for ids in self._ids], dtype=np.int64)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as handle:
+            np.savez(
+                handle,
+                version=np.array(FORMAT_VERSION),
+                centroids=self.centroids,
+                sizes=sizes,
+                ids=np.concatenate(self._ids),
+                vectors=np.concatenate(self._vectors),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, n_probe: int = 8) -> "IVFIndex":
+        with np.load(path) as data:
+            if int(data["version"]) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported index format in {path}")
+            centroids = data["centroids"]
+            index = cls(dimensions=centroids.shape[1], n_probe=n_probe)
+            index.centroids = centroids
+            bounds = np.concatenate([[0], np.cumsum(data["sizes"])])
+            ids, vectors = data["ids"], data["vectors"]
+        index._ids = [ids[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+        index._vectors = [vectors[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+        index._list_of = {
+            int(item): label for label, items in enumerate(index._ids) for item in items
+        }
+        return index
+
+
+def _campaign_rows(
+    db_or_connection,
+    campaign_ids: Optional[List[int]] = None,
+    community_id: Optional[int] = None
+):
+    query = (
+        select(
+            Campaign.id, Campaign.goal_amount, Community.poverty_index,
+            Community.menstrual_health_score, Community.girls_count,
+            Community.country, Community.region,
+        )
+        .outerjoin(Community, Community.id == Campaign.community_id)
+        .where(Campaign.status == CampaignStatus.ACTIVE)
+    )
+    if campaign_ids is not None:
+        query = query.where(Campaign.id.in_(campaign_ids))
+    if community_id is not None:
+        query = query.where(Campaign.community_id == community_id)
+    return db_or_connection.execute(query).all()
+
+
+def _vectors(rows) -> np.ndarray:
+    return np.array(
+        [campaign_vector(*row[1:]) for row in rows], dtype=np.float32
+    ).reshape(-1, DIMENSIONS)
+
+
+class CampaignIndex:
+    """IVF index of active campaigns, persisted and kept current by ORM events."""
+
+    def __init__(self, path: str, n_probe: int = 8):
+        self.path = path
+        self.n_probe = n_probe
+        self.index: Optional[IVFIndex] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.index) if self.index is not None else 0
+
+    def active_count(self, db: Session) -> int:
+        """Campaigns the index holds, or would hold once built."""
+        if self.index is not None:
+            return len(self.index)
+        return db.scalar(
+            select(func.count()).select_from(Campaign).where(Campaign.status == CampaignStatus.ACTIVE)
+        ) or 0
+
+    def rebuild(self, db: Session) -> IVFIndex:
+        """Retrain from every active campaign and persist."""
+        rows = _campaign_rows(db)
+        index = IVFIndex(n_probe=self.n_probe).build([row.id for row in rows], _vectors(rows))
+        with self._lock:
+            self.index = index
+        index.save(self.path)
+        return index
+
+    def ensure_ready(self, db: Session) -> None:
+        """Load the persisted index, or build it, and reconcile it with the database."""
+        if self.index is not None:
+            return
+        with self._lock:
+            if self.index is not None:
+                return
+            index = None
+            if os.path.exists(self.path):
+                try:
+                    index = IVFIndex.load(self.path, self.n_probe)
+                except (OSError, ValueError, KeyError) as exc:
+                    logger.warning("Rebuilding campaign index, could not load %s: %s", self.path, exc)
+            if index is None:
+                rows = _campaign_rows(db)
+                index = IVFIndex(n_probe=self.n_probe).build([row.id for row in rows], _vectors(rows))
+            else:
+                # Campaigns that started or ended while the index was on disk
+                active = set(db.execute(
+                    select(Campaign.id).where(Campaign.status == CampaignStatus.ACTIVE)
+                ).scalars())
+                for stale in set(index.ids()) - active:
+                    index.remove(stale)
+                missing = list(active - set(index.ids()))
+                if missing:
+                    rows = _campaign_rows(db, missing)
+                    for row, vector in zip(rows, _vectors(rows)):
+                        index.add(row.id, vector)
+                if index.drifted():
+                    index.retrain()
+            self.index = index
+        try:
+            index.save(self.path)
+        except OSError as exc:
+            logger.warning("Could not persist campaign index to %s: %s", self.path, exc)
+
+    def candidates(self, query: np.ndarray, k: int) -> List[int]:
+        if self.index is None:
+            return []
+        return [item for item, _ in self.index.search(query, k)]
+
+    def discard(self, campaign_ids: Iterable[int]) -> None:
+        if self.index is None:
+            return
+        with self._lock:
+            for campaign_id in campaign_ids:
+                self.index.remove(campaign_id)
+
+    def refresh_campaigns(self, db_or_connection, campaign_ids: List[int]) -> None:
+        """Re-read campaigns changed outside the ORM: index active ones, drop the rest."""
+        if self.index is None or not campaign_ids:
+            return
+        rows = _campaign_rows(db_or_connection, campaign_ids)
+        with self._lock:
+            for row, vector in zip(rows, _vectors(rows)):
+                self.index.add(row.id, vector)
+            active = {row.id for row in rows}
+            for campaign_id in campaign_ids:
+                if campaign_id not in active:
+                    self.index.remove(campaign_id)
+
+    def refresh_community(self, db_or_connection, community_id: int) -> None:
+        """Re-embed the active campaigns of a community whose attributes changed."""
+        if self.index is None:
+            return
+        rows = _campaign_rows(db_or_connection, community_id=community_id)
+        with self._lock:
+            for row, vector in zip(rows, _vectors(rows)):
+                self.index.add(row.id, vector)
+
+    def _on_change(self, connection, target: Campaign) -> None:
+        if self.index is None:
+            return
+        with self._lock:
+            if target.status == CampaignStatus.ACTIVE:
+                rows = _campaign_rows(connection, [target.id])
+                if rows:
+                    self.index.add(target.id, _vectors(rows)[0])
+            else:
+                self.index.remove(target.id)
+
+
+campaign_index = CampaignIndex(
+    os.path.join(settings.ml_models_path, "campaign_ivf.npz"),
+    n_probe=settings.ann_probe
+)
+
+
+@event.listens_for(Campaign, "after_insert")
+def _index_new_campaign(mapper, connection, target: Campaign) -> None:
+    campaign_index._on_change(connection, target)
+
+
+@event.listens_for(Campaign, "after_update")
+def _index_campaign(mapper, connection, target: Campaign) -> None:
+    # View counters and the like do not move a campaign in the index
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in INDEXED_ATTRIBUTES):
+        campaign_index._on_change(connection, target)
+
+
+@event.listens_for(Campaign, "after_delete")
+def _unindex_campaign(mapper, connection, target: Campaign) -> None:
+    campaign_index.discard([target.id])
+
+
+@event.listens_for(Community, "after_update")
+def _reindex_community_campaigns(mapper, connection, target: Community) -> None:
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in COMMUNITY_ATTRIBUTES):
+        campaign_index.refresh_community(connection, target.id)
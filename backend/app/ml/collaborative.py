@@ -0,0 +1,253 @@
+"""
+Item-item collaborative filtering over completed donations.
+
+Donations form a sparse binary donor x campaign matrix X. Campaign-campaign
+cosine similarity is (X^T X)[i, j] / sqrt(n_i * n_j), where n_i is the number
+of donors of campaign i. It is computed with sparse products in row blocks,
+and only the top-k neighbours of each campaign are kept. Recommending for a
+donor is then a lookup: sum the neighbour lists of the campaigns they gave to.
+
+New donations update the model in place: the donated campaign's neighbour
+list is recomputed, and its similarity is refreshed in the lists of the
+donor's other campaigns. Lists that only drift because n_i grew are corrected
+at the next full `fit`.
+
+The model does not read donations itself: callers hand it a frame of them,
+or a loader for the first use, so it works over wherever they are stored.
+"""
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sqlalchemy import event
+from app.core.config import settings
+from app.ml.features import became_completed
+from app.models.models import Donation
+
+COMPLETED = "completed"
+
+# (neighbour campaign ids, similarities), sorted by similarity descending
+Neighbours = Tuple[np.ndarray, np.ndarray]
+_EMPTY: Neighbours = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+
+class ItemItemRecommender:
+    """Top-k item-item cosine neighbours with incremental updates."""
+
+    def __init__(self, neighbours: int = 50, block_size: int = 2048):
+        self.k = neighbours
+        self.block_size = block_size
+        self.fitted = False
+        self._neighbours: Dict[int, Neighbours] = {}
+        # Donations as of the last fit, in CSR (by donor) and CSC (by campaign)
+        self._by_donor: sparse.csr_matrix = sparse.csr_matrix((0, 0))
+        self._by_campaign: sparse.csc_matrix = sparse.csc_matrix((0, 0))
+        self._donor_index: Dict[int, int] = {}
+        self._campaign_ids = np.empty(0, dtype=np.int64)
+        self._campaign_index: Dict[int, int] = {}
+        self._donor_ids = np.empty(0, dtype=np.int64)
+        # Donations applied since the last fit
+        self._new_by_donor: Dict[int, Set[int]] = defaultdict(set)
+        self._new_by_campaign: Dict[int, Set[int]] = defaultdict(set)
+        self._lock = threading.RLock()
+
+    # Fitting
+
+    def fit(self, donor_ids: Iterable[int], campaign_ids: Iterable[int]) -> "ItemItemRecommender":
+        """Rebuild the model from (donor, campaign) pairs of completed donations."""
+        donors = np.asarray(donor_ids, dtype=np.int64)
+        campaigns = np.asarray(campaign_ids, dtype=np.int64)
+        donor_uniques, donor_idx = np.unique(donors, return_inverse=True)
+        campaign_uniques, campaign_idx = np.unique(campaigns, return_inverse=True)
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(donors), dtype=np.float32), (donor_idx, campaign_idx)),
+            shape=(len(donor_uniques), len(campaign_uniques)),
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1.0  # repeat donations to a campaign count once
+
+        neighbours = self._top_k(matrix, campaign_uniques)
+        with self._lock:
+            self._by_donor = matrix
+            self._by_campaign = matrix.tocsc()
+            self._donor_ids = donor_uniques
+            self._donor_index = {int(d): i for i, d in enumerate(donor_uniques)}
+            self._campaign_ids = campaign_uniques
+            self._campaign_index = {int(c): i for i, c in enumerate(campaign_uniques)}
+            self._new_by_donor = defaultdict(set)
+            self._new_by_campaign = defaultdict(set)
+            self._neighbours = neighbours
+            self.fitted = True
+        return self
+
+    def fit_frame(self, frame: pd.DataFrame) -> "ItemItemRecommender":
+        """Rebuild the model from completed donations with donor_id and campaign_id columns."""
+        pairs = frame[["donor_id", "campaign_id"]].dropna().to_numpy(dtype=np.int64).reshape(-1, 2)
+        return self.fit(pairs[:, 0], pairs[:, 1])
+
+    def ensure_fitted(self, load: Callable[[], pd.DataFrame]) -> None:
+        """Fit on the frame `load` returns, unless already fitted."""
+        if self.fitted:
+            return
+        with self._lock:
+            if not self.fitted:
+                self.fit_frame(load())
+
+    def _top_k(self, matrix: sparse.csr_matrix, campaign_ids: np.ndarray) -> Dict[int, Neighbours]:
+        n_campaigns = matrix.shape[1]
+        supports = np.asarray(matrix.sum(axis=0)).ravel()
+        norms = np.sqrt(supports)
+        transposed = matrix.T.tocsr()
+        neighbours: Dict[int, Neighbours] = {}
+        for start in range(0, n_campaigns, self.block_size):
+            stop = min(start + self.block_size, n_campaigns)
+            # Co-donation counts of campaigns [start, stop) with every campaign
+            block = (transposed[start:stop] @ matrix).tocsr()
+            for row in range(stop - start):
+                item = start + row
+                lo, hi = block.indptr[row], block.indptr[row + 1]
+                cols = block.indices[lo:hi]
+                keep = cols != item
+                cols = cols[keep]
+                if not len(cols):
+                    neighbours[int(campaign_ids[item])] = _EMPTY
+                    continue
+                sims = block.data[lo:hi][keep] / (norms[item] * norms[cols])
+                neighbours[int(campaign_ids[item])] = self._select(campaign_ids[cols], sims)
+        return neighbours
+
+    def _select(self, ids: np.ndarray, sims: np.ndarray) -> Neighbours:
+        if len(sims) > self.k:
+            top = np.argpartition(-sims, self.k - 1)[:self.k]
+            ids, sims = ids[top], sims[top]
+        order = np.argsort(-sims, kind="stable")
+        return ids[order].astype(np.int64), sims[order].astype(np.float64)
+
+    # Incremental updates
+
+    def _campaigns_of(self, donor_id: int) -> Set[int]:
+        campaigns = set(self._new_by_donor.get(donor_id, ()))
+        row = self._donor_index.get(donor_id)
+        if row is not None:
+            lo, hi = self._by_donor.indptr[row], self._by_donor.indptr[row + 1]
+            campaigns.update(self._campaign_ids[self._by_donor.indices[lo:hi]].tolist())
+        return campaigns
+
+    def _donors_of(self, campaign_id: int) -> Set[int]:
+        donors = set(self._new_by_campaign.get(campaign_id, ()))
+        col = self._campaign_index.get(campaign_id)
+        if col is not None:
+            lo, hi = self._by_campaign.indptr[col], self._by_campaign.indptr[col + 1]
+            donors.update(self._donor_ids[self._by_campaign.indices[lo:hi]].tolist())
+        return donors
+
+    def _support(self, campaign_id: int) -> int:
+        # Pairs in the delta are never already in the fitted matrix
+        support = len(self._new_by_campaign.get(campaign_id, ()))
+        col = self._campaign_index.get(campaign_id)
+        if col is not None:
+            support += int(self._by_campaign.indptr[col + 1] - self._by_campaign.indptr[col])
+        return support
+
+    def _supports(self, campaign_ids: np.ndarray) -> np.ndarray:
+        """Vectorized `_support` for an array of campaign ids."""
+        supports = np.zeros(len(campaign_ids), dtype=np.float64)
+        if len(self._campaign_ids):
+            cols = np.searchsorted(self._campaign_ids, campaign_ids)
+            cols = np.minimum(cols, len(self._campaign_ids) - 1)
+            fitted = self._campaign_ids[cols] == campaign_ids
+            supports[fitted] = np.diff(self._by_campaign.indptr)[cols[fitted]]
+        for i, campaign_id in enumerate(campaign_ids.tolist()):
+            delta = self._new_by_campaign.get(campaign_id)
+            if delta:
+                supports[i] += len(delta)
+        return supports
+
+    def add_donation(self, donor_id: int, campaign_id: int) -> bool:
+        """Apply one completed donation; returns False if it changes nothing."""
+        if not self.fitted:
+            return False
+        with self._lock:
+            history = self._campaigns_of(donor_id)
+            if campaign_id in history:
+                return False
+            self._new_by_donor[donor_id].add(campaign_id)
+            self._new_by_campaign[campaign_id].add(donor_id)
+
+            # Recompute the donated campaign's row from its co-donors: fitted
+            # co-donors are counted with one sparse row gather, delta ones by hand
+            ids_parts: List[np.ndarray] = []
+            col = self._campaign_index.get(campaign_id)
+            if col is not None:
+                lo, hi = self._by_campaign.indptr[col], self._by_campaign.indptr[col + 1]
+                rows = self._by_campaign.indices[lo:hi]
+                ids_parts.append(self._campaign_ids[self._by_donor[rows].indices])
+                for other_donor in self._donor_ids[rows].tolist():
+                    ids_parts.append(np.fromiter(self._new_by_donor.get(other_donor, ()), np.int64))
+            for other_donor in self._new_by_campaign[campaign_id]:
+                ids_parts.append(np.fromiter(self._campaigns_of(other_donor), np.int64))
+            ids, counts = np.unique(np.concatenate(ids_parts), return_counts=True)
+            keep = ids != campaign_id
+            ids, counts = ids[keep], counts[keep]
+            co_counts = dict(zip(ids.tolist(), counts.tolist()))
+            support = self._support(campaign_id)
+            if len(ids):
+                other_supports = self._supports(ids)
+                sims = counts / np.sqrt(support * other_supports)
+                self._neighbours[campaign_id] = self._select(ids, sims)
+            else:
+                self._neighbours[campaign_id] = _EMPTY
+
+            # Refresh campaign_id in the lists of the donor's other campaigns
+            for other in history:
+                sim = co_counts.get(other, 0) / np.sqrt(support * self._support(other))
+                ids, sims = self._neighbours.get(other, _EMPTY)
+                keep = ids != campaign_id
+                self._neighbours[other] = self._select(
+                    np.append(ids[keep], campaign_id), np.append(sims[keep], sim)
+                )
+        return True
+
+    # Serving
+
+    def similar(self, campaign_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+        ids, sims = self._neighbours.get(campaign_id, _EMPTY)
+        return list(zip(ids[:limit].tolist(), sims[:limit].tolist()))
+
+    def scores(self, donor_id: int) -> Dict[int, float]:
+        """Campaigns the donor has not given to, scored by summed similarity."""
+        history = self._campaigns_of(donor_id)
+        if not history:
+            return {}
+        lists = [self._neighbours.get(c, _EMPTY) for c in history]
+        ids = np.concatenate([ids for ids, _ in lists])
+        if not len(ids):
+            return {}
+        sims = np.concatenate([sims for _, sims in lists])
+        uniques, inverse = np.unique(ids, return_inverse=True)
+        totals = np.bincount(inverse, weights=sims)
+        return {
+            int(c): float(s) for c, s in zip(uniques, totals) if int(c) not in history
+        }
+
+    def recommend(self, donor_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+        scored = self.scores(donor_id)
+        return sorted(scored.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+item_recommender = ItemItemRecommender(neighbours=settings.collaborative_neighbours)
+
+
+@event.listens_for(Donation, "after_insert")
+def _apply_donation(mapper, connection, target: Donation) -> None:
+    if target.status == COMPLETED and target.donor_id and target.campaign_id:
+        item_recommender.add_donation(target.donor_id, target.campaign_id)
+
+
+@event.listens_for(Donation, "after_update")
+def _apply_completed_donation(mapper, connection, target: Donation) -> None:
+    if became_completed(target) and target.donor_id and target.campaign_id:
+        item_recommender.add_donation(target.donor_id, target.campaign_id)
@@ -0,0 +1,237 @@
+"""
+Compact in-memory donor feature store.
+
+Donor profiles are held as NumPy columns indexed directly by user id, instead
+of ORM objects with JSON lists. Causes and preferred regions are bitmasks
+over small vocabularies, the budget range is a small integer code, and
+`average_donation` and `donation_count` are plain numeric columns. That comes
+to 26 bytes per donor. The store is loaded once, and then kept current
+by DonorProfile and Donation ORM events.
+"""
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from app.models.models import Donation, DonorProfile
+
+CAUSES = ["health", "education", "girls", "water", "sanitation"]
+BUDGETS = ["small", "medium", "large"]  # stored as 1, 2, 3; 0 is unknown
+MAX_VOCABULARY = 64
+OTHER = MAX_VOCABULARY - 1  # bit shared by names beyond the vocabulary limit
+
+
+class Vocabulary:
+    """Maps names to bit positions, growing as new names appear."""
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: List[str] = []
+        self._bits: Dict[str, int] = {}
+        for name in names:
+            self.bit(name)
+
+    def bit(self, name: str) -> int:
+        key = str(name).strip().lower()
+        bit = self._bits.get(key)
+        if bit is None:
+            bit = len(self.names) if len(self.names) < OTHER else OTHER
+            if bit != OTHER:
+                self.names.append(key)
+            self._bits[key] = bit
+        return bit
+
+    def mask(self, names: Optional[Iterable[str]]) -> int:
+        mask = 0
+        for name in names or ():
+            mask |= 1 << self.bit(name)
+        return mask
+
+    def mask_of(self, *names: str) -> int:
+        return self.mask(names)
+
+    def decode(self, mask: int) -> List[str]:
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+
+
+class DonorFeatures(NamedTuple):
+    user_id: int
+    cause_mask: int
+    region_mask: int
+    budget: int
+    average_donation: float
+    donation_count: int
+
+
+class DonorFeatureStore:
+    """Array-backed donor features keyed by user id."""
+
+    def __init__(self, initial_capacity: int = 1024):
+        self.causes = Vocabulary(CAUSES)
+        self.regions = Vocabulary()
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._allocate(initial_capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self.present = np.zeros(capacity, dtype=bool)
+        self.cause_mask = np.zeros(capacity, dtype=np.uint64)
+        self.region_mask = np.zeros(capacity, dtype=np.uint64)
+        self.budget = np.zeros(capacity, dtype=np.int8)
+        self.average_donation = np.zeros(capacity, dtype=np.float32)
+        self.donation_count = np.zeros(capacity, dtype=np.int32)
+
+    def _reserve(self, max_user_id: int) -> None:
+        capacity = len(self.present)
+        if max_user_id < capacity:
+            return
+        while capacity <= max_user_id:
+            capacity *= 2
+        for name in ("present", "cause_mask", "region_mask", "budget",
+                     "average_donation", "donation_count"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def __len__(self) -> int:
+        return int(self.present.sum())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in (
+            "present", "cause_mask", "region_mask", "budget",
+            "average_donation", "donation_count",
+        ))
+
+    def load(self, db: Session, batch_size: int = 50_000) -> "DonorFeatureStore":
+        """Read every DonorProfile once, encoding in batches."""
+        rows = db.execute(
+            select(
+                DonorProfile.user_id, DonorProfile.causes, DonorProfile.preferred_regions,
+                DonorProfile.budget_range, DonorProfile.average_donation,
+                DonorProfile.donation_count,
+            ).where(DonorProfile.user_id.is_not(None)).execution_options(yield_per=batch_size)
+        )
+        with self._lock:
+            self._allocate(len(self.present))
+            for batch in rows.partitions():
+                self._set_many(batch)
+            self.loaded = True
+        return self
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                self.load(db)
+
+    def _set_many(self, rows) -> None:
+        user_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        if not len(user_ids):
+            return
+        self._reserve(int(user_ids.max()))
+        self.present[user_ids] = True
+        self.cause_mask[user_ids] = np.array(
+            [self.causes.mask(row[1]) for row in rows], dtype=np.uint64
+        )
+        self.region_mask[user_ids] = np.array(
+            [self.regions.mask(row[2]) for row in rows], dtype=np.uint64
+        )
+        self.budget[user_ids] = [_budget_code(row[3]) for row in rows]
+        self.average_donation[user_ids] = [row[4] or 0.0 for row in rows]
+        self.donation_count[user_ids] = [row[5] or 0 for row in rows]
+
+    def update_profile(self, profile: DonorProfile) -> None:
+        if not self.loaded or profile.user_id is None:
+            return
+        with self._lock:
+            self._set_many([(
+                profile.user_id, profile.causes, profile.preferred_regions,
+                profile.budget_range, profile.average_donation, profile.donation_count,
+            )])
+
+    def record_donation(self, user_id: int, amount: float) -> None:
+        """Fold one completed donation into the donor's count and average."""
+        if not self.loaded or user_id is None:
+            return
+        with self._lock:
+            # Donors without a profile are scored as such until they create one
+            if user_id >= len(self.present) or not self.present[user_id]:
+                return
+            count = int(self.donation_count[user_id])
+            average = float(self.average_donation[user_id])
+            self.donation_count[user_id] = count + 1
+            self.average_donation[user_id] = (average * count + (amount or 0.0)) / (count + 1)
+
+    def remove(self, user_id: int) -> None:
+        if self.loaded and user_id is not None and user_id < len(self.present):
+            self.present[user_id] = False
+
+    def get(self, user_id: int) -> Optional[DonorFeatures]:
+        if user_id is None or user_id >= len(self.present) or not self.present[user_id]:
+            return None
+        return DonorFeatures(
+            user_id,
+            int(self.cause_mask[user_id]),
+            int(self.region_mask[user_id]),
+            int(self.budget[user_id]),
+            float(self.average_donation[user_id]),
+            int(self.donation_count[user_id]),
+        )
+
+    def decode(self, features: DonorFeatures) -> Dict[str, object]:
+        """Profile-shaped view of one donor, for code that needs the names."""
+        return {
+            "causes": self.causes.decode(features.cause_mask),
+            "preferred_regions": self.regions.decode(features.region_mask),
+            "budget_range": BUDGETS[features.budget - 1] if features.budget else None,
+            "average_donation": features.average_donation,
+            "donation_count": features.donation_count,
+        }
+
+
+def _budget_code(budget_range: Optional[str]) -> int:
+    if not budget_range:
+        return 0
+    try:
+        return BUDGETS.index(budget_range.strip().lower()) + 1
+    except ValueError:
+        return 0
+
+
+donor_features = DonorFeatureStore()
+
+
+@event.listens_for(DonorProfile, "after_insert")
+@event.listens_for(DonorProfile, "after_update")
+def _update_donor_features(mapper, connection, target: DonorProfile) -> None:
+    donor_features.update_profile(target)
+
+
+@event.listens_for(DonorProfile, "after_delete")
+def _remove_donor_features(mapper, connection, target: DonorProfile) -> None:
+    donor_features.remove(target.user_id)
+
+
+def became_completed(target: Donation) -> bool:
+    """Whether the update being flushed moved `target` to completed from another status."""
+    history = inspect(target).attrs.status.history
+    return target.status == "completed" and bool(history.deleted) and history.deleted[0] != "completed"
+
+
+# Load the old status on assignment, so updates can tell a transition apart
+event.listen(Donation.status, "set", lambda target, value, old, initiator: value,
+             active_history=True, retval=True)
+
+
+@event.listens_for(Donation, "after_insert")
+def _record_donation_features(mapper, connection, target: Donation) -> None:
+    if target.status == "completed":
+        donor_features.record_donation(target.donor_id, target.amount)
+
+
+@event.listens_for(Donation, "after_update")
+def _record_completed_donation_features(mapper, connection, target: Donation) -> None:
+    if became_completed(target):
+        donor_features.record_donation(target.donor_id, target.amount)
@@ -1,9 +1,15 @@
 """ML predictive models and algorithms."""
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
 from datetime import datetime
 import numpy as np
+import pandas as pd
 from sqlalchemy.orm import Session
-from app.models.models import Campaign, Community, Donation, DonorProfile, User
+from app.core.cache import community_cache
+from app.core.config import settings
+from app.ml.ann import CampaignIndex, campaign_index, donor_vector
+from app.ml.collaborative import ItemItemRecommender, item_recommender
+from app.ml.features import DonorFeatures, DonorFeatureStore, donor_features
+from app.models.models import Campaign, Community, Donation, User
 from app.schemas.schemas import (
     DonorMatchResponse, ImpactPredictionResponse, StoryGenerationResponse
 )
@@ -17,93 +23,164 @@ class DonorMatcher:
     - Cause alignment
     - Donation history
     - Campaign needs
+    - Campaigns funded by donors with similar giving (item-item collaborative filtering)
+    
+    Donor attributes come from the in-memory feature store, so matching does
+    not load or parse DonorProfile rows. `donations` returns the completed
+    donations (donor_id, campaign_id) the collaborative model is fitted on.
     """
     
+    def __init__(
+        self,
+        donations: Callable[[Session], pd.DataFrame],
+        collaborative: ItemItemRecommender = item_recommender,
+        candidate_index: Optional[CampaignIndex] = campaign_index,
+        features: DonorFeatureStore = donor_features
+    ):
+        self.donations = donations
+        self.collaborative = collaborative
+        self.candidate_index = candidate_index
+        self.features = features
+        self._aligned_causes = features.causes.mask_of("health", "education")
+        self._health = features.causes.mask_of("health")
+    
     def find_matches(self, donor_id: int, limit: int, db: Session) -> List[DonorMatchResponse]:
         """Find best matching campaigns for a donor."""
-        # Get donor profile
-        donor = db.query(User).filter(User.id == donor_id).first()
+        donor = db.query(User.id).filter(User.id == donor_id).first()
         if not donor:
             return []
         
-        donor_profile = db.query(DonorProfile).filter(
-            DonorProfile.user_id == donor_id
-        ).first()
-        
-        # Get active campaigns
-        campaigns = db.query(Campaign).filter(
-            Campaign.status == "active"
-        ).all()
-        
-        # Score campaigns
-        matches = []
-        for campaign in campaigns:
-            score = self._calculate_match_score(donor, donor_profile, campaign)
-            reason = self._get_match_reason(donor_profile, campaign)
-            
-            matches.append({
-                "campaign_id": campaign.id,
-                "campaign_title": campaign.title,
-                "match_score": score,
-                "match_reason": reason
-            })
+        self.prepare(db)
+        # Get active campaigns, narrowed to retrieved candidates when the
+        # catalogue is large enough for the ANN index to pay off
+        candidate_ids = self.candidate_ids(db, donor_id)
+        query = db.query(Campaign).filter(Campaign.status == "active")
+        if candidate_ids is not None:
+            query = query.filter(Campaign.id.in_(candidate_ids))
+        campaigns = query.all()
+        
+        return self.rank_campaigns(donor_id, campaigns, limit)
+    
+    def prepare(self, db: Session) -> None:
+        """Load the feature store and collaborative model on first use."""
+        self.features.ensure_loaded(db)
+        self.collaborative.ensure_fitted(lambda: self.donations(db))
+    
+    def reload(self, db: Session) -> None:
+        """Reload the feature store and refit the collaborative model."""
+        self.features.load(db)
+        self.collaborative.fit_frame(self.donations(db))
+    
+    def candidate_ids(self, db: Session, donor_id: int) -> Optional[List[int]]:
+        """Campaign ids to re-rank exactly, or None to score every active campaign."""
+        if self.candidate_index is None or not settings.ann_enabled:
+            return None
+        # Small catalogues are scored exactly, without loading the index
+        if self.candidate_index.active_count(db) < settings.ann_min_campaigns:
+            return None
+        self.candidate_index.ensure_ready(db)
+        features = self.features.get(donor_id)
+        profile = self.features.decode(features) if features else {}
+        query = donor_vector(
+            profile.get("causes"), profile.get("budget_range"), profile.get("preferred_regions")
+        )
+        ids = set(self.candidate_index.candidates(query, settings.ann_candidates))
+        # Keep campaigns similar donors funded even if they embed far away
+        ids.update(c for c, _ in self.collaborative.recommend(donor_id, settings.ann_candidates))
+        return list(ids)
+    
+    def rank_campaigns(
+        self,
+        donor_id: int,
+        campaigns: List[Campaign],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Score campaigns for one donor and return the best `limit` matches."""
+        if not campaigns:
+            return []
+        features = self.features.get(donor_id)
+        goals = np.fromiter(
+            (c.goal_amount or 0.0 for c in campaigns), dtype=np.float64, count=len(campaigns)
+        )
+        scores = self._calculate_match_scores(features, goals)
+        reasons = self._get_match_reasons(features, campaigns)
+        
+        # Similar-donor scores are a lookup in the precomputed neighbour lists
+        similar = self.collaborative.scores(donor_id)
+        if similar:
+            weight = settings.collaborative_weight
+            top_similar = max(similar.values())
+            affinity = np.fromiter(
+                (similar.get(c.id, 0.0) for c in campaigns), dtype=np.float64, count=len(campaigns)
+            ) / top_similar
+            scores = (1 - weight) * scores + weight * affinity
+            reasons = np.where(affinity >= 0.5, "similar_donors", reasons)
         
         # Sort by score and limit
-        matches.sort(key=lambda x: x["match_score"], reverse=True)
-        return matches[:limit]
+        top = np.argsort(-scores, kind="stable")[:limit]
+        return [
+            {
+                "campaign_id": campaigns[i].id,
+                "campaign_title": campaigns[i].title,
+                "match_score": float(scores[i]),
+                "match_reason": str(reasons[i])
+            }
+            for i in top
+        ]
     
-    def _calculate_match_score(
+    def _calculate_match_scores(
         self,
-        donor: User,
-        donor_profile: DonorProfile,
-        campaign: Campaign
-    ) -> float:
-        """Calculate match score between donor and campaign (0-1)."""
+        features: Optional[DonorFeatures],
+        goals: np.ndarray
+    ) -> np.ndarray:
+        """Calculate match scores between a donor and campaigns with these goals (0-1)."""
+        if features is None:
+            return np.zeros(len(goals))
         score = 0.0
         weights_sum = 0.0
         
-        # Cause alignment (40%)
-        if donor_profile and donor_profile.causes:
-            if "health" in donor_profile.causes or "education" in donor_profile.causes:
+        # Cause alignment (40%); donors whose causes are all elsewhere drop the term
+        if features.cause_mask:
+            if features.cause_mask & self._aligned_causes:
                 score += 0.4 * 1.0
                 weights_sum += 0.4
         else:
             weights_sum += 0.4
         
         # Budget alignment (30%)
-        if donor_profile and donor_profile.average_donation > 0:
-            donation_ratio = min(
-                donor_profile.average_donation / campaign.goal_amount * 1000,
+        if features.average_donation > 0:
+            donation_ratio = np.minimum(
+                np.divide(
+                    features.average_donation * 1000, goals,
+                    out=np.ones_like(goals), where=goals > 0
+                ),
                 1.0
             )
-            score += 0.3 * donation_ratio
-            weights_sum += 0.3
-        else:
-            weights_sum += 0.3
+            score = score + 0.3 * donation_ratio
+        weights_sum += 0.3
         
         # Engagement history (30%)
-        if donor_profile and donor_profile.donation_count > 0:
-            engagement = min(donor_profile.donation_count / 20.0, 1.0)
-            score += 0.3 * engagement
-            weights_sum += 0.3
-        else:
-            weights_sum += 0.3
+        if features.donation_count > 0:
+            score = score + 0.3 * min(features.donation_count / 20.0, 1.0)
+        weights_sum += 0.3
         
-        return score / weights_sum if weights_sum > 0 else 0.5
+        return np.broadcast_to(score / weights_sum, goals.shape).astype(np.float64)
     
-    def _get_match_reason(
+    def _get_match_reasons(
         self,
-        donor_profile: DonorProfile,
-        campaign: Campaign
-    ) -> str:
-        """Get human-readable reason for the match."""
-        if donor_profile:
-            if donor_profile.causes and "health" in donor_profile.causes:
-                return "cause_alignment"
-            if donor_profile.preferred_regions:
-                if campaign.community_id:
-                    return "region_preference"
-        return "campaign_quality"
+        features: Optional[DonorFeatures],
+        campaigns: List[Campaign]
+    ) -> np.ndarray:
+        """Get human-readable reasons for the matches."""
+        if features is not None:
+            if features.cause_mask & self._health:
+                return np.full(len(campaigns), "cause_alignment", dtype=object)
+            if features.region_mask:
+                return np.array([
+                    "region_preference" if c.community_id else "campaign_quality"
+                    for c in campaigns
+                ], dtype=object)
+        return np.full(len(campaigns), "campaign_quality", dtype=object)
 
 
 class ImpactPredictor:
@@ -134,9 +211,7 @@ class ImpactPredictor:
             )
         
         # Calculate metrics
-        community = db.query(Community).filter(
-            Community.id == campaign.community_id
-        ).first()
+        community = community_cache.get(db, campaign.community_id)
         
         # Predict reach
         predicted_reach = self._predict_reach(campaign, days_remaining)
@@ -260,9 +335,7 @@ class StoryGenerator:
         db: Session
     ) -> StoryGenerationResponse:
         """Generate campaign story."""
-        community = db.query(Community).filter(
-            Community.id == community_id
-        ).first()
+        community = community_cache.get(db, community_id)
         
         narrative = self._generate_narrative(
             community,
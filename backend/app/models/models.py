@@ -3,8 +3,8 @@ Database models for LaafiTech platform.
 """
 from datetime import datetime
 from sqlalchemy import (
-    Column, Integer, String, Text, Float, DateTime,
-    Boolean, Enum, ForeignKey, JSON, UniqueConstraint
+    Column, Integer, String, Text, Float, Date, DateTime,
+    Boolean, Enum, ForeignKey, JSON, UniqueConstraint, Index
 )
 from sqlalchemy.orm import relationship
 import enum
@@ -63,7 +63,7 @@ class Organization(Base):
     contact_email = Column(String)
     phone = Column(String, nullable=True)
     verification_status = Column(String, default="pending")  # pending, verified, rejected
-    metadata = Column(JSON, nullable=True)
+    extra_metadata = Column("metadata", JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -92,12 +92,23 @@ class Community(Base):
     description = Column(Text, nullable=True)
     data_quality_score = Column(Float, default=0.5)  # 0-1 scale
     last_assessment_date = Column(DateTime, nullable=True)
-    metadata = Column(JSON, nullable=True)
+    extra_metadata = Column("metadata", JSON, nullable=True)
+    need_score = Column(Float, nullable=True)  # 0-1, higher is more urgent; see app/services/priority.py
+    need_score_key = Column(String, nullable=True)  # weights the score was computed with
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     campaigns = relationship("Campaign", back_populates="community")
+    
+    __table_args__ = (
+        # Top-K by need, overall and within a country or region, as index scans
+        Index("ix_communities_need_score", "need_score"),
+        Index("ix_communities_country_need_score", "country", "need_score"),
+        Index("ix_communities_country_region_need_score", "country", "region", "need_score"),
+        # Incremental analytics snapshot refresh by watermark
+        Index("ix_communities_updated_at", "updated_at"),
+    )
 
 
 class Campaign(Base):
@@ -134,15 +145,28 @@ class Campaign(Base):
     predicted_reach = Column(Integer, nullable=True)
     predicted_funding = Column(Float, nullable=True)
     
-    metadata = Column(JSON, nullable=True)
+    extra_metadata = Column("metadata", JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Last edit of content, goal or status; unlike updated_at, views, shares,
+    # current_amount and model outputs leave it alone. Set explicitly.
+    content_updated_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     community = relationship("Community", back_populates="campaigns")
     organization = relationship("Organization", back_populates="campaigns")
     created_by_user = relationship("User", back_populates="campaigns")
     donations = relationship("Donation", back_populates="campaign")
+    
+    __table_args__ = (
+        # Status filters, and the expiry job's ACTIVE campaigns past end_date
+        Index("ix_campaigns_status_end_date", "status", "end_date"),
+        Index("ix_campaigns_community_id", "community_id"),
+        # Incremental analytics snapshot refresh by watermark
+        Index("ix_campaigns_updated_at", "updated_at"),
+        # Incremental recommendation refresh by watermark
+        Index("ix_campaigns_content_updated_at", "content_updated_at"),
+    )
 
 
 class Donation(Base):
@@ -159,10 +183,21 @@ class Donation(Base):
     donor_message = Column(Text, nullable=True)
     is_anonymous = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     campaign = relationship("Campaign", back_populates="donations")
     donor = relationship("User", back_populates="donations")
+    
+    __table_args__ = (
+        # Per-campaign aggregates of completed donations
+        Index("ix_donations_campaign_status", "campaign_id", "status"),
+        Index("ix_donations_donor_created_at", "donor_id", "created_at"),
+        # Platform totals and date ranges of completed donations
+        Index("ix_donations_status_created_at", "status", "created_at"),
+        # Analytics snapshot watermark, which must see pending -> completed
+        Index("ix_donations_status_updated_at", "status", "updated_at"),
+    )
 
 
 class DonorProfile(Base):
@@ -185,6 +220,12 @@ class DonorProfile(Base):
 class MatchingRecord(Base):
     """Record of donor-campaign matches."""
     __tablename__ = "matching_records"
+    __table_args__ = (
+        # A unique index rather than a constraint, so migrations can add it
+        Index("uq_matching_records_donor_campaign", "donor_id", "campaign_id", unique=True),
+        Index("ix_matching_records_donor_score", "donor_id", "match_score"),
+        Index("ix_matching_records_campaign_id", "campaign_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     donor_id = Column(Integer, ForeignKey("users.id"))
@@ -209,3 +250,58 @@ class ImpactMetric(Base):
     verification_source = Column(String, nullable=True)
     recorded_date = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_impact_metrics_campaign_metric", "campaign_id", "metric_type"),
+    )
+
+
+class DonationRollup(Base):
+    """Daily donation totals of rows moved to the Parquet archive (app/services/archive.py)."""
+    __tablename__ = "donation_rollups"
+    __table_args__ = (
+        Index("ix_donation_rollups_campaign_day", "campaign_id", "day"),
+        Index("ix_donation_rollups_status_day", "status", "day"),
+    )
+    
+    day = Column(Date, primary_key=True)
+    campaign_id = Column(Integer, primary_key=True)  # 0 when the donation had no campaign
+    status = Column(String, primary_key=True)
+    donation_count = Column(Integer, default=0)
+    amount_sum = Column(Float, default=0)
+    amount_sum_squares = Column(Float, default=0)
+
+
+class ImpactTotal(Base):
+    """Running sums of ImpactMetric values per campaign, per community and overall."""
+    __tablename__ = "impact_totals"
+    
+    scope = Column(String, primary_key=True)  # campaign, community, global
+    scope_id = Column(Integer, primary_key=True)  # 0 for global
+    metric_type = Column(String, primary_key=True)
+    value_sum = Column(Float, default=0)
+    verified_sum = Column(Float, default=0)
+    row_count = Column(Integer, default=0)
+    verified_count = Column(Integer, default=0)
+
+
+class JobState(Base):
+    """Bookkeeping for periodic background jobs."""
+    __tablename__ = "job_states"
+    
+    name = Column(String, primary_key=True)
+    last_started_at = Column(DateTime, nullable=True)
+    last_success_at = Column(DateTime, nullable=True)  # watermark for incremental jobs
+    last_duration_ms = Column(Float, nullable=True)
+    last_error = Column(Text, nullable=True)
+    run_count = Column(Integer, default=0)
+    failure_count = Column(Integer, default=0)
+
+
+class SchemaMigration(Base):
+    """Migrations applied by app/core/migrations.py."""
+    __tablename__ = "schema_migrations"
+    
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -1,6 +1,6 @@
 """Pydantic schemas for request/response validation."""
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+from datetime import date, datetime
+from typing import Optional, List, Dict, Any, Literal
 from pydantic import BaseModel, EmailStr, Field
 
 
@@ -24,6 +24,25 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+# Auth Schemas
+class LoginRequest(BaseModel):
+    email: EmailStr
+    password: str
+
+
+class RegisterRequest(BaseModel):
+    email: EmailStr
+    password: str = Field(..., min_length=8)
+    name: str
+
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+    user: UserResponse
+
+
 # Organization Schemas
 class OrganizationBase(BaseModel):
     name: str
@@ -81,6 +100,7 @@ class CommunityResponse(CommunityBase):
     poverty_index: float
     menstrual_health_score: float
     data_quality_score: float
+    need_score: Optional[float] = None
     created_at: datetime
     updated_at: datetime
     
@@ -130,6 +150,42 @@ class CampaignResponse(CampaignBase):
         from_attributes = True
 
 
+class CampaignWithCommunityResponse(CampaignResponse):
+    community: Optional[CommunityResponse] = None
+
+
+class CampaignSearchResult(CampaignResponse):
+    score: float
+
+
+class CampaignSearchResponse(BaseModel):
+    query: str
+    total: int
+    skip: int
+    limit: int
+    results: List[CampaignSearchResult]
+
+
+class CampaignBulkRequest(BaseModel):
+    campaign_ids: List[int] = Field(..., min_length=1, max_length=500)
+    action: Literal["publish", "pause", "archive", "delete"]
+
+
+class CampaignBulkOutcome(BaseModel):
+    campaign_id: int
+    result: str  # updated, deleted, not_found, forbidden, invalid_transition, in_use, conflict
+    previous_status: Optional[str] = None
+    status: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class CampaignBulkResponse(BaseModel):
+    action: str
+    succeeded: int
+    failed: int
+    results: List[CampaignBulkOutcome]
+
+
 # Donation Schemas
 class DonationCreate(BaseModel):
     campaign_id: int
@@ -150,6 +206,11 @@ class DonationResponse(BaseModel):
         from_attributes = True
 
 
+class PaymentWebhookResponse(BaseModel):
+    received: bool = True
+    outcome: str  # created, duplicate, unmatched, ignored
+
+
 # ML Endpoints
 class DonorMatchRequest(BaseModel):
     donor_id: int
@@ -176,6 +237,18 @@ class ImpactPredictionResponse(BaseModel):
     confidence_score: float
 
 
+class FundingForecastResponse(BaseModel):
+    campaign_id: int
+    goal_amount: float
+    current_amount: float
+    days_remaining: float
+    probability_of_goal: float
+    p10: float  # final amount percentiles
+    p50: float
+    p90: float
+    expected: float
+
+
 class StoryGenerationRequest(BaseModel):
     community_id: int
     campaign_title: str
@@ -199,3 +272,73 @@ class DashboardMetrics(BaseModel):
     avg_campaign_success_rate: float
     top_donors: List[Dict[str, Any]]
     trending_campaigns: List[Dict[str, Any]]
+
+
+class DonationTrendPoint(BaseModel):
+    period: date  # first day of the day, week or month
+    donation_count: int
+    amount: float
+
+
+class DonationTrendResponse(BaseModel):
+    interval: str  # day, week or month
+    campaign_id: Optional[int] = None
+    points: List[DonationTrendPoint]
+
+
+class ImpactTotalsResponse(BaseModel):
+    scope: str  # campaign, community, global
+    scope_id: int
+    verified_only: bool
+    totals: Dict[str, float]  # metric_type -> summed value
+    success_rate: Optional[float] = None  # mean funded ratio of completed campaigns
+
+
+class AnalyticsSnapshotInfo(BaseModel):
+    as_of: datetime  # when the snapshot answering the request was refreshed
+    snapshot_age_seconds: float
+
+
+class AnalyticsMetrics(AnalyticsSnapshotInfo):
+    total_communities: int
+    communities_reached: int  # communities with at least one campaign
+    active_campaigns: int
+    completed_campaigns: int
+    beneficiaries: int
+    total_funding: float
+    donation_count: int
+    donor_count: int
+    average_donation: float
+    campaign_success_rate: Optional[float] = None  # mean funded ratio of completed campaigns
+
+
+class CoverageGroup(BaseModel):
+    community_id: Optional[int] = None
+    community: Optional[str] = None
+    country: Optional[str] = None
+    region: Optional[str] = None
+    campaigns: int
+    active_campaigns: int
+    beneficiaries: int
+    goal_amount: float
+    funding: float
+    donation_count: int
+    donor_count: int
+    funded_ratio: Optional[float] = None
+
+
+class CoverageResponse(AnalyticsSnapshotInfo):
+    group_by: str  # community, country or region
+    groups: List[CoverageGroup]
+
+
+class FundingTrendPoint(BaseModel):
+    period: date  # first day of the day, week or month
+    amount: float
+    donation_count: int
+    donor_count: int
+
+
+class FundingTrendResponse(AnalyticsSnapshotInfo):
+    interval: str  # day, week or month
+    points: List[FundingTrendPoint]
@@ -0,0 +1,474 @@
+"""
+In-memory columnar snapshot for the Analytics page.
+
+Each worker holds a copy of the columns it needs from completed donations,
+campaigns and communities as pandas frames. Dashboard, coverage and funding-trend
+queries are then filters and group-bys over arrays, not GROUP BYs over the
+joined tables. Donations are joined to their campaign's community at query
+time through dense lookup arrays indexed by id. A moved campaign or renamed
+community is therefore reflected without rewriting any donation rows.
+
+A snapshot older than `analytics_snapshot_max_age_seconds` is refreshed by
+the next request that reads it. Requests that arrive during a refresh are
+served the previous snapshot. A refresh is incremental:
+
+- completed donations updated at or after the latest `updated_at` seen, less
+  `analytics_snapshot_overlap_seconds` for rows that commit late, are read
+  and appended. Ids already held are skipped. A pending donation that
+  completes later is updated then, so it is picked up like a new one;
+- campaigns and communities are re-read from their `updated_at` mark the
+  same way. When a table's row count differs from the snapshot, something
+  was deleted, and that table is reloaded in full.
+
+Held donations are not re-read, and rows moved to the archive stay in the
+snapshot. Every `analytics_snapshot_reload_seconds` the snapshot is rebuilt
+from scratch, live and archived rows alike. This also drops donations that
+left the completed status and picks up edits to completed ones.
+
+Refreshes read the primary with their own session, like background jobs,
+so they have no statement time budget. Every response carries `as_of` and
+the snapshot's age.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.models.models import Campaign, CampaignStatus, Community, Donation
+from app.services.archive import donation_frame
+
+logger = logging.getLogger(__name__)
+
+DONATION_COLUMNS = ["id", "campaign_id", "donor_id", "amount", "created_at"]
+CAMPAIGN_COLUMNS = ["id", "community_id", "status", "goal_amount", "beneficiary_count", "updated_at"]
+COMMUNITY_COLUMNS = ["id", "name", "country", "region", "updated_at"]
+PERIODS = {"day": "D", "week": "W-MON", "month": "MS"}  # date_range frequency of each interval
+COMPLETED = "completed"
+
+
+def _donation_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    """Normalise donation rows; a missing campaign or donor becomes 0."""
+    return pd.DataFrame({
+        "id": frame["id"].astype("int64"),
+        "campaign_id": frame["campaign_id"].fillna(0).astype("int64"),
+        "donor_id": frame["donor_id"].fillna(0).astype("int64"),
+        "amount": frame["amount"].fillna(0.0).astype("float64"),
+        "created_at": pd.to_datetime(frame["created_at"]),
+    })
+
+
+def _lookup(ids: np.ndarray, values: np.ndarray, fill, dtype) -> np.ndarray:
+    """Dense array with `values` at positions `ids` and `fill` everywhere else."""
+    size = int(ids.max()) + 1 if len(ids) else 1
+    dense = np.full(size, fill, dtype=dtype)
+    dense[ids] = values
+    return dense
+
+
+def _mark(values: pd.Series, as_of: datetime) -> Optional[datetime]:
+    """Latest timestamp in `values`, but no later than `as_of`; None when there is none."""
+    latest = values.max() if len(values) else None
+    if latest is None or pd.isna(latest):
+        return None
+    # A timestamp ahead of the clock would hide every row written until then
+    return min(pd.Timestamp(latest).to_pydatetime(), as_of)
+
+
+def _distinct_donors(frame: pd.DataFrame, keys) -> pd.Series:
+    """Distinct known donors per group of `keys`; guests and anonymous rows have donor 0."""
+    known = frame.loc[frame["donor_id"].to_numpy() > 0]
+    return known.drop_duplicates([*keys, "donor_id"]).groupby(keys).size()
+
+
+def _period_start(created: np.ndarray, interval: str) -> np.ndarray:
+    """First day of the day, week (from Monday) or month of each datetime64 value."""
+    if interval == "month":
+        return created.astype("datetime64[M]").astype("datetime64[ns]")
+    days = created.astype("datetime64[D]")
+    if interval == "week":
+        # 1970-01-01 was a Thursday, three days after a Monday
+        days = days - (days.astype(np.int64) + 3) % 7
+    return days.astype("datetime64[ns]")
+
+
+def _take(dense: np.ndarray, ids: np.ndarray, fill) -> np.ndarray:
+    """dense[ids], with `fill` for ids beyond the array."""
+    inside = ids < len(dense)
+    if inside.all():
+        return dense[ids]
+    out = np.full(len(ids), fill, dtype=dense.dtype)
+    out[inside] = dense[ids[inside]]
+    return out
+
+
+class Snapshot(NamedTuple):
+    """One immutable generation of the analytics data; replaced whole on refresh."""
+    donations: pd.DataFrame  # completed only: id, campaign_id, donor_id, amount, created_at
+    campaigns: pd.DataFrame  # indexed by id
+    communities: pd.DataFrame  # indexed by id; country and region categorical
+    campaign_community: np.ndarray  # campaign id -> community id, 0 for none
+    community_country: np.ndarray  # community id -> country code, -1 for none
+    community_region: np.ndarray  # community id -> region code, -1 for none
+    campaign_raised: pd.Series  # campaign id -> completed donations, all time
+    donation_mark: Optional[datetime]  # latest updated_at of completed donations read
+    campaign_mark: Optional[datetime]
+    community_mark: Optional[datetime]
+    as_of: datetime
+    loaded_at: float  # monotonic time of the last full load
+    refreshed_at: float  # monotonic time of the last refresh
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.monotonic() - self.refreshed_at)
+
+    def info(self) -> Dict[str, Any]:
+        return {"as_of": self.as_of, "snapshot_age_seconds": round(self.age_seconds, 3)}
+
+
+class Scope(NamedTuple):
+    """Filters shared by every analytics query."""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    country: Optional[str] = None
+    region: Optional[str] = None
+    community_id: Optional[int] = None
+    campaign_id: Optional[int] = None
+
+
+class AnalyticsSnapshot:
+    """Per-worker columnar copy of donations, campaigns and communities."""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_age_seconds: float = 60.0,
+        overlap_seconds: float = 300.0,
+        reload_seconds: float = 3600.0
+    ):
+        self.session_factory = session_factory
+        self.max_age_seconds = max_age_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.reload_seconds = reload_seconds
+        self.snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Snapshot:
+        """The snapshot to answer from, refreshing it first if it is stale."""
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.age_seconds < self.max_age_seconds:
+            return snapshot
+        # Only the first load makes requests wait; later ones serve the old snapshot
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if self.snapshot is snapshot:
+                self.refresh()
+        except Exception:
+            if snapshot is None:
+                raise
+            # Keep serving the old snapshot; its age tells clients how stale it is
+            logger.exception("Analytics snapshot refresh failed")
+        finally:
+            self._lock.release()
+        return self.snapshot
+
+    def refresh(self, full: bool = False) -> Snapshot:
+        """Bring the snapshot up to date; a full reload when due or asked for."""
+        started = time.perf_counter()
+        previous = self.snapshot
+        full = full or previous is None or time.monotonic() - previous.loaded_at >= self.reload_seconds
+        db = self.session_factory()
+        try:
+            snapshot = self._load(db) if full else self._update(db, previous)
+        finally:
+            db.close()
+        self.snapshot = snapshot
+
+        kind = "full" if full else "incremental"
+        metrics.inc(
+            "analytics_snapshot_refreshes_total",
+            help_text="Analytics snapshot refreshes by kind.",
+            kind=kind
+        )
+        metrics.inc(
+            "analytics_snapshot_refresh_seconds_total", time.perf_counter() - started,
+            help_text="Time spent refreshing the analytics snapshot.",
+            kind=kind
+        )
+        metrics.set(
+            "analytics_snapshot_rows", len(snapshot.donations),
+            help_text="Donations held in this worker's analytics snapshot."
+        )
+        return snapshot
+
+    # Loading
+
+    def _load(self, db: Session) -> Snapshot:
+        as_of = datetime.utcnow()
+        # Read before the rows, so a row updated in between is read again next time
+        donation_mark = db.execute(
+            select(func.max(Donation.updated_at)).where(Donation.status == COMPLETED)
+        ).scalar()
+        donations = _donation_columns(donation_frame(db, columns=DONATION_COLUMNS, status=COMPLETED))
+        campaigns = self._read(db, Campaign, CAMPAIGN_COLUMNS)
+        communities = self._read(db, Community, COMMUNITY_COLUMNS)
+        now = time.monotonic()
+        return self._build(donations, campaigns, communities, as_of, now, now,
+                           donation_mark=None if donation_mark is None else min(donation_mark, as_of))
+
+    def _update(self, db: Session, previous: Snapshot) -> Snapshot:
+        as_of = datetime.utcnow()
+        donations = previous.donations
+        donation_mark = previous.donation_mark
+        table = Donation.__table__
+        query = (
+            select(*(table.c[name] for name in DONATION_COLUMNS), table.c.updated_at)
+            .where(table.c.status == COMPLETED)
+        )
+        if previous.donation_mark is not None:
+            query = query.where(table.c.updated_at >= previous.donation_mark - self.overlap)
+        new = pd.DataFrame(db.execute(query).all(), columns=DONATION_COLUMNS + ["updated_at"])
+        if not new.empty:
+            latest = _mark(new["updated_at"], as_of)
+            if latest is not None and (donation_mark is None or latest > donation_mark):
+                donation_mark = latest
+            new = _donation_columns(new)
+            # Ids grow with inserts, so only held ids from the oldest new one on can match
+            ids = donations["id"].to_numpy()
+            new = new[~new["id"].isin(ids[ids >= new["id"].min()])]
+            if not new.empty:
+                donations = pd.concat([donations, new], ignore_index=True)
+
+        campaigns = self._merge(db, Campaign, CAMPAIGN_COLUMNS, previous.campaigns, previous.campaign_mark)
+        communities = self._merge(db, Community, COMMUNITY_COLUMNS, previous.communities, previous.community_mark)
+        if (donations is previous.donations and campaigns is previous.campaigns
+                and communities is previous.communities):
+            return previous._replace(as_of=as_of, refreshed_at=time.monotonic(), donation_mark=donation_mark)
+        return self._build(donations, campaigns, communities, as_of, previous.loaded_at, time.monotonic(),
+                           donation_mark=donation_mark)
+
+    def _read(self, db: Session, model, columns: List[str], since: Optional[datetime] = None) -> pd.DataFrame:
+        table = model.__table__
+        query = select(*(table.c[name] for name in columns))
+        if since is not None:
+            query = query.where(table.c.updated_at >= since)
+        frame = pd.DataFrame(db.execute(query).all(), columns=columns).set_index("id")
+        if "status" in frame:
+            frame["status"] = frame["status"].map(lambda s: getattr(s, "value", s))
+        return frame
+
+    def _merge(self, db: Session, model, columns: List[str],
+               frame: pd.DataFrame, mark: Optional[datetime]) -> pd.DataFrame:
+        """`frame` with rows updated since `mark`, or the whole table after a delete."""
+        count = db.execute(select(func.count()).select_from(model.__table__)).scalar()
+        changed = self._read(db, model, columns, None if mark is None else mark - self.overlap)
+        if not changed.empty:
+            frame = pd.concat([frame[~frame.index.isin(changed.index)], changed])
+        if len(frame) != count:
+            return self._read(db, model, columns)
+        return frame
+
+    def _build(self, donations, campaigns, communities, as_of, loaded_at, refreshed_at,
+               donation_mark: Optional[datetime]) -> Snapshot:
+        communities = communities.copy()
+        for name in ("country", "region"):
+            communities[name] = communities[name].astype("category")
+        community_ids = communities.index.to_numpy(dtype=np.int64)
+        return Snapshot(
+            donations=donations,
+            campaigns=campaigns,
+            communities=communities,
+            campaign_community=_lookup(
+                campaigns.index.to_numpy(dtype=np.int64),
+                campaigns["community_id"].fillna(0).to_numpy(dtype=np.int64), 0, np.int64
+            ),
+            community_country=_lookup(community_ids, communities["country"].cat.codes.to_numpy(), -1, np.int32),
+            community_region=_lookup(community_ids, communities["region"].cat.codes.to_numpy(), -1, np.int32),
+            campaign_raised=donations.groupby("campaign_id")["amount"].sum(),
+            donation_mark=donation_mark,
+            campaign_mark=_mark(campaigns["updated_at"], as_of),
+            community_mark=_mark(communities["updated_at"], as_of),
+            as_of=as_of,
+            loaded_at=loaded_at,
+            refreshed_at=refreshed_at,
+        )
+
+    # Queries
+
+    @staticmethod
+    def _community_mask(snapshot: Snapshot, scope: Scope) -> Optional[np.ndarray]:
+        """Community id -> in scope, or None when the scope has no place filter."""
+        if scope.country is None and scope.region is None and scope.community_id is None:
+            return None
+        keep = np.ones(len(snapshot.community_country), dtype=bool)
+        keep[0] = False
+        for name, dense in (("country", snapshot.community_country), ("region", snapshot.community_region)):
+            value = getattr(scope, name)
+            if value is not None:
+                categories = snapshot.communities[name].cat.categories
+                keep &= dense == (categories.get_loc(value) if value in categories else -2)
+        if scope.community_id is not None:
+            only = np.zeros_like(keep)
+            if 0 < scope.community_id < len(only):
+                only[scope.community_id] = keep[scope.community_id]
+            keep = only
+        return keep
+
+    def _scoped_campaigns(self, snapshot: Snapshot, scope: Scope) -> pd.DataFrame:
+        """Campaigns in scope, with their community id and completed funding."""
+        campaigns = snapshot.campaigns
+        if scope.campaign_id is not None:
+            campaigns = campaigns[campaigns.index == scope.campaign_id]
+        community = campaigns["community_id"].fillna(0).to_numpy(dtype=np.int64)
+        keep = self._community_mask(snapshot, scope)
+        if keep is not None:
+            inside = _take(keep, community, False)
+            campaigns, community = campaigns[inside], community[inside]
+        return campaigns.assign(
+            community_id=community,
+            raised=snapshot.campaign_raised.reindex(campaigns.index, fill_value=0.0).to_numpy(),
+        )
+
+    def _scoped_donations(self, snapshot: Snapshot, scope: Scope) -> pd.DataFrame:
+        """Completed donations in scope, with the community id of their campaign."""
+        donations = snapshot.donations
+        mask = np.ones(len(donations), dtype=bool)
+        created = donations["created_at"].to_numpy()
+        if scope.start is not None:
+            mask &= created >= np.datetime64(scope.start)
+        if scope.end is not None:
+            mask &= created < np.datetime64(scope.end)
+        campaign = donations["campaign_id"].to_numpy()
+        if scope.campaign_id is not None:
+            mask &= campaign == scope.campaign_id
+        community = _take(snapshot.campaign_community, campaign, 0)
+        keep = self._community_mask(snapshot, scope)
+        if keep is not None:
+            mask &= _take(keep, community, False)
+        return donations.loc[mask, ["donor_id", "amount", "created_at"]].assign(community_id=community[mask])
+
+    def dashboard(self, scope: Scope) -> Dict[str, Any]:
+        """Headline KPIs for the scope."""
+        snapshot = self.current()
+        campaigns = self._scoped_campaigns(snapshot, scope)
+        donations = self._scoped_donations(snapshot, scope)
+        keep = self._community_mask(snapshot, scope)
+        completed = campaigns[campaigns["status"] == CampaignStatus.COMPLETED.value]
+        goal = completed["goal_amount"].to_numpy(dtype=float)
+        # Same definition as the stored success rate: mean funded ratio, capped at 1
+        ratios = np.where(goal > 0, np.minimum(completed["raised"].to_numpy() / np.where(goal > 0, goal, 1), 1.0), 0.0)
+        donors = donations["donor_id"].to_numpy()
+        return {
+            "total_communities": int(len(snapshot.communities) if keep is None else keep.sum()),
+            "communities_reached": int(campaigns.loc[campaigns["community_id"] > 0, "community_id"].nunique()),
+            "active_campaigns": int((campaigns["status"] == CampaignStatus.ACTIVE.value).sum()),
+            "completed_campaigns": int(len(completed)),
+            "beneficiaries": int(campaigns["beneficiary_count"].fillna(0).sum()),
+            "total_funding": float(donations["amount"].sum()),
+            "donation_count": int(len(donations)),
+            "donor_count": int(len(np.unique(donors[donors > 0]))),
+            "average_donation": float(donations["amount"].mean()) if len(donations) else 0.0,
+            "campaign_success_rate": float(ratios.mean()) if len(ratios) else None,
+            **snapshot.info(),
+        }
+
+    def coverage(self, group_by: str, scope: Scope) -> Dict[str, Any]:
+        """Campaigns, beneficiaries and funding per community, country or region."""
+        snapshot = self.current()
+        communities = snapshot.communities
+        keys = {"community": ["community_id"], "country": ["country"], "region": ["country", "region"]}[group_by]
+
+        def keyed(frame: pd.DataFrame) -> pd.DataFrame:
+            # Grouped on integer ids and category codes; labels are attached per group
+            frame = frame[frame["community_id"].isin(communities.index)]
+            ids = frame["community_id"].to_numpy()
+            return frame.assign(
+                country=_take(snapshot.community_country, ids, -1),
+                region=_take(snapshot.community_region, ids, -1),
+            )
+
+        campaigns = keyed(self._scoped_campaigns(snapshot, scope)).assign(
+            active=lambda f: f["status"] == CampaignStatus.ACTIVE.value,
+            beneficiaries=lambda f: f["beneficiary_count"].fillna(0),
+            goal=lambda f: f["goal_amount"].fillna(0.0),
+        )
+        per_campaign = campaigns.groupby(keys).agg(
+            campaigns=("status", "size"),
+            active_campaigns=("active", "sum"),
+            beneficiaries=("beneficiaries", "sum"),
+            goal_amount=("goal", "sum"),
+        )
+        donations = keyed(self._scoped_donations(snapshot, scope))
+        per_donation = donations.groupby(keys).agg(
+            funding=("amount", "sum"),
+            donation_count=("amount", "size"),
+        ).assign(donor_count=_distinct_donors(donations, keys))
+        rows = per_campaign.join(per_donation, how="outer").fillna(0).reset_index()
+        rows = rows.sort_values(["funding", "campaigns"], ascending=False)
+
+        if group_by == "community":
+            located = communities.reindex(rows["community_id"])
+            rows = rows.assign(
+                community=located["name"].to_numpy(),
+                country=located["country"].astype(object).to_numpy(),
+                region=located["region"].astype(object).to_numpy(),
+            )
+        else:
+            for name in keys:
+                labels = communities[name].cat.categories
+                rows[name] = [labels[code] if code >= 0 else None for code in rows[name].astype(int)]
+
+        groups = []
+        for row in rows.itertuples(index=False):
+            groups.append({
+                "community_id": int(row.community_id) if group_by == "community" else None,
+                "community": row.community if group_by == "community" else None,
+                "country": None if pd.isna(row.country) else row.country,
+                "region": None if group_by == "country" or pd.isna(row.region) else row.region,
+                "campaigns": int(row.campaigns),
+                "active_campaigns": int(row.active_campaigns),
+                "beneficiaries": int(row.beneficiaries),
+                "goal_amount": float(row.goal_amount),
+                "funding": float(row.funding),
+                "donation_count": int(row.donation_count),
+                "donor_count": int(row.donor_count),
+                "funded_ratio": float(row.funding / row.goal_amount) if row.goal_amount > 0 else None,
+            })
+        return {"group_by": group_by, "groups": groups, **snapshot.info()}
+
+    def funding_trend(self, interval: str, scope: Scope) -> Dict[str, Any]:
+        """Completed funding, donations and distinct donors per day, week or month."""
+        snapshot = self.current()
+        donations = self._scoped_donations(snapshot, scope)
+        points = []
+        if len(donations):
+            donations = donations.assign(period=_period_start(donations["created_at"].to_numpy(), interval))
+            grouped = donations.groupby("period").agg(
+                amount=("amount", "sum"),
+                donation_count=("amount", "size"),
+            ).assign(donor_count=_distinct_donors(donations, ["period"])).fillna(0)
+            # Periods without donations are reported as zeros
+            grouped = grouped.reindex(
+                pd.date_range(grouped.index.min(), grouped.index.max(), freq=PERIODS[interval]),
+                fill_value=0
+            )
+            points = [
+                {"period": key.date(), "amount": float(row.amount),
+                 "donation_count": int(row.donation_count), "donor_count": int(row.donor_count)}
+                for key, row in zip(grouped.index, grouped.itertuples(index=False))
+            ]
+        return {"interval": interval, "points": points, **snapshot.info()}
+
+
+analytics_snapshot = AnalyticsSnapshot(
+    max_age_seconds=settings.analytics_snapshot_max_age_seconds,
+    overlap_seconds=settings.analytics_snapshot_overlap_seconds,
+    reload_seconds=settings.analytics_snapshot_reload_seconds,
+)
@@ -0,0 +1,324 @@
+"""
+Archival of old donations to compressed, month-partitioned Parquet files.
+
+`archive_donations` moves donations older than `donation_archive_after_days`
+out of the donations table, in batches of `donation_archive_batch_size`.
+Rows are ordered by id. Each batch is handled in three steps:
+
+1. The rows are written under `donation_archive_path` as
+   `year=YYYY/month=MM/part-<first id>.parquet` (zstd by default).
+2. They are added to DonationRollup: daily count, sum and sum of squares
+   per (day, campaign, status).
+3. They are deleted in the same transaction as the rollup update.
+
+Files are written before the transaction commits. A crash in between leaves
+the rows live, and the retry rewrites the same part files, because a batch
+is named after its first id. Readers drop archived ids that are still live.
+
+Analytics read history through this module, not the donations table:
+- `donation_frame` returns raw rows. Live rows come from SQL; archived rows
+  come only from the partitions whose month overlaps the requested range.
+- `daily_totals` returns per-day sums from rollups plus live rows.
+- `archived_campaign_totals` returns per-campaign sums of the archived rows,
+  to add to aggregates over live rows.
+- `completed_donations` returns the donor and campaign pairs the
+  collaborative filtering model is fitted on.
+
+When workers run on several hosts, the path must be shared storage.
+Writing and reading Parquet requires pyarrow.
+"""
+import os
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import pandas as pd
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.models import Donation, DonationRollup
+
+COLUMNS = [
+    "id", "campaign_id", "donor_id", "amount", "currency", "status",
+    "transaction_id", "donor_message", "is_anonymous", "created_at",
+]
+ROLLUP_SUMS = ("donation_count", "amount_sum", "amount_sum_squares")
+
+rollup_table = DonationRollup.__table__
+
+
+def _next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+class DonationArchive:
+    """Month-partitioned Parquet files of archived donations under one directory."""
+
+    def __init__(self, path: str, compression: str = "zstd"):
+        self.path = path
+        self.compression = compression
+
+    def partitions(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[Tuple[date, str]]:
+        """(month, directory) of partitions that may hold rows in [start, end)."""
+        if not os.path.isdir(self.path):
+            return []
+        found = []
+        for year_dir in os.listdir(self.path):
+            if not year_dir.startswith("year="):
+                continue
+            for month_dir in os.listdir(os.path.join(self.path, year_dir)):
+                if not month_dir.startswith("month="):
+                    continue
+                month = date(int(year_dir[5:]), int(month_dir[6:]), 1)
+                # Prune months entirely outside the range
+                if start is not None and datetime.combine(_next_month(month), time()) <= start:
+                    continue
+                if end is not None and datetime.combine(month, time()) >= end:
+                    continue
+                found.append((month, os.path.join(self.path, year_dir, month_dir)))
+        return sorted(found)
+
+    def write(self, frame: pd.DataFrame) -> List[str]:
+        """Write `frame` as one part file per month; returns the file paths."""
+        written = []
+        months = frame["created_at"].dt.to_period("M")
+        for period, rows in frame.groupby(months, sort=True):
+            directory = os.path.join(self.path, f"year={period.year:04d}", f"month={period.month:02d}")
+            os.makedirs(directory, exist_ok=True)
+            target = os.path.join(directory, f"part-{int(frame['id'].iloc[0]):012d}.parquet")
+            # Write then rename, so readers never see a partial file
+            temporary = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+            rows.to_parquet(temporary, engine="pyarrow", compression=self.compression, index=False)
+            os.replace(temporary, target)
+            written.append(target)
+        return written
+
+    def read(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[Sequence[str]] = None,
+        status: Optional[str] = None
+    ) -> pd.DataFrame:
+        """Archived rows created in [start, end), reading only the overlapping partitions."""
+        columns = list(columns or COLUMNS)
+        wanted = list(dict.fromkeys(columns + ["id"]))
+        filters = []
+        if start is not None:
+            filters.append(("created_at", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("created_at", "<", pd.Timestamp(end)))
+        if status is not None:
+            filters.append(("status", "==", status))
+        frames = []
+        for _, directory in self.partitions(start, end):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".parquet"):
+                    frames.append(pd.read_parquet(
+                        os.path.join(directory, name), engine="pyarrow",
+                        columns=wanted, filters=filters or None,
+                    ))
+        if not frames:
+            return pd.DataFrame({name: pd.Series(dtype=object) for name in wanted})
+        return pd.concat(frames, ignore_index=True)
+
+
+donation_archive = DonationArchive(
+    settings.donation_archive_path,
+    compression=settings.donation_archive_compression,
+)
+
+
+def _rollup_rows(frame: pd.DataFrame) -> List[dict]:
+    keys = pd.DataFrame({
+        "day": frame["created_at"].dt.date,
+        "campaign_id": frame["campaign_id"].fillna(0).astype("int64"),
+        "status": frame["status"].fillna(""),
+        "amount": frame["amount"].fillna(0.0).astype(float),
+    })
+    keys["square"] = keys["amount"] ** 2
+    grouped = keys.groupby(["day", "campaign_id", "status"], sort=False).agg(
+        donation_count=("amount", "size"),
+        amount_sum=("amount", "sum"),
+        amount_sum_squares=("square", "sum"),
+    ).reset_index()
+    return [
+        {
+            "day": row.day, "campaign_id": int(row.campaign_id), "status": row.status,
+            "donation_count": int(row.donation_count), "amount_sum": float(row.amount_sum),
+            "amount_sum_squares": float(row.amount_sum_squares),
+        }
+        for row in grouped.itertuples(index=False)
+    ]
+
+
+def _add_rollups(connection: Connection, rows: List[dict]) -> None:
+    """Add `rows` to the rollups in a single statement where the dialect allows."""
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(rollup_table)
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=["day", "campaign_id", "status"],
+                set_={name: rollup_table.c[name] + statement.excluded[name] for name in ROLLUP_SUMS}
+            ),
+            rows
+        )
+        return
+
+    for row in rows:
+        key = (
+            (rollup_table.c.day == row["day"])
+            & (rollup_table.c.campaign_id == row["campaign_id"])
+            & (rollup_table.c.status == row["status"])
+        )
+        updated = connection.execute(
+            rollup_table.update().where(key).values(
+                {name: rollup_table.c[name] + row[name] for name in ROLLUP_SUMS}
+            )
+        ).rowcount
+        if not updated:
+            connection.execute(insert(rollup_table), [row])
+
+
+def archive_donations(
+    db: Session,
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None
+) -> Dict[str, int]:
+    """Move donations older than the cutoff to Parquet, leaving daily rollups."""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=settings.donation_archive_after_days)
+    batch_size = batch_size or settings.donation_archive_batch_size
+    table = Donation.__table__
+    moved = files = 0
+    while True:
+        rows = db.execute(
+            select(*(table.c[name] for name in COLUMNS))
+            .where(table.c.created_at < cutoff)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        frame = pd.DataFrame(rows, columns=COLUMNS)
+        for name in ("campaign_id", "donor_id"):
+            frame[name] = frame[name].astype("Int64")
+        frame["created_at"] = pd.to_datetime(frame["created_at"])
+        files += len(donation_archive.write(frame))
+
+        connection = db.connection()
+        _add_rollups(connection, _rollup_rows(frame))
+        ids = [int(i) for i in frame["id"]]
+        for start in range(0, len(ids), 10_000):
+            connection.execute(delete(table).where(table.c.id.in_(ids[start:start + 10_000])))
+        db.commit()
+        moved += len(ids)
+        metrics.inc(
+            "donations_archived_total", len(ids),
+            help_text="Donations moved from the database to Parquet archive files."
+        )
+        if len(rows) < batch_size:
+            break
+    return {"archived": moved, "files": files}
+
+
+def donation_frame(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: Optional[Sequence[str]] = None,
+    status: Optional[str] = None
+) -> pd.DataFrame:
+    """Donations created in [start, end), live and archived, as one frame."""
+    columns = list(columns or COLUMNS)
+    table = Donation.__table__
+    query = select(*(table.c[name] for name in dict.fromkeys(columns + ["id"])))
+    if start is not None:
+        query = query.where(table.c.created_at >= start)
+    if end is not None:
+        query = query.where(table.c.created_at < end)
+    if status is not None:
+        query = query.where(table.c.status == status)
+    live = pd.DataFrame(db.execute(query).all(), columns=list(dict.fromkeys(columns + ["id"])))
+    archived = donation_archive.read(start, end, columns, status)
+    if archived.empty:
+        return live[columns]
+    if live.empty:
+        return archived[columns]
+    # Rows of an interrupted batch can be in both places; the live copy wins
+    archived = archived[~archived["id"].isin(live["id"])]
+    return pd.concat([live, archived], ignore_index=True)[columns]
+
+
+def completed_donations(db: Session) -> pd.DataFrame:
+    """Donor and campaign of every completed donation, live and archived."""
+    return donation_frame(db, columns=["donor_id", "campaign_id"], status="completed")
+
+
+def daily_totals(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    campaign_id: Optional[int] = None,
+    status: str = "completed"
+) -> pd.DataFrame:
+    """Per-day donation count and amount from rollups plus live rows, indexed by day."""
+    day = func.date(Donation.created_at)
+    live = (
+        select(day, func.count(Donation.id), func.coalesce(func.sum(Donation.amount), 0.0))
+        .where(Donation.status == status)
+        .group_by(day)
+    )
+    archived = select(
+        DonationRollup.day, func.sum(DonationRollup.donation_count), func.sum(DonationRollup.amount_sum)
+    ).where(DonationRollup.status == status).group_by(DonationRollup.day)
+    if start is not None:
+        live = live.where(Donation.created_at >= start)
+        archived = archived.where(DonationRollup.day >= start.date())
+    if end is not None:
+        live = live.where(Donation.created_at < end)
+        archived = archived.where(DonationRollup.day < end.date())
+    if campaign_id is not None:
+        live = live.where(Donation.campaign_id == campaign_id)
+        archived = archived.where(DonationRollup.campaign_id == campaign_id)
+
+    frame = pd.DataFrame(
+        [(pd.Timestamp(d), c, a) for d, c, a in [*db.execute(archived), *db.execute(live)]],
+        columns=["day", "donation_count", "amount"],
+    )
+    return frame.groupby("day").sum().sort_index()
+
+
+def archived_campaign_totals(
+    db: Session,
+    campaign_ids: Iterable[int],
+    status: str = "completed"
+) -> Dict[int, Tuple[int, float, float, Optional[date]]]:
+    """Campaign id -> (count, amount sum, sum of squares, first day) of archived donations."""
+    ids = list(campaign_ids)
+    totals: Dict[int, Tuple[int, float, float, Optional[date]]] = {}
+    for start in range(0, len(ids), 10_000):
+        rows = db.execute(
+            select(
+                DonationRollup.campaign_id, func.sum(DonationRollup.donation_count),
+                func.sum(DonationRollup.amount_sum), func.sum(DonationRollup.amount_sum_squares),
+                func.min(DonationRollup.day),
+            )
+            .where(DonationRollup.campaign_id.in_(ids[start:start + 10_000]),
+                   DonationRollup.status == status)
+            .group_by(DonationRollup.campaign_id)
+        )
+        totals.update({row[0]: tuple(row[1:]) for row in rows})
+    return totals
@@ -0,0 +1,149 @@
+"""
+Bulk campaign lifecycle operations.
+
+A bulk request is validated with one SELECT covering every requested id. The
+eligible ids are then changed with one set-based UPDATE (or DELETE) in the
+same transaction. The SELECT locks the rows where the database supports it,
+and the write re-checks the source status. A campaign changed concurrently
+is therefore reported as a conflict rather than overwritten.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.orm import Session
+from app.ml.ann import campaign_index
+from app.models.models import (
+    Campaign, CampaignStatus, Donation, DonationRollup, ImpactMetric, MatchingRecord,
+    Organization, UserRole
+)
+from app.services import impact
+from app.services.search import campaign_search
+
+# action -> (statuses it applies to, resulting status; None deletes)
+TRANSITIONS: Dict[str, tuple] = {
+    "publish": ({CampaignStatus.DRAFT, CampaignStatus.PAUSED}, CampaignStatus.ACTIVE),
+    "pause": ({CampaignStatus.ACTIVE}, CampaignStatus.PAUSED),
+    "archive": (
+        {CampaignStatus.DRAFT, CampaignStatus.PAUSED, CampaignStatus.COMPLETED},
+        CampaignStatus.ARCHIVED,
+    ),
+    "delete": ({CampaignStatus.DRAFT, CampaignStatus.ARCHIVED}, None),
+}
+
+
+def _outcome(campaign_id: int, result: str, previous: Optional[CampaignStatus] = None,
+             current: Optional[CampaignStatus] = None, detail: Optional[str] = None) -> dict:
+    return {
+        "campaign_id": campaign_id,
+        "result": result,
+        "previous_status": previous.value if previous else None,
+        "status": current.value if current else None,
+        "detail": detail,
+    }
+
+
+def apply_bulk_action(
+    db: Session,
+    campaign_ids: Sequence[int],
+    action: str,
+    user_id: int,
+    role: Optional[str]
+) -> List[dict]:
+    """Apply `action` to every campaign the user may change, with per-id outcomes."""
+    allowed, target = TRANSITIONS[action]
+    ids = list(dict.fromkeys(campaign_ids))
+    is_admin = role == UserRole.ADMIN.value
+
+    columns = [Campaign.id, Campaign.status, Organization.owner_id]
+    if target is None:
+        # Campaigns with donations (live or in the donation archive) or impact
+        # data are kept; archive them instead
+        columns.append(
+            exists().where(Donation.campaign_id == Campaign.id).correlate(Campaign)
+            | exists().where(DonationRollup.campaign_id == Campaign.id).correlate(Campaign)
+            | exists().where(ImpactMetric.campaign_id == Campaign.id).correlate(Campaign)
+        )
+    rows = {
+        row[0]: row for row in db.execute(
+            select(*columns)
+            .outerjoin(Organization, Organization.id == Campaign.organization_id)
+            .where(Campaign.id.in_(ids))
+            .with_for_update(of=Campaign)
+        )
+    }
+
+    outcomes: Dict[int, dict] = {}
+    eligible: List[int] = []
+    for campaign_id in ids:
+        row = rows.get(campaign_id)
+        if row is None:
+            outcomes[campaign_id] = _outcome(campaign_id, "not_found")
+            continue
+        current = CampaignStatus(row[1]) if row[1] else None
+        if not is_admin and row[2] != user_id:
+            outcomes[campaign_id] = _outcome(
+                campaign_id, "forbidden", current, current,
+                "Campaign belongs to another organization"
+            )
+        elif current not in allowed:
+            outcomes[campaign_id] = _outcome(
+                campaign_id, "invalid_transition", current, current,
+                f"Cannot {action} a campaign with status {current.value if current else None}"
+            )
+        elif target is None and row[3]:
+            outcomes[campaign_id] = _outcome(
+                campaign_id, "in_use", current, current,
+                "Campaign has donations or impact metrics; archive it instead"
+            )
+        else:
+            eligible.append(campaign_id)
+            outcomes[campaign_id] = _outcome(campaign_id, "conflict", current, current,
+                                             "Campaign changed during the request")
+
+    if eligible:
+        guard = (Campaign.id.in_(eligible), Campaign.status.in_(list(allowed)))
+        if target is None:
+            db.execute(
+                delete(MatchingRecord).where(
+                    MatchingRecord.campaign_id.in_(
+                        select(Campaign.id).where(*guard).scalar_subquery()
+                    )
+                ),
+                execution_options={"synchronize_session": False}
+            )
+            statement = delete(Campaign).where(*guard)
+        else:
+            now = datetime.utcnow()
+            statement = update(Campaign).where(*guard).values(
+                status=target, updated_at=now, content_updated_at=now
+            )
+        statement = statement.execution_options(synchronize_session=False)
+        dialect = db.get_bind().dialect
+        if dialect.delete_returning if target is None else dialect.update_returning:
+            changed = set(db.execute(statement.returning(Campaign.id)).scalars())
+        else:
+            # The rows are locked by the validating SELECT
+            db.execute(statement)
+            changed = set(eligible)
+        # Archived campaigns leave the success rate; Core updates skip its events
+        impact.record_completions(db.connection(), [
+            campaign_id for campaign_id in changed
+            if outcomes[campaign_id]["previous_status"] == CampaignStatus.COMPLETED.value
+        ], -1)
+        db.commit()
+
+        for campaign_id in changed:
+            outcome = outcomes[campaign_id]
+            outcome.update(
+                result="deleted" if target is None else "updated",
+                status=target.value if target else None,
+                detail=None,
+            )
+
+        # Core statements skip ORM events; keep the in-process indexes current
+        changed_ids = list(changed)
+        if target is None:
+            campaign_search.discard(changed_ids)
+        campaign_index.refresh_campaigns(db, changed_ids)
+
+    return [outcomes[campaign_id] for campaign_id in ids]
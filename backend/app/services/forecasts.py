@@ -0,0 +1,41 @@
+"""
+Funding forecasts over live and archived donations.
+
+The model lives in app.ml.forecast; this module loads each campaign's
+history with the archive's per-campaign totals added, so donations moved
+out of the donations table still count.
+
+The leader's refresh job refits the platform priors. Every other worker
+refits its own copy on read once it is older than
+`forecast_priors_ttl_seconds`, so it does not keep the priors of the first
+forecast it served.
+"""
+from typing import Dict, Optional, Sequence
+from sqlalchemy.orm import Session
+from app.ml.forecast import (
+    FundingForecast, FundingHistory, funding_forecaster, write_predictions
+)
+from app.ml.forecast import load_history as load_live_history
+from app.services.archive import archived_campaign_totals
+
+
+def load_history(db: Session, campaign_ids: Optional[Sequence[int]] = None) -> FundingHistory:
+    """History of ACTIVE campaigns, or the given ones, live and archived."""
+    return load_live_history(db, campaign_ids, archived_totals=archived_campaign_totals)
+
+
+def forecast_campaigns(db: Session, campaign_ids: Sequence[int]) -> FundingForecast:
+    """Forecast a few campaigns against the platform-wide priors."""
+    if funding_forecaster.priors_stale:
+        funding_forecaster.fit_priors(load_history(db))
+    return funding_forecaster.forecast(load_history(db, campaign_ids))
+
+
+def refresh_funding_forecasts(db: Session) -> Dict[str, float]:
+    """Refit the priors, forecast every ACTIVE campaign and store the results."""
+    history = load_history(db)
+    funding_forecaster.fit_priors(history)
+    forecast = funding_forecaster.forecast(history)
+    written = write_predictions(db, forecast)
+    likely = float((forecast.probability_of_goal >= 0.5).mean()) if written else 0.0
+    return {"campaigns": written, "likely_to_reach_goal": round(likely, 3)}
@@ -0,0 +1,293 @@
+"""
+Incrementally maintained impact totals.
+
+Each ImpactMetric insert, update or delete adds its change to three
+ImpactTotal rows, keyed by (scope, scope_id, metric_type). The scopes are the
+metric's campaign, that campaign's community, and the global row
+(scope_id 0). The change is written on the flushing connection, so it
+commits or rolls back with the metric itself. Reads are then a primary-key
+lookup instead of a scan of impact_metrics.
+
+The campaign success rate is kept the same way, under the reserved
+metric type `campaign_success`. Its value_sum is the sum of
+min(current_amount / goal_amount, 1) over COMPLETED campaigns, and its
+row_count is the number of those campaigns. It changes when a campaign
+enters or leaves COMPLETED.
+
+Rows written with Core statements or bulk loads skip the ORM events. Donations
+that arrive after completion also shift a campaign's ratio. `rebuild`
+recomputes every total from the source tables, and the scheduler runs it
+periodically to correct any drift.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import case, delete, event, func, insert, inspect, literal, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.models.models import Campaign, CampaignStatus, ImpactMetric, ImpactTotal
+
+GLOBAL = "global"
+COMMUNITY = "community"
+CAMPAIGN = "campaign"
+CAMPAIGN_SUCCESS = "campaign_success"
+
+totals_table = ImpactTotal.__table__
+
+# (scope, scope_id, metric_type) -> [value_sum, verified_sum, row_count, verified_count]
+Deltas = Dict[Tuple[str, int, str], List[float]]
+
+
+def _accumulate(deltas: Deltas, campaign_id: Optional[int], community_id: Optional[int],
+                metric_type: str, value: float, verified: bool, sign: int) -> None:
+    keys = [(GLOBAL, 0, metric_type)]
+    if campaign_id is not None:
+        keys.append((CAMPAIGN, campaign_id, metric_type))
+    if community_id is not None:
+        keys.append((COMMUNITY, community_id, metric_type))
+    value = (value or 0.0) * sign
+    for key in keys:
+        delta = deltas.setdefault(key, [0.0, 0.0, 0, 0])
+        delta[0] += value
+        delta[2] += sign
+        if verified:
+            delta[1] += value
+            delta[3] += sign
+
+
+def apply_deltas(connection: Connection, deltas: Deltas) -> None:
+    """Add `deltas` to the totals in a single statement where the dialect allows."""
+    rows = [
+        {
+            "scope": scope, "scope_id": scope_id, "metric_type": metric_type,
+            "value_sum": delta[0], "verified_sum": delta[1],
+            "row_count": delta[2], "verified_count": delta[3],
+        }
+        for (scope, scope_id, metric_type), delta in deltas.items()
+    ]
+    if not rows:
+        return
+    columns = ("value_sum", "verified_sum", "row_count", "verified_count")
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(totals_table)
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=["scope", "scope_id", "metric_type"],
+                set_={
+                    name: totals_table.c[name] + statement.excluded[name]
+                    for name in columns
+                }
+            ),
+            rows
+        )
+        return
+
+    for row in rows:
+        key = (
+            (totals_table.c.scope == row["scope"])
+            & (totals_table.c.scope_id == row["scope_id"])
+            & (totals_table.c.metric_type == row["metric_type"])
+        )
+        updated = connection.execute(
+            totals_table.update().where(key).values(
+                {name: totals_table.c[name] + row[name] for name in columns}
+            )
+        ).rowcount
+        if not updated:
+            connection.execute(insert(totals_table), [row])
+
+
+def _community_ids(connection: Connection, campaign_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+    ids = [campaign_id for campaign_id in set(campaign_ids) if campaign_id is not None]
+    if not ids:
+        return {}
+    return dict(connection.execute(
+        select(Campaign.id, Campaign.community_id).where(Campaign.id.in_(ids))
+    ).all())
+
+
+def _success_ratio(current_amount: Optional[float], goal_amount: Optional[float]) -> float:
+    if not goal_amount:
+        return 0.0
+    return min((current_amount or 0.0) / goal_amount, 1.0)
+
+
+def record_completions(connection: Connection, campaign_ids: Iterable[int], sign: int = 1) -> None:
+    """Add (sign=1) or remove (sign=-1) campaigns from the success rate."""
+    ids = list(set(campaign_ids))
+    if not ids:
+        return
+    deltas: Deltas = {}
+    rows = connection.execute(
+        select(Campaign.community_id, Campaign.current_amount, Campaign.goal_amount)
+        .where(Campaign.id.in_(ids))
+    )
+    for community_id, current_amount, goal_amount in rows:
+        _accumulate(deltas, None, community_id, CAMPAIGN_SUCCESS,
+                    _success_ratio(current_amount, goal_amount), False, sign)
+    apply_deltas(connection, deltas)
+
+
+def get_totals(
+    db: Session,
+    scope: str = GLOBAL,
+    scope_id: int = 0,
+    verified_only: bool = False
+) -> Dict[str, float]:
+    """Metric type -> summed value for one scope."""
+    rows = db.execute(
+        select(ImpactTotal.metric_type, ImpactTotal.value_sum, ImpactTotal.verified_sum)
+        .where(
+            ImpactTotal.scope == scope,
+            ImpactTotal.scope_id == scope_id,
+            ImpactTotal.metric_type != CAMPAIGN_SUCCESS,
+        )
+    )
+    return {
+        metric_type: float((verified_sum if verified_only else value_sum) or 0.0)
+        for metric_type, value_sum, verified_sum in rows
+    }
+
+
+def get_success_rate(db: Session, scope: str = GLOBAL, scope_id: int = 0) -> Optional[float]:
+    """Mean funded ratio of COMPLETED campaigns, or None when there are none."""
+    row = db.execute(
+        select(ImpactTotal.value_sum, ImpactTotal.row_count).where(
+            ImpactTotal.scope == scope,
+            ImpactTotal.scope_id == scope_id,
+            ImpactTotal.metric_type == CAMPAIGN_SUCCESS,
+        )
+    ).first()
+    if row is None or not row[1]:
+        return None
+    return float(row[0]) / row[1]
+
+
+def rebuild(db: Session) -> Dict[str, int]:
+    """Recompute every total from impact_metrics and campaigns in one transaction."""
+    verified_value = func.sum(case((ImpactMetric.verified.is_(True), ImpactMetric.value), else_=0.0))
+    verified_count = func.sum(case((ImpactMetric.verified.is_(True), 1), else_=0))
+    sums = (
+        func.coalesce(func.sum(ImpactMetric.value), 0.0), func.coalesce(verified_value, 0.0),
+        func.count(ImpactMetric.id), func.coalesce(verified_count, 0),
+    )
+    scopes = [
+        (CAMPAIGN, ImpactMetric.campaign_id, False),
+        (COMMUNITY, Campaign.community_id, True),
+        (GLOBAL, None, False),
+    ]
+    rows: List[dict] = []
+    for scope, key, joined in scopes:
+        columns = [key if key is not None else literal(0), ImpactMetric.metric_type, *sums]
+        statement = select(*columns)
+        if joined:
+            statement = statement.join(Campaign, Campaign.id == ImpactMetric.campaign_id)
+        if key is not None:
+            statement = statement.where(key.is_not(None))
+        group = [ImpactMetric.metric_type] + ([key] if key is not None else [])
+        for scope_id, metric_type, value_sum, v_sum, count, v_count in db.execute(
+            statement.group_by(*group)
+        ):
+            rows.append({
+                "scope": scope, "scope_id": scope_id, "metric_type": metric_type,
+                "value_sum": value_sum, "verified_sum": v_sum,
+                "row_count": count, "verified_count": v_count,
+            })
+
+    # Two-argument min() is SQLite's spelling of least()
+    least = func.min if db.get_bind().dialect.name == "sqlite" else func.least
+    ratio = case(
+        (Campaign.goal_amount > 0,
+         least(func.coalesce(Campaign.current_amount, 0.0) / Campaign.goal_amount, 1.0)),
+        else_=0.0,
+    )
+    completed = Campaign.status == CampaignStatus.COMPLETED
+    success_rows = list(db.execute(
+        select(Campaign.community_id, func.sum(ratio), func.count(Campaign.id))
+        .where(completed).group_by(Campaign.community_id)
+    ))
+    overall = [0.0, 0]
+    for community_id, ratio_sum, count in success_rows:
+        overall[0] += ratio_sum or 0.0
+        overall[1] += count
+        if community_id is not None:
+            rows.append({
+                "scope": COMMUNITY, "scope_id": community_id, "metric_type": CAMPAIGN_SUCCESS,
+                "value_sum": ratio_sum or 0.0, "verified_sum": 0.0,
+                "row_count": count, "verified_count": 0,
+            })
+    rows.append({
+        "scope": GLOBAL, "scope_id": 0, "metric_type": CAMPAIGN_SUCCESS,
+        "value_sum": overall[0], "verified_sum": 0.0,
+        "row_count": overall[1], "verified_count": 0,
+    })
+
+    db.execute(delete(ImpactTotal))
+    if rows:
+        db.execute(insert(ImpactTotal), rows)
+    db.commit()
+    return {"totals": len(rows)}
+
+
+def _metric_state(target: ImpactMetric, previous: bool) -> Tuple:
+    """(campaign_id, metric_type, value, verified) before or after the flush."""
+    state = inspect(target)
+    values = []
+    for name in ("campaign_id", "metric_type", "value", "verified"):
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            values.append(history.deleted[0])
+        elif previous and history.added:
+            values.append(None)  # the attribute was unset before
+        else:
+            values.append(getattr(target, name))
+    return tuple(values)
+
+
+def _apply_metric(connection: Connection, states: List[Tuple[Tuple, int]]) -> None:
+    communities = _community_ids(connection, (state[0] for state, _ in states))
+    deltas: Deltas = {}
+    for (campaign_id, metric_type, value, verified), sign in states:
+        if metric_type is None:
+            continue
+        _accumulate(deltas, campaign_id, communities.get(campaign_id),
+                    metric_type, value, bool(verified), sign)
+    apply_deltas(connection, deltas)
+
+
+# Load the old value on assignment, so updates can subtract what they replace
+for _attribute in (ImpactMetric.campaign_id, ImpactMetric.metric_type,
+                   ImpactMetric.value, ImpactMetric.verified):
+    event.listen(_attribute, "set", lambda target, value, old, initiator: value,
+                 active_history=True, retval=True)
+
+
+@event.listens_for(ImpactMetric, "after_insert")
+def _impact_metric_inserted(mapper, connection, target: ImpactMetric) -> None:
+    _apply_metric(connection, [(_metric_state(target, False), 1)])
+
+
+@event.listens_for(ImpactMetric, "after_update")
+def _impact_metric_updated(mapper, connection, target: ImpactMetric) -> None:
+    before, after = _metric_state(target, True), _metric_state(target, False)
+    if before != after:
+        _apply_metric(connection, [(before, -1), (after, 1)])
+
+
+@event.listens_for(ImpactMetric, "after_delete")
+def _impact_metric_deleted(mapper, connection, target: ImpactMetric) -> None:
+    _apply_metric(connection, [(_metric_state(target, True), -1)])
+
+
+@event.listens_for(Campaign, "after_update")
+def _campaign_status_changed(mapper, connection, target: Campaign) -> None:
+    history = inspect(target).attrs.status.history
+    if not history.has_changes():
+        return
+    was = bool(history.deleted) and history.deleted[0] == CampaignStatus.COMPLETED
+    now = target.status == CampaignStatus.COMPLETED
+    if was != now:
+        record_completions(connection, [target.id], 1 if now else -1)
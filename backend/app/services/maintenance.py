@@ -0,0 +1,93 @@
+"""
+Periodic maintenance jobs and the scheduler that runs them.
+
+Jobs take a Session and return a small summary dict for the logs. Register
+new ones in `create_scheduler`.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.core.scheduler import Scheduler, create_fallback_lock, create_leader_lock
+from app.ml.ann import campaign_index
+from app.models.models import Campaign, CampaignStatus
+from app.services import impact
+from app.services.archive import archive_donations
+from app.services.forecasts import refresh_funding_forecasts
+from app.services.priority import refresh_need_scores
+from app.services.recommendations import recommendation_service
+
+
+def expire_campaigns(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Move every ACTIVE campaign past its end date to COMPLETED in one UPDATE."""
+    now = now or datetime.utcnow()
+    # content_updated_at is set explicitly: the recommendations refresh
+    # relies on it to spot ended campaigns
+    statement = (
+        update(Campaign)
+        .where(Campaign.status == CampaignStatus.ACTIVE, Campaign.end_date < now)
+        .values(status=CampaignStatus.COMPLETED, updated_at=now, content_updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        expired = list(db.execute(statement.returning(Campaign.id)).scalars())
+        count = len(expired)
+    else:
+        expired = []
+        count = db.execute(statement).rowcount
+    # Without RETURNING, the periodic impact rebuild picks these up
+    impact.record_completions(db.connection(), expired)
+    db.commit()
+
+    # ORM events do not fire for Core updates; drop the campaigns from this
+    # worker's candidate index directly
+    campaign_index.discard(expired)
+    return {"expired": count}
+
+
+def refresh_recommendations(db: Session) -> Dict[str, Any]:
+    return recommendation_service.refresh(db)
+
+
+def rebuild_impact_totals(db: Session) -> Dict[str, Any]:
+    return impact.rebuild(db)
+
+
+def create_scheduler() -> Scheduler:
+    scheduler = Scheduler(
+        SessionLocal,
+        create_leader_lock(
+            settings.scheduler_leader_lock,
+            engine,
+            settings.redis_url,
+            settings.scheduler_lock_ttl_seconds,
+        ),
+        tick_seconds=settings.scheduler_tick_seconds,
+        fallback_lock=(
+            create_fallback_lock(engine)
+            if settings.scheduler_leader_lock == "redis" and settings.scheduler_lock_fallback
+            else None
+        ),
+    )
+    scheduler.add_job(
+        "expire_campaigns", expire_campaigns, settings.campaign_expiry_interval_seconds
+    )
+    scheduler.add_job(
+        "recommendations", refresh_recommendations, settings.recommendations_interval_seconds
+    )
+    scheduler.add_job(
+        "impact_totals", rebuild_impact_totals, settings.impact_totals_rebuild_interval_seconds
+    )
+    scheduler.add_job(
+        "need_scores", refresh_need_scores, settings.need_score_interval_seconds
+    )
+    scheduler.add_job(
+        "funding_forecast", refresh_funding_forecasts, settings.funding_forecast_interval_seconds
+    )
+    if settings.donation_archive_enabled:
+        scheduler.add_job(
+            "donation_archive", archive_donations, settings.donation_archive_interval_seconds
+        )
+    return scheduler
@@ -0,0 +1,410 @@
+"""
+Payment webhook ingestion.
+
+Stripe events are verified against `settings.stripe_webhook_secret` and turned
+into donation records. The records go on an in-process queue, and one writer
+task commits them in micro-batches. A batch is flushed when it reaches
+`payment_webhook_batch_size` or when `payment_webhook_flush_ms` has passed.
+Each webhook request waits until its batch is committed, so an event is only
+acknowledged once it is durable, and Stripe retries anything that failed.
+
+Stripe delivers events at least once, and a payment can be reported by more
+than one event type. Donations are therefore keyed by the PaymentIntent id
+(`Donation.transaction_id`). A bounded set of recently committed ids and the
+table of in-flight ids answer most duplicates without touching the database.
+The unique index on `transaction_id` remains the authority across workers.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.ml.collaborative import item_recommender
+from app.ml.features import donor_features
+from app.models.models import Campaign, Donation, DonorProfile, User
+
+logger = logging.getLogger(__name__)
+
+# Amounts in these currencies are not expressed in hundredths
+ZERO_DECIMAL_CURRENCIES = {
+    "bif", "clp", "djf", "gnf", "jpy", "kmf", "krw", "mga", "pyg",
+    "rwf", "ugx", "vnd", "vuv", "xaf", "xof", "xpf",
+}
+
+
+class SignatureError(ValueError):
+    """The webhook payload is not signed with our secret, or is too old."""
+
+
+class IngestQueueFull(Exception):
+    """Too many events are waiting to be committed."""
+
+
+def sign_payload(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Build a `Stripe-Signature` header value for `payload`."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signed = f"{timestamp}.".encode() + payload
+    digest = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(
+    payload: bytes,
+    header: Optional[str],
+    secret: str,
+    tolerance: float = 300,
+    now: Optional[float] = None
+) -> int:
+    """Check a `Stripe-Signature` header and return its timestamp."""
+    timestamp = None
+    signatures: List[str] = []
+    for item in (header or "").split(","):
+        key, _, value = item.strip().partition("=")
+        if key == "t":
+            try:
+                timestamp = int(value)
+            except ValueError:
+                raise SignatureError("Invalid signature timestamp")
+        elif key == "v1":
+            signatures.append(value)
+    if timestamp is None or not signatures:
+        raise SignatureError("Missing signature")
+
+    expected = sign_payload(payload, secret, timestamp).rsplit("v1=", 1)[1]
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise SignatureError("Signature does not match")
+    now = time.time() if now is None else now
+    if tolerance and abs(now - timestamp) > tolerance:
+        raise SignatureError("Signature timestamp outside the tolerance")
+    return timestamp
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Turn a successful payment event into a donation record, or return None for
+    event types that do not create donations.
+
+    Checkout must put `campaign_id` (and `donor_id` for signed-in donors) in
+    the payment metadata.
+    """
+    event_type = event.get("type")
+    payment = (event.get("data") or {}).get("object") or {}
+    if event_type == "payment_intent.succeeded":
+        transaction_id = payment.get("id")
+        amount = payment.get("amount_received") or payment.get("amount")
+    elif event_type == "checkout.session.completed" and payment.get("payment_status") == "paid":
+        transaction_id = payment.get("payment_intent") or payment.get("id")
+        amount = payment.get("amount_total")
+    else:
+        return None
+
+    metadata = payment.get("metadata") or {}
+    campaign_id = _int_or_none(metadata.get("campaign_id"))
+    if not transaction_id or campaign_id is None or amount is None:
+        return None
+    currency = (payment.get("currency") or "usd").lower()
+    created = event.get("created")
+    return {
+        "transaction_id": transaction_id,
+        "campaign_id": campaign_id,
+        "donor_id": _int_or_none(metadata.get("donor_id")),
+        "amount": amount if currency in ZERO_DECIMAL_CURRENCIES else amount / 100.0,
+        "currency": currency.upper(),
+        "status": "completed",
+        "donor_message": metadata.get("donor_message") or None,
+        "is_anonymous": str(metadata.get("is_anonymous", "")).lower() in ("1", "true", "yes"),
+        "created_at": datetime.utcfromtimestamp(created) if created else datetime.utcnow(),
+    }
+
+
+class PaymentIngestor:
+    """Queues donation records and commits them in micro-batches."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = 200,
+        flush_seconds: float = 0.05,
+        max_pending: int = 5000,
+        seen_size: int = 100_000
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.seen_size = seen_size
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(), name="payment-ingest")
+
+    async def stop(self) -> None:
+        """Commit everything queued, then stop the writer."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            self._queue.put_nowait(None)
+            await self._task
+        self._task = None
+
+    def _remember(self, transaction_id: str) -> None:
+        self._seen[transaction_id] = None
+        self._seen.move_to_end(transaction_id)
+        while len(self._seen) > self.seen_size:
+            self._seen.popitem(last=False)
+
+    async def submit(self, record: Dict[str, Any]) -> str:
+        """Queue a record and wait for its batch; returns the outcome."""
+        transaction_id = record["transaction_id"]
+        if transaction_id in self._seen:
+            self._count("duplicate")
+            return "duplicate"
+        inflight = self._pending.get(transaction_id)
+        if inflight is not None:
+            # Report the original's failure too, so the provider retries
+            await asyncio.shield(inflight)
+            self._count("duplicate")
+            return "duplicate"
+        if len(self._pending) >= self.max_pending:
+            self._count("rejected")
+            raise IngestQueueFull()
+
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[transaction_id] = future
+        self._queue.put_nowait((record, time.monotonic(), future))
+        metrics.set(
+            "payment_webhook_queue_depth", len(self._pending),
+            help_text="Payment events waiting to be committed."
+        )
+        return await asyncio.shield(future)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], float, asyncio.Future]]) -> None:
+        records = [record for record, _, _ in batch]
+        error: Optional[Exception] = None
+        try:
+            outcomes = await asyncio.to_thread(self._write, records)
+        except Exception as exc:
+            logger.exception("Could not commit %d payment events", len(batch))
+            outcomes, error = None, exc
+        committed = time.monotonic()
+
+        lag = 0.0
+        for record, received, future in batch:
+            transaction_id = record["transaction_id"]
+            self._pending.pop(transaction_id, None)
+            lag = max(lag, committed - received)
+            if future.done():
+                continue
+            if outcomes is None:
+                future.set_exception(error)
+                continue
+            outcome = outcomes.get(transaction_id, "duplicate")
+            if outcome in ("created", "duplicate"):
+                self._remember(transaction_id)
+            self._count(outcome)
+            future.set_result(outcome)
+
+        metrics.inc(
+            "payment_webhook_batches_total",
+            help_text="Micro-batches of payment events written.",
+            outcome="failure" if outcomes is None else "success"
+        )
+        metrics.inc(
+            "payment_webhook_batched_events_total", len(batch),
+            help_text="Payment events written in micro-batches."
+        )
+        metrics.set(
+            "payment_webhook_commit_lag_seconds", lag,
+            help_text="Longest queue-to-commit delay in the last batch."
+        )
+        metrics.set(
+            "payment_webhook_queue_depth", len(self._pending),
+            help_text="Payment events waiting to be committed."
+        )
+
+    @staticmethod
+    def _count(outcome: str) -> None:
+        metrics.inc(
+            "payment_webhook_events_total",
+            help_text="Payment webhook events by outcome.",
+            outcome=outcome
+        )
+
+    def _write(self, records: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Insert new donations and update the totals they feed, in one transaction."""
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            by_id.setdefault(record["transaction_id"], record)
+        outcomes = {transaction_id: "duplicate" for transaction_id in by_id}
+
+        db = self.session_factory()
+        try:
+            existing = set(db.scalars(
+                select(Donation.transaction_id).where(Donation.transaction_id.in_(list(by_id)))
+            ))
+            candidates = [r for t, r in by_id.items() if t not in existing]
+            campaigns = set(db.scalars(
+                select(Campaign.id).where(Campaign.id.in_({r["campaign_id"] for r in candidates}))
+            ))
+            donors = set(db.scalars(
+                select(User.id).where(User.id.in_({
+                    r["donor_id"] for r in candidates if r["donor_id"] is not None
+                }))
+            ))
+            rows = []
+            for record in candidates:
+                if record["campaign_id"] not in campaigns:
+                    logger.warning(
+                        "Payment %s is for unknown campaign %s",
+                        record["transaction_id"], record["campaign_id"]
+                    )
+                    outcomes[record["transaction_id"]] = "unmatched"
+                    continue
+                row = dict(record)
+                if row["donor_id"] not in donors:
+                    row["donor_id"] = None  # guest checkout or deleted account
+                rows.append(row)
+
+            created = self._insert(db, rows)
+            for row in created:
+                outcomes[row["transaction_id"]] = "created"
+            self._apply_totals(db, created)
+            db.commit()
+        finally:
+            db.close()
+
+        # Core inserts skip the Donation ORM events that feed these
+        for row in created:
+            if row["donor_id"] is not None:
+                donor_features.record_donation(row["donor_id"], row["amount"])
+                item_recommender.add_donation(row["donor_id"], row["campaign_id"])
+        return outcomes
+
+    @staticmethod
+    def _insert(db: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert rows whose transaction id is new; return the rows inserted."""
+        if not rows:
+            return []
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as upsert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as upsert
+            inserted = set(db.scalars(
+                upsert(Donation)
+                .on_conflict_do_nothing(index_elements=["transaction_id"])
+                .returning(Donation.transaction_id),
+                rows
+            ))
+            return [row for row in rows if row["transaction_id"] in inserted]
+
+        # Another worker may have inserted some of them since the check above
+        savepoint = db.begin_nested()
+        try:
+            db.execute(insert(Donation), rows)
+            savepoint.commit()
+            return rows
+        except IntegrityError:
+            savepoint.rollback()
+        created = []
+        for row in rows:
+            savepoint = db.begin_nested()
+            try:
+                db.execute(insert(Donation), [row])
+                savepoint.commit()
+                created.append(row)
+            except IntegrityError:
+                savepoint.rollback()
+        return created
+
+    @staticmethod
+    def _apply_totals(db: Session, rows: List[Dict[str, Any]]) -> None:
+        """Add the new donations to campaign and donor profile totals."""
+        raised: Dict[int, float] = {}
+        given: Dict[int, List[float]] = {}
+        for row in rows:
+            raised[row["campaign_id"]] = raised.get(row["campaign_id"], 0.0) + row["amount"]
+            if row["donor_id"] is not None:
+                given.setdefault(row["donor_id"], []).append(row["amount"])
+        connection = db.connection()
+
+        if raised:
+            campaigns = Campaign.__table__
+            connection.execute(
+                campaigns.update()
+                .where(campaigns.c.id == bindparam("b_id"))
+                .values(current_amount=func.coalesce(campaigns.c.current_amount, 0)
+                        + bindparam("b_amount")),
+                [{"b_id": cid, "b_amount": amount} for cid, amount in raised.items()]
+            )
+        if given:
+            profiles = DonorProfile.__table__
+            total = func.coalesce(profiles.c.total_donated, 0) + bindparam("b_total")
+            count = func.coalesce(profiles.c.donation_count, 0) + bindparam("b_count")
+            connection.execute(
+                profiles.update()
+                .where(profiles.c.user_id == bindparam("b_user_id"))
+                .values(total_donated=total, donation_count=count, average_donation=total / count),
+                [
+                    {"b_user_id": uid, "b_total": sum(amounts), "b_count": len(amounts)}
+                    for uid, amounts in given.items()
+                ]
+            )
+
+
+payment_ingestor = PaymentIngestor(
+    SessionLocal,
+    batch_size=settings.payment_webhook_batch_size,
+    flush_seconds=settings.payment_webhook_flush_ms / 1000.0,
+    max_pending=settings.payment_webhook_max_pending,
+    seen_size=settings.payment_webhook_seen_size,
+)
@@ -0,0 +1,121 @@
+"""
+Community need score.
+
+Every component is scaled to 0-1, where higher means more need:
+- poverty: poverty_index
+- menstrual_health: 1 - menstrual_health_score / 100
+- school_enrollment: 1 - school_enrollment_rate
+- girls: log1p(girls_count) / log1p(need_score_girls_scale), capped at 1
+
+The score is the weighted mean of these components, using
+`settings.need_score_weights`. A missing input counts as 0.5 (0 for girls).
+
+The score is stored in `Community.need_score`, which is indexed, so the
+priority endpoint reads the top K from an index. ORM writes rescore the row
+being flushed. `refresh_need_scores` rescores only rows whose
+`need_score_key` differs from the current weights: rows written with Core
+statements, and every row after the weights change. It works in vectorized
+batches.
+"""
+import hashlib
+import json
+from typing import Dict
+import numpy as np
+from sqlalchemy import bindparam, event, or_, select
+from sqlalchemy.orm import Session
+from app.core.cache import community_cache
+from app.core.config import settings
+from app.models.models import Community
+
+COMPONENTS = ("poverty", "menstrual_health", "school_enrollment", "girls")
+INPUTS = ("poverty_index", "menstrual_health_score", "school_enrollment_rate", "girls_count")
+
+
+def _weights() -> Dict[str, float]:
+    weights = {name: float(settings.need_score_weights.get(name, 0.0)) for name in COMPONENTS}
+    if sum(weights.values()) <= 0:
+        raise ValueError("need_score_weights must have a positive total")
+    return weights
+
+
+def weights_key() -> str:
+    """Short fingerprint of the scoring parameters stored with each score."""
+    params = {"weights": _weights(), "girls_scale": settings.need_score_girls_scale}
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def need_scores(
+    poverty_index: np.ndarray,
+    menstrual_health_score: np.ndarray,
+    school_enrollment_rate: np.ndarray,
+    girls_count: np.ndarray
+) -> np.ndarray:
+    """Vectorized need score; inputs are float arrays with NaN for missing values."""
+    weights = _weights()
+    components = {
+        "poverty": np.clip(poverty_index, 0.0, 1.0),
+        "menstrual_health": 1.0 - np.clip(menstrual_health_score / 100.0, 0.0, 1.0),
+        "school_enrollment": 1.0 - np.clip(school_enrollment_rate, 0.0, 1.0),
+        "girls": np.clip(
+            np.log1p(np.maximum(girls_count, 0.0)) / np.log1p(settings.need_score_girls_scale),
+            0.0, 1.0
+        ),
+    }
+    total = np.zeros(len(poverty_index), dtype=np.float64)
+    for name, values in components.items():
+        missing = 0.0 if name == "girls" else 0.5
+        total += weights[name] * np.where(np.isnan(values), missing, values)
+    return total / sum(weights.values())
+
+
+def _as_array(values) -> np.ndarray:
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def score_community(community: Community) -> float:
+    score = need_scores(*(_as_array([getattr(community, name)]) for name in INPUTS))
+    return round(float(score[0]), 6)
+
+
+def refresh_need_scores(db: Session, batch_size: int = 10_000) -> Dict[str, int]:
+    """Rescore communities whose stored score is missing or was made with other weights."""
+    key = weights_key()
+    stale = or_(Community.need_score_key.is_(None), Community.need_score_key != key)
+    table = Community.__table__
+    statement = (
+        table.update()
+        .where(table.c.id == bindparam("b_id"))
+        .values(need_score=bindparam("b_score"), need_score_key=key)
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        # Keyset pages over the primary key, so each row is read once
+        batch = db.execute(
+            select(Community.id, *(getattr(Community, name) for name in INPUTS))
+            .where(stale, Community.id > last_id)
+            .order_by(Community.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        columns = list(zip(*batch))
+        scores = np.round(need_scores(*(_as_array(values) for values in columns[1:])), 6)
+        db.connection().execute(statement, [
+            {"b_id": community_id, "b_score": float(score)}
+            for community_id, score in zip(columns[0], scores)
+        ])
+        updated += len(batch)
+    db.commit()
+    if updated:
+        # Core updates skip the cache's ORM events
+        community_cache.invalidate_all()
+    return {"rescored": updated}
+
+
+@event.listens_for(Community, "before_insert")
+@event.listens_for(Community, "before_update")
+def _score_on_write(mapper, connection, target: Community) -> None:
+    target.need_score = score_community(target)
+    target.need_score_key = weights_key()
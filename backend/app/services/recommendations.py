@@ -0,0 +1,244 @@
+"""
+Precomputed donor recommendations.
+
+`RecommendationService.refresh` ranks active campaigns for donors with
+`DonorMatcher` and upserts each donor's top-N into `MatchingRecord`, so the
+recommendations endpoint is a single indexed lookup. Runs are incremental
+against the watermark stored in `JobState`:
+
+- donors whose profile changed are re-ranked against every active campaign
+- donors holding a pending match on a campaign that changed, ended or was
+  deleted are re-ranked too, since their next-best campaign is not stored
+- every other donor only has the changed, still-active campaigns scored and
+  merged into their stored top-N
+
+Run it from cron or the scheduler, or by hand:
+
+    python -m app.services.recommendations [--full]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.ml.predictor import DonorMatcher
+from app.models.models import (
+    Campaign, CampaignStatus, DonorProfile, JobState, MatchingRecord
+)
+from app.services.archive import completed_donations
+
+PENDING = "pending"
+
+
+def _batches(ids: List[int], size: int) -> Iterable[List[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class RecommendationService:
+    """Maintains and serves per-donor top-N campaign matches."""
+
+    JOB_NAME = "recommendations"
+
+    def __init__(
+        self,
+        matcher: DonorMatcher,
+        top_n: int = 10,
+        batch_size: int = 1000
+    ):
+        self.matcher = matcher
+        self.top_n = top_n
+        self.batch_size = batch_size
+
+    def for_donor(self, db: Session, donor_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Serve precomputed matches for one donor, best first."""
+        rows = db.execute(
+            select(
+                MatchingRecord.campaign_id,
+                Campaign.title,
+                MatchingRecord.match_score,
+                MatchingRecord.match_reason
+            )
+            .join(Campaign, Campaign.id == MatchingRecord.campaign_id)
+            .where(
+                MatchingRecord.donor_id == donor_id,
+                MatchingRecord.status == PENDING
+            )
+            .order_by(MatchingRecord.match_score.desc())
+            .limit(limit)
+        ).all()
+        return [
+            {
+                "campaign_id": row.campaign_id,
+                "campaign_title": row.title,
+                "match_score": row.match_score,
+                "match_reason": row.match_reason
+            }
+            for row in rows
+        ]
+
+    def refresh(self, db: Session, full: bool = False) -> Dict[str, Any]:
+        """Recompute recommendations for changed donors and campaigns."""
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        state = db.get(JobState, self.JOB_NAME)
+        if state is None:
+            state = JobState(name=self.JOB_NAME, run_count=0, failure_count=0)
+            db.add(state)
+        watermark = None if full else state.last_success_at
+        db.commit()
+
+        # Campaigns are scored for every batch; detach them so the per-batch
+        # commits do not expire and reload them
+        active = db.query(Campaign).filter(Campaign.status == CampaignStatus.ACTIVE).all()
+        for campaign in active:
+            db.expunge(campaign)
+        if full:
+            self.matcher.reload(db)
+        else:
+            self.matcher.prepare(db)
+        all_donors = set(db.execute(select(DonorProfile.user_id)).scalars())
+
+        if watermark is None:
+            rerank = all_donors
+            merge_donors: Set[int] = set()
+            changed_active: List[Campaign] = []
+        else:
+            # Content, goal or status edits; views and amounts raised do not count
+            changed = select(Campaign.id).where(Campaign.content_updated_at > watermark)
+            changed_ids = set(db.execute(changed).scalars())
+            changed_profiles = set(db.execute(
+                select(DonorProfile.user_id).where(DonorProfile.updated_at > watermark)
+            ).scalars())
+            # Pending matches on campaigns that changed or are no longer active
+            active_ids = select(Campaign.id).where(Campaign.status == CampaignStatus.ACTIVE)
+            stale_holders = set(db.execute(
+                select(MatchingRecord.donor_id).distinct().where(
+                    MatchingRecord.status == PENDING,
+                    (MatchingRecord.campaign_id.in_(changed))
+                    | (MatchingRecord.campaign_id.not_in(active_ids))
+                )
+            ).scalars())
+            rerank = (changed_profiles | stale_holders) & all_donors
+            changed_active = [c for c in active if c.id in changed_ids]
+            merge_donors = (all_donors - rerank) if changed_active else set()
+
+        for batch in _batches(sorted(rerank), self.batch_size):
+            self._process_batch(db, batch, active, merge=False)
+        for batch in _batches(sorted(merge_donors), self.batch_size):
+            self._process_batch(db, batch, changed_active, merge=True)
+
+        duration_ms = (time.perf_counter() - started) * 1000.0
+        state = db.get(JobState, self.JOB_NAME)
+        # Run counts, timings and errors are recorded by the scheduler
+        state.last_success_at = started_at
+        db.commit()
+        return {
+            "reranked_donors": len(rerank),
+            "merged_donors": len(merge_donors),
+            "active_campaigns": len(active),
+            "changed_campaigns": len(changed_active),
+            "duration_ms": round(duration_ms, 1),
+        }
+
+    def _process_batch(
+        self,
+        db: Session,
+        donor_ids: List[int],
+        campaigns: List[Campaign],
+        merge: bool
+    ) -> None:
+        existing: Dict[int, List[MatchingRecord]] = {donor_id: [] for donor_id in donor_ids}
+        for record in db.query(MatchingRecord).filter(MatchingRecord.donor_id.in_(donor_ids)):
+            existing[record.donor_id].append(record)
+
+        by_id = {c.id: c for c in campaigns}
+        inserts, updates, deletes = [], [], []
+        for donor_id in donor_ids:
+            records = existing[donor_id]
+            pool = campaigns
+            if not merge:
+                retrieved = self.matcher.candidate_ids(db, donor_id)
+                if retrieved is not None:
+                    pool = [by_id[i] for i in retrieved if i in by_id]
+            # Campaigns the donor already accepted or rejected are not recommended again
+            decided = {r.campaign_id for r in records if r.status != PENDING}
+            candidates = [c for c in pool if c.id not in decided]
+            ranked = self.matcher.rank_campaigns(donor_id, candidates, self.top_n)
+            if merge:
+                scored = {m["campaign_id"] for m in ranked}
+                ranked += [
+                    {"campaign_id": r.campaign_id, "match_score": r.match_score,
+                     "match_reason": r.match_reason}
+                    for r in records if r.status == PENDING and r.campaign_id not in scored
+                ]
+                ranked.sort(key=lambda m: m["match_score"], reverse=True)
+                ranked = ranked[:self.top_n]
+
+            wanted = {m["campaign_id"]: m for m in ranked}
+            for record in records:
+                match = wanted.pop(record.campaign_id, None)
+                if match is not None:
+                    if (record.match_score, record.match_reason) != (
+                        match["match_score"], match["match_reason"]
+                    ):
+                        updates.append({
+                            "id": record.id,
+                            "match_score": match["match_score"],
+                            "match_reason": match["match_reason"],
+                        })
+                elif record.status == PENDING:
+                    deletes.append(record.id)
+            now = datetime.utcnow()
+            inserts.extend(
+                {
+                    "donor_id": donor_id,
+                    "campaign_id": campaign_id,
+                    "match_score": match["match_score"],
+                    "match_reason": match["match_reason"],
+                    "status": PENDING,
+                    "created_at": now,
+                }
+                for campaign_id, match in wanted.items()
+            )
+
+        if deletes:
+            db.execute(
+                delete(MatchingRecord).where(MatchingRecord.id.in_(deletes)),
+                execution_options={"synchronize_session": False}
+            )
+        if updates:
+            db.execute(update(MatchingRecord), updates)
+        if inserts:
+            db.execute(insert(MatchingRecord), inserts)
+        db.commit()
+        db.expunge_all()
+
+
+recommendation_service = RecommendationService(
+    DonorMatcher(completed_donations),
+    top_n=settings.recommendations_top_n,
+    batch_size=settings.recommendations_batch_size
+)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Refresh precomputed recommendations")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(recommendation_service.refresh(db, full=args.full))
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""
+Full-text search over campaign title, description and story narrative.
+
+The backend is picked from the database dialect:
+- SQLite: an external-content FTS5 table kept in sync by triggers, ranked by bm25()
+- PostgreSQL: a GIN index on a weighted tsvector expression, ranked by ts_rank_cd
+- anything else (or SQLite without FTS5): an in-process inverted index with
+  BM25 ranking, kept current by ORM events on Campaign
+"""
+import logging
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.models.models import Campaign, CampaignStatus
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Relative weight of each searchable field
+FIELD_WEIGHTS = {"title": 10.0, "description": 2.0, "story_narrative": 1.0}
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS campaigns_fts USING fts5(
+        title, description, story_narrative,
+        content='campaigns', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS campaigns_fts_insert AFTER INSERT ON campaigns BEGIN
+        INSERT INTO campaigns_fts(rowid, title, description, story_narrative)
+        VALUES (new.id, new.title, new.description, new.story_narrative);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS campaigns_fts_delete AFTER DELETE ON campaigns BEGIN
+        INSERT INTO campaigns_fts(campaigns_fts, rowid, title, description, story_narrative)
+        VALUES ('delete', old.id, old.title, old.description, old.story_narrative);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS campaigns_fts_update
+    AFTER UPDATE OF title, description, story_narrative ON campaigns BEGIN
+        INSERT INTO campaigns_fts(campaigns_fts, rowid, title, description, story_narrative)
+        VALUES ('delete', old.id, old.title, old.description, old.story_narrative);
+        INSERT INTO campaigns_fts(rowid, title, description, story_narrative)
+        VALUES (new.id, new.title, new.description, new.story_narrative);
+    END
+    """,
+]
+SQLITE_TRIGGERS = ("campaigns_fts_insert", "campaigns_fts_delete", "campaigns_fts_update")
+SQLITE_TEARDOWN = [
+    *(f"DROP TRIGGER IF EXISTS {name}" for name in SQLITE_TRIGGERS),
+    "DROP TABLE IF EXISTS campaigns_fts",
+]
+
+# Must match the indexed expression exactly for the planner to use the GIN index
+PG_VECTOR = (
+    "(setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(story_narrative, '')), 'C'))"
+)
+PG_SETUP = [
+    f"CREATE INDEX IF NOT EXISTS ix_campaigns_search ON campaigns USING GIN ({PG_VECTOR})",
+]
+PG_TEARDOWN = ["DROP INDEX IF EXISTS ix_campaigns_search"]
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return _TOKEN.findall(value.lower()) if value else []
+
+
+class InMemoryIndex:
+    """Inverted index with field-weighted BM25 scoring."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._doc_terms: Dict[int, Dict[str, float]] = {}
+        self._doc_length: Dict[int, float] = {}
+        self._total_length = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_length)
+
+    def add(self, doc_id: int, fields: Dict[str, Optional[str]]) -> None:
+        terms: Dict[str, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(field)):
+                terms[token] += weight
+        length = sum(terms.values())
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, frequency in terms.items():
+                self._postings[term][doc_id] = frequency
+            self._doc_terms[doc_id] = dict(terms)
+            self._doc_length[doc_id] = length
+            self._total_length += length
+
+    def remove(self, doc_id: int) -> None:
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: int) -> None:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_length.pop(doc_id)
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """All documents containing every query term, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in terms]
+            if any(not p for p in postings):
+                return []
+            n_docs = len(self._doc_length)
+            avg_length = self._total_length / n_docs if n_docs else 0.0
+            candidates = set.intersection(*(set(p) for p in postings))
+            scores = []
+            for doc_id in candidates:
+                norm = self.k1 * (1 - self.b + self.b * self._doc_length[doc_id] / avg_length)
+                score = 0.0
+                for posting in postings:
+                    idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                    tf = posting[doc_id]
+                    score += idf * tf * (self.k1 + 1) / (tf + norm)
+                scores.append((doc_id, score))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores
+
+
+class CampaignSearch:
+    """Campaign search with a dialect-specific index."""
+
+    def __init__(self):
+        self.backend: Optional[str] = None
+        self.memory_index: Optional[InMemoryIndex] = None
+        self._memory_loaded = False
+        self._load_lock = threading.Lock()
+
+    def setup(self, engine: Engine) -> str:
+        """
+        Create the index for this database if needed and return the backend name.
+        The FTS5 index is rebuilt from campaigns when it or any of its triggers
+        was missing (rows written meanwhile were never indexed), or when it
+        holds a different number of rows than campaigns.
+        """
+        dialect = engine.dialect.name
+        if dialect == "sqlite":
+            try:
+                with engine.begin() as conn:
+                    expected = ("campaigns_fts",) + SQLITE_TRIGGERS
+                    present = conn.execute(
+                        text("SELECT count(*) FROM sqlite_master WHERE name IN :names")
+                        .bindparams(bindparam("names", expanding=True)),
+                        {"names": list(expected)}
+                    ).scalar()
+                    for statement in SQLITE_SETUP:
+                        conn.execute(text(statement))
+                    # Count the docsize shadow table: a scan of an external
+                    # content table reads the content table instead
+                    indexed = conn.execute(text("SELECT count(*) FROM campaigns_fts_docsize")).scalar()
+                    campaigns = conn.execute(text("SELECT count(*) FROM campaigns")).scalar()
+                    if present < len(expected) or indexed != campaigns:
+                        logger.info(
+                            "Rebuilding campaign search index (%d of %d objects, %d of %d rows)",
+                            present, len(expected), indexed, campaigns
+                        )
+                        conn.execute(text(
+                            "INSERT INTO campaigns_fts(campaigns_fts) VALUES ('rebuild')"
+                        ))
+                    weights = ", ".join(str(w) for w in FIELD_WEIGHTS.values())
+                    conn.execute(text(
+                        "INSERT INTO campaigns_fts(campaigns_fts, rank) "
+                        f"VALUES ('rank', 'bm25({weights})')"
+                    ))
+                self.backend = "fts5"
+            except OperationalError as exc:
+                logger.warning("FTS5 unavailable, using in-process search index: %s", exc)
+                self._use_memory()
+        elif dialect == "postgresql":
+            with engine.begin() as conn:
+                for statement in PG_SETUP:
+                    conn.execute(text(statement))
+            self.backend = "tsvector"
+        else:
+            self._use_memory()
+        return self.backend
+
+    def drop(self, engine: Engine) -> None:
+        """
+        Remove the index and its triggers, e.g. before campaigns is recreated
+        and bulk loaded; setup() afterwards builds it from the loaded rows.
+        """
+        dialect = engine.dialect.name
+        statements = {"sqlite": SQLITE_TEARDOWN, "postgresql": PG_TEARDOWN}.get(dialect, [])
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+        self.backend = None
+        self.memory_index = None
+        self._memory_loaded = False
+
+    def _use_memory(self) -> None:
+        self.backend = "memory"
+        self.memory_index = InMemoryIndex()
+        if not event.contains(Campaign, "after_insert", _index_campaign):
+            event.listen(Campaign, "after_insert", _index_campaign)
+            event.listen(Campaign, "after_update", _index_campaign)
+            event.listen(Campaign, "after_delete", _unindex_campaign)
+
+    def _ensure_memory_loaded(self, db: Session) -> None:
+        if self._memory_loaded:
+            return
+        with self._load_lock:
+            if self._memory_loaded:
+                return
+            rows = db.query(
+                Campaign.id, Campaign.title, Campaign.description, Campaign.story_narrative
+            ).yield_per(5000)
+            for row in rows:
+                self.memory_index.add(row.id, row._asdict())
+            self._memory_loaded = True
+
+    def discard(self, campaign_ids: List[int]) -> None:
+        """Forget campaigns deleted outside the ORM (FTS5 and tsvector need nothing)."""
+        if self.memory_index is not None:
+            for campaign_id in campaign_ids:
+                self.memory_index.remove(campaign_id)
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        skip: int = 0,
+        limit: int = 20,
+        status: Optional[CampaignStatus] = None
+    ) -> Tuple[int, List[Tuple[Campaign, float]]]:
+        """Return (total matches, [(campaign, score)]) for one page, best first."""
+        if self.backend is None:
+            self.setup(db.get_bind())
+        if not tokenize(query):
+            return 0, []
+
+        if self.backend == "fts5":
+            total, ranked = self._search_fts5(db, query, skip, limit, status)
+        elif self.backend == "tsvector":
+            total, ranked = self._search_tsvector(db, query, skip, limit, status)
+        else:
+            total, ranked = self._search_memory(db, query, skip, limit, status)
+
+        if not ranked:
+            return total, []
+        ids = [campaign_id for campaign_id, _ in ranked]
+        by_id = {c.id: c for c in db.query(Campaign).filter(Campaign.id.in_(ids))}
+        return total, [(by_id[i], score) for i, score in ranked if i in by_id]
+
+    def _search_fts5(self, db, query, skip, limit, status):
+        # Quote every token so user input cannot inject FTS5 syntax; the last
+        # token is a prefix so partially typed words still match
+        tokens = tokenize(query)
+        match = " ".join([f'"{t}"' for t in tokens[:-1]] + [f'"{tokens[-1]}"*'])
+        params = {"match": match, "skip": skip, "limit": limit}
+        if status:
+            # The status filter needs the content table; without it the FTS
+            # index answers on its own
+            params["status"] = status.name
+            source = (
+                "campaigns_fts JOIN campaigns c ON c.id = campaigns_fts.rowid "
+                "WHERE campaigns_fts MATCH :match AND c.status = :status"
+            )
+        else:
+            source = "campaigns_fts WHERE campaigns_fts MATCH :match"
+        total = db.execute(text(f"SELECT count(*) FROM {source}"), params).scalar()
+        # `rank` is configured as weighted bm25() in setup(); lower is better
+        rows = db.execute(text(
+            f"SELECT campaigns_fts.rowid AS id, -campaigns_fts.rank AS score FROM {source} "
+            "ORDER BY campaigns_fts.rank LIMIT :limit OFFSET :skip"
+        ), params).all()
+        return total, [(row.id, float(row.score)) for row in rows]
+
+    def _search_tsvector(self, db, query, skip, limit, status):
+        status_clause = "AND status = :status" if status else ""
+        params = {"query": query, "skip": skip, "limit": limit}
+        if status:
+            params["status"] = status.name
+        total = db.execute(text(
+            f"SELECT count(*) FROM campaigns "
+            f"WHERE {PG_VECTOR} @@ websearch_to_tsquery('english', :query) {status_clause}"
+        ), params).scalar()
+        rows = db.execute(text(
+            f"SELECT id, ts_rank_cd({PG_VECTOR}, websearch_to_tsquery('english', :query)) AS score "
+            f"FROM campaigns WHERE {PG_VECTOR} @@ websearch_to_tsquery('english', :query) "
+            f"{status_clause} ORDER BY score DESC, id LIMIT :limit OFFSET :skip"
+        ), params).all()
+        return total, [(row.id, float(row.score)) for row in rows]
+
+    def _search_memory(self, db, query, skip, limit, status):
+        self._ensure_memory_loaded(db)
+        ranked = self.memory_index.search(query)
+        if status:
+            allowed = {
+                row.id for row in db.query(Campaign.id).filter(
+                    Campaign.id.in_([doc_id for doc_id, _ in ranked]),
+                    Campaign.status == status
+                )
+            }
+            ranked = [item for item in ranked if item[0] in allowed]
+        return len(ranked), ranked[skip:skip + limit]
+
+
+campaign_search = CampaignSearch()
+
+
+def _index_campaign(mapper, connection, target: Campaign) -> None:
+    if campaign_search.memory_index is not None and campaign_search._memory_loaded:
+        campaign_search.memory_index.add(target.id, {
+            "title": target.title,
+            "description": target.description,
+            "story_narrative": target.story_narrative,
+        })
+
+
+def _unindex_campaign(mapper, connection, target: Campaign) -> None:
+    if campaign_search.memory_index is not None:
+        campaign_search.memory_index.remove(target.id)
@@ -0,0 +1,130 @@
+"""
+Analytics snapshot benchmark and consistency check.
+
+Generates synthetic data, loads the in-memory analytics snapshot and times
+funding per community against the equivalent SQL GROUP BY over donations,
+campaigns and communities. New donations and a campaign moved to another
+community are then written, and an incremental refresh is timed. Snapshot
+and SQL answers are compared after the load and after the refresh; the exit
+code is 1 if they differ.
+
+    python -m benchmarks.analytics_bench --donations 100000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+import numpy as np
+
+
+def sql_funding_by_community(engine) -> Dict[int, float]:
+    from sqlalchemy import func, select
+    from app.models.models import Campaign, Community, Donation
+
+    query = (
+        select(Community.id, func.sum(Donation.amount))
+        .join(Campaign, Campaign.community_id == Community.id)
+        .join(Donation, Donation.campaign_id == Campaign.id)
+        .where(Donation.status == "completed")
+        .group_by(Community.id)
+    )
+    with engine.connect() as conn:
+        return {community_id: float(amount) for community_id, amount in conn.execute(query)}
+
+
+def snapshot_funding_by_community(snapshot) -> Dict[int, float]:
+    from app.services.analytics import Scope
+
+    groups = snapshot.coverage("community", Scope())["groups"]
+    return {group["community_id"]: group["funding"] for group in groups if group["donation_count"]}
+
+
+def same(expected: Dict[int, float], actual: Dict[int, float]) -> bool:
+    return expected.keys() == actual.keys() and all(
+        np.isclose(expected[key], actual[key]) for key in expected
+    )
+
+
+def best_ms(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analytics snapshot benchmark")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--donations", type=int, default=100_000)
+    parser.add_argument("--new-donations", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    from sqlalchemy import func, insert, select, update
+    from app.core.database import SessionLocal, engine
+    from app.models.models import Campaign, Donation
+    from app.services.analytics import AnalyticsSnapshot, Scope
+    from benchmarks.generate import generate, scale_counts
+
+    counts = scale_counts(args.donations)
+    generate(engine, counts, seed=args.seed)
+    snapshot = AnalyticsSnapshot(SessionLocal, max_age_seconds=float("inf"))
+
+    started = time.perf_counter()
+    snapshot.refresh(full=True)
+    load_ms = (time.perf_counter() - started) * 1000
+    sql_ms = best_ms(lambda: sql_funding_by_community(engine), args.repeat)
+    memory_ms = best_ms(lambda: snapshot_funding_by_community(snapshot), args.repeat)
+    trend_ms = best_ms(lambda: snapshot.funding_trend("month", Scope()), args.repeat)
+    metrics_ms = best_ms(lambda: snapshot.dashboard(Scope()), args.repeat)
+    print(f"{args.donations:,} donations: full load {load_ms:.0f}ms")
+    print(f"funding by community: SQL {sql_ms:.1f}ms, snapshot {memory_ms:.1f}ms; "
+          f"monthly trend {trend_ms:.1f}ms, dashboard {metrics_ms:.1f}ms")
+    failures = not same(sql_funding_by_community(engine), snapshot_funding_by_community(snapshot))
+
+    # New donations, one of them committed late with an older created_at,
+    # and a campaign moved to another community
+    rng = np.random.default_rng(args.seed)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Donation), [
+            {
+                "campaign_id": int(rng.integers(1, counts["campaigns"] + 1)),
+                "donor_id": int(rng.integers(1, counts["users"] + 1)),
+                "amount": float(rng.gamma(2.0, 25.0)),
+                "currency": "USD",
+                "status": "completed",
+                "created_at": now - timedelta(seconds=60 if i == 0 else 0),
+            }
+            for i in range(args.new_donations)
+        ])
+        community_id = conn.execute(select(Campaign.community_id).where(Campaign.id == 1)).scalar()
+        conn.execute(
+            update(Campaign).where(Campaign.id == 1)
+            .values(community_id=community_id % counts["communities"] + 1, updated_at=now)
+        )
+        total = conn.execute(
+            select(func.count()).select_from(Donation).where(Donation.status == "completed")
+        ).scalar()
+
+    started = time.perf_counter()
+    snapshot.refresh()
+    refresh_ms = (time.perf_counter() - started) * 1000
+    held = len(snapshot.snapshot.donations)
+    print(f"incremental refresh after {args.new_donations:,} donations and a moved campaign: "
+          f"{refresh_ms:.0f}ms, {held:,} of {total:,} completed donations held")
+    failures += held != total
+    failures += not same(sql_funding_by_community(engine), snapshot_funding_by_community(snapshot))
+    print("snapshot matches SQL" if not failures else "FAIL: snapshot differs from SQL")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
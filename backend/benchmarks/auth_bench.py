@@ -0,0 +1,64 @@
+"""
+Microbenchmark of per-request authentication cost with and without the
+verified-token cache.
+
+    python -m benchmarks.auth_bench --iterations 20000 --tokens 100
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="JWT verification microbenchmark")
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--tokens", type=int, default=100, help="Distinct tokens in rotation")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    from fastapi.security import HTTPAuthorizationCredentials
+    from app.core.security import (
+        create_access_token, get_current_user, token_cache, verify_token,
+        verify_token_cached
+    )
+
+    tokens = [create_access_token({"sub": str(i)}) for i in range(args.tokens)]
+    credentials = [
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=t) for t in tokens
+    ]
+
+    def timed(label: str, func) -> float:
+        started = time.perf_counter()
+        for i in range(args.iterations):
+            func(i % args.tokens)
+        per_call = (time.perf_counter() - started) / args.iterations * 1e6
+        print(f"{label:<36}{per_call:>10.2f} us/request")
+        return per_call
+
+    async def current_user_loop() -> None:
+        for i in range(args.iterations):
+            await get_current_user(credentials[i % args.tokens])
+
+    def timed_dependency(label: str) -> float:
+        started = time.perf_counter()
+        asyncio.run(current_user_loop())
+        per_call = (time.perf_counter() - started) / args.iterations * 1e6
+        print(f"{label:<36}{per_call:>10.2f} us/request")
+        return per_call
+
+    uncached = timed("verify_token (jwt.decode)", lambda i: verify_token(tokens[i]))
+    token_cache.clear()
+    cached = timed("verify_token_cached", lambda i: verify_token_cached(tokens[i]))
+    dependency = timed_dependency("get_current_user (cached)")
+    print(f"speedup: {uncached / cached:.1f}x  "
+          f"(hits={token_cache.hits}, misses={token_cache.misses}, "
+          f"dependency={dependency:.2f} us)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Login throughput benchmark.
+
+Measures /auth/login throughput under a login storm and the latency of
+campaign reads served at the same time, to check that bcrypt work stays in
+its own pool and does not starve other endpoints.
+
+    python -m benchmarks.login_bench --logins 200 --login-concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+PASSWORD = "benchmark-password"
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Login throughput benchmark")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--read-concurrency", type=int, default=4)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    # All benchmark traffic comes from one client address
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    # Allow the whole storm to queue so throughput, not shedding, is measured
+    os.environ.setdefault("PASSWORD_HASH_MAX_PENDING", str(args.logins))
+    return asyncio.run(run(args))
+
+
+async def run(args: argparse.Namespace) -> int:
+    import httpx
+    from sqlalchemy import update
+    from app.core.config import settings
+    from app.core.database import engine
+    from app.core.security import get_password_hash
+    from app.main import app
+    from app.models.models import User
+    from benchmarks.generate import generate, scale_counts
+    from benchmarks.report import summarize
+
+    counts = scale_counts(1_000)
+    counts["users"] = max(args.users, counts["users"])
+    generate(engine, counts)
+    hashed = get_password_hash(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(update(User).values(hashed_password=hashed, is_active=True))
+
+    api = settings.api_v1_prefix
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def reads(n: int, concurrency: int):
+            latencies: List[float] = []
+            remaining = n
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    await client.get(f"{api}/campaigns?limit=20")
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return summarize(latencies, time.perf_counter() - started, 0, 0)
+
+        async def logins(n: int, concurrency: int):
+            latencies: List[float] = []
+            errors = 0
+            issued = 0
+
+            async def worker():
+                nonlocal errors, issued
+                while issued < n:
+                    user_id = issued % counts["users"] + 1
+                    issued += 1
+                    started = time.perf_counter()
+                    response = await client.post(f"{api}/auth/login", json={
+                        "email": f"user{user_id}@synthetic.laafitech.org",
+                        "password": PASSWORD,
+                    })
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return summarize(latencies, time.perf_counter() - started, 0, errors)
+
+        idle = await reads(args.reads, args.read_concurrency)
+        storm, during = await asyncio.gather(
+            logins(args.logins, args.login_concurrency),
+            reads(args.reads, args.read_concurrency),
+        )
+
+    print(f"bcrypt rounds={settings.bcrypt_rounds} "
+          f"workers={settings.password_hash_workers}")
+    print(f"logins: {storm['throughput_rps']:.1f}/s  p50={storm['p50_ms']:.1f}ms "
+          f"p95={storm['p95_ms']:.1f}ms errors={storm['errors']}")
+    print(f"campaign reads idle:   p50={idle['p50_ms']:.1f}ms p95={idle['p95_ms']:.1f}ms")
+    print(f"campaign reads storm:  p50={during['p50_ms']:.1f}ms p95={during['p95_ms']:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Per-request overhead of the rate limiter.
+
+    python -m benchmarks.rate_limit_bench --iterations 50000 --clients 1000
+
+Measures the in-process buckets and, when REDIS_URL is reachable, the Redis
+script round trip.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rate limiter overhead benchmark")
+    parser.add_argument("--iterations", type=int, default=50_000)
+    parser.add_argument("--clients", type=int, default=1_000)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    from app.core.config import settings
+    from app.core.rate_limit import RateLimiter
+
+    route = f"{settings.api_v1_prefix}/ml/match-donors"
+
+    async def measure(label: str, limiter: RateLimiter, iterations: int) -> None:
+        started = time.perf_counter()
+        for i in range(iterations):
+            await limiter.hit(f"10.0.{i % args.clients // 256}.{i % 256}", route)
+        per_call = (time.perf_counter() - started) / iterations * 1e6
+        print(f"{label:<24}{per_call:>10.2f} us/request")
+
+    async def run() -> None:
+        local = RateLimiter("1000000/second", {route: "1000000/second"})
+        await measure("in-process", local, args.iterations)
+
+        remote = RateLimiter(
+            "1000000/second",
+            {route: "1000000/second"},
+            redis_url=settings.redis_url,
+            redis_timeout=0.5,
+        )
+        try:
+            await remote.redis.hit(remote.buckets_for("probe", route))
+        except Exception as exc:
+            print(f"{'redis':<24}{'skipped':>10} ({exc.__class__.__name__})")
+            return
+        await measure("redis", remote, min(args.iterations, 10_000))
+        await remote.redis.close()
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
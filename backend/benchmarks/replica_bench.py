@@ -0,0 +1,133 @@
+"""
+Read-replica routing check.
+
+Seeds the primary, then copies it to the replica (SQLite files only; with
+PostgreSQL, point --replica-url at a streaming replica). GET traffic is then
+sent through the API, and statements per engine are read back from the
+metrics registry. The run also checks the other two routing rules:
+
+- read-your-writes: a community created after the copy exists only on the
+  primary. The client that created it can read it, because its cookie routes
+  reads to the primary. A fresh client reads the stale replica.
+- fallback: with an unreachable --replica-url, every read succeeds on the
+  primary.
+
+    python -m benchmarks.replica_bench
+    python -m benchmarks.replica_bench --replica-url sqlite:////nonexistent/replica.db
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+from typing import Dict, List
+
+READ_PATHS = [
+    "/campaigns?limit=20",
+    "/campaigns/search?q=water",
+    "/communities?limit=20",
+    "/communities/priority?limit=10",
+    "/ml/dashboard-metrics",
+]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Read-replica routing check")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--replica-url", default="sqlite:///./benchmark_replica.db")
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["DATABASE_REPLICA_URL"] = args.replica_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("SCHEDULER_ENABLED", "false")
+    return asyncio.run(run(args))
+
+
+def _sqlite_path(url: str) -> str:
+    return url.split(":///", 1)[1] if url.startswith("sqlite:///") else ""
+
+
+def replicate(primary_url: str, replica_url: str) -> bool:
+    """Copy a SQLite primary onto the replica file; False if that is not possible."""
+    source, target = _sqlite_path(primary_url), _sqlite_path(replica_url)
+    if not source or not target or not os.path.isdir(os.path.dirname(os.path.abspath(target))):
+        return False
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+    return True
+
+
+def statements_by_engine() -> Dict[str, int]:
+    from app.core.metrics import metrics
+
+    counts = {"primary": 0, "replica": 0}
+    for (name, labels), value in metrics._counters.items():
+        if name == "db_statements_total":
+            counts[dict(labels)["engine"]] += int(value)
+    return counts
+
+
+async def run(args: argparse.Namespace) -> int:
+    import httpx
+    from app.core.config import settings
+    from app.core.database import engine, replica_engine
+    from app.main import app
+    from benchmarks.generate import generate, scale_counts
+
+    generate(engine, scale_counts(1_000))
+    replicated = replicate(args.database_url, args.replica_url)
+    # Connections opened before the copy would not see it
+    replica_engine.dispose()
+
+    api = settings.api_v1_prefix
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    failures = 0
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        before = statements_by_engine()
+        errors = 0
+        remaining = args.reads
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get(api + READ_PATHS[remaining % len(READ_PATHS)])
+                if response.status_code != 200:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        after = statements_by_engine()
+        primary = after["primary"] - before["primary"]
+        replica = after["replica"] - before["replica"]
+        print(f"{args.reads} GET requests: {replica} statements on the replica, "
+              f"{primary} on the primary, {errors} errors")
+        failures += errors > 0
+        if replicated and primary:
+            print("FAIL: reads reached the primary")
+            failures += 1
+        if not replicated and replica:
+            print("FAIL: reads reached an unreachable replica")
+            failures += 1
+
+        created = await client.post(f"{api}/communities", json={
+            "name": "Replica check", "country": "Burkina Faso", "region": "Centre",
+            "poverty_index": 0.5, "menstrual_health_score": 0.5, "school_enrollment_rate": 0.5,
+        })
+        community_id = created.json()["id"]
+        own = await client.get(f"{api}/communities/{community_id}")
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as fresh:
+            other = await fresh.get(f"{api}/communities/{community_id}")
+        print(f"read-your-writes: writer sees its community ({own.status_code}), "
+              f"another client sees the {'replica' if replicated else 'primary'} ({other.status_code})")
+        failures += own.status_code != 200
+        failures += other.status_code != (404 if replicated else 200)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
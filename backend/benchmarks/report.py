@@ -0,0 +1,88 @@
+"""Result summarisation and baseline comparison."""
+import json
+from typing import Any, Dict, List
+import numpy as np
+
+
+def summarize(
+    latencies: List[float],
+    wall_time: float,
+    queries: int,
+    errors: int
+) -> Dict[str, Any]:
+    """Summarize raw per-request latencies (seconds) for one scenario."""
+    samples = np.asarray(latencies, dtype=float) * 1000.0
+    count = len(latencies)
+    p50, p95, p99 = (
+        np.percentile(samples, [50, 95, 99]) if count else (0.0, 0.0, 0.0)
+    )
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(samples.mean()), 3) if count else 0.0,
+        "throughput_rps": round(count / wall_time, 2) if wall_time > 0 else 0.0,
+        "queries_per_request": round(queries / count, 2) if count else 0.0,
+    }
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float
+) -> List[str]:
+    """
+    Compare results against a baseline and return regression messages.
+    Latency may drift by `tolerance` (a fraction); query counts are deterministic
+    so any increase is reported.
+    """
+    regressions = []
+    current = results["endpoints"]
+    for name, base in baseline.get("endpoints", {}).items():
+        if name not in current:
+            continue
+        now = current[name]
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = base[metric] * (1 + tolerance)
+            if base[metric] > 0 and now[metric] > limit:
+                regressions.append(
+                    f"{name}: {metric} {now[metric]:.2f} > {limit:.2f} "
+                    f"(baseline {base[metric]:.2f})"
+                )
+        if now["queries_per_request"] > base["queries_per_request"]:
+            regressions.append(
+                f"{name}: queries_per_request {now['queries_per_request']} > "
+                f"baseline {base['queries_per_request']}"
+            )
+        if now["errors"] > base["errors"]:
+            regressions.append(
+                f"{name}: errors {now['errors']} > baseline {base['errors']}"
+            )
+    return regressions
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path: str, results: Dict[str, Any]) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def format_table(results: Dict[str, Any]) -> str:
+    """Render results as a fixed-width text table."""
+    header = (
+        f"{'endpoint':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'rps':>10}{'q/req':>8}{'err':>6}"
+    )
+    lines = [header, "-" * len(header)]
+    for name, r in sorted(results["endpoints"].items()):
+        lines.append(
+            f"{name:<28}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+            f"{r['throughput_rps']:>10.1f}{r['queries_per_request']:>8.1f}{r['errors']:>6}"
+        )
+    return "\n".join(lines)
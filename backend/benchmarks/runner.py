@@ -0,0 +1,160 @@
+"""
+Benchmark runner.
+
+Seeds a database, drives every API router through an in-process ASGI client
+and reports latency percentiles, throughput and SQL query counts per endpoint.
+
+    python -m benchmarks --scale 1k --concurrency 8 --output results.json \
+        --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="LaafiTech endpoint benchmarks")
+    parser.add_argument(
+        "--database-url",
+        default="sqlite:///./benchmark.db",
+        help="Database to seed and benchmark (SQLite or PostgreSQL)",
+    )
+    parser.add_argument("--scale", default="1k", help="1k, 100k, 1m or a donation count")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per endpoint")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse an already seeded database")
+    parser.add_argument("--only", nargs="*", help="Run only these scenario names")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed latency increase over baseline as a fraction",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Write results to --baseline instead of comparing",
+    )
+    return parser.parse_args(argv)
+
+
+async def _run_scenario(client, ctx, scenario, requests: int, concurrency: int, counter):
+    """Issue `requests` calls with `concurrency` workers; return a summary."""
+    from benchmarks.report import summarize
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            method, path, body = scenario.build(ctx)
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code not in scenario.expected_status:
+                errors += 1
+            elif scenario.check is not None and not scenario.check(response.json()):
+                errors += 1
+
+    counter["queries"] = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_time = time.perf_counter() - started
+    return summarize(latencies, wall_time, counter["queries"], errors)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    from sqlalchemy import event
+    from app.core.database import engine
+    from app.main import app
+    from benchmarks.seed import SCALES, scale_counts, seed_database
+    from benchmarks.scenarios import SCENARIOS, BenchContext
+
+    donations = SCALES.get(args.scale.lower()) or int(args.scale)
+    if args.skip_seed:
+        counts = scale_counts(donations)
+    else:
+        started = time.perf_counter()
+        counts = seed_database(engine, donations, seed=args.seed)
+        print(f"Seeded {counts} in {time.perf_counter() - started:.1f}s")
+
+    counter = {"queries": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    ctx = BenchContext(engine=engine, counts=counts, rng=random.Random(args.seed))
+    scenarios = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "database": engine.dialect.name,
+            "scale": args.scale,
+            "counts": counts,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+        },
+        "endpoints": {},
+    }
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for scenario in scenarios:
+            if scenario.setup:
+                scenario.setup(ctx, args.requests + args.warmup)
+            await _run_scenario(client, ctx, scenario, args.warmup, 1, counter)
+            summary = await _run_scenario(
+                client, ctx, scenario, args.requests, args.concurrency, counter
+            )
+            results["endpoints"][scenario.name] = summary
+
+    event.remove(engine, "before_cursor_execute", _count_query)
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Settings are read at import time, so configure them before importing app
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    # All benchmark traffic comes from one client address
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    from benchmarks.report import compare, format_table, load, save
+
+    results = asyncio.run(run(args))
+    print(format_table(results))
+    save(args.output, results)
+    print(f"Results written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    if args.save_baseline:
+        save(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Baseline {args.baseline} not found; run with --save-baseline first")
+        return 1
+
+    regressions = compare(results, load(args.baseline), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
@@ -0,0 +1,280 @@
+"""Request scenarios covering every router in app/api/v1/endpoints."""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.models.models import Campaign, CampaignStatus, Community
+
+API = settings.api_v1_prefix
+
+
+@dataclass
+class BenchContext:
+    """Shared state handed to scenario request builders."""
+    engine: Engine
+    counts: Dict[str, int]
+    rng: random.Random
+    pools: Dict[str, List[int]] = field(default_factory=dict)
+
+    def random_id(self, table: str) -> int:
+        return self.rng.randint(1, self.counts[table])
+
+    def pop_id(self, pool: str) -> int:
+        return self.pools[pool].pop()
+
+
+# A request builder returns (method, path, json_body)
+RequestBuilder = Callable[[BenchContext], Tuple[str, str, Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class Scenario:
+    """One benchmarked endpoint."""
+    name: str
+    build: RequestBuilder
+    setup: Optional[Callable[[BenchContext, int], None]] = None
+    expected_status: Tuple[int, ...] = (200,)
+    # Predicate on the JSON body; a response failing it counts as an error
+    check: Optional[Callable[[Any], bool]] = None
+
+
+def _campaign_payload(ctx: BenchContext) -> Dict[str, Any]:
+    start = datetime.utcnow()
+    return {
+        "title": f"Bench campaign {ctx.rng.randint(0, 10**9)}",
+        "description": "Benchmark campaign",
+        "story_title": "Benchmark story",
+        "story_narrative": "Benchmark narrative",
+        "goal_amount": 10000.0,
+        "beneficiary_count": 500,
+        "items_needed": {"pads": 3000},
+        "community_id": ctx.random_id("communities"),
+        "organization_id": ctx.random_id("organizations"),
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=60)).isoformat(),
+    }
+
+
+def _community_payload(ctx: BenchContext) -> Dict[str, Any]:
+    return {
+        "name": f"Bench community {ctx.rng.randint(0, 10**9)}",
+        "country": "Ghana",
+        "region": "Northern",
+        "population": 5000,
+        "girls_count": 900,
+        "poverty_index": 0.6,
+        "menstrual_health_score": 40.0,
+        "school_enrollment_rate": 0.7,
+    }
+
+
+def _make_drafts(pool: str) -> Callable[[BenchContext, int], None]:
+    """Setup hook inserting fresh DRAFT campaigns for destructive scenarios."""
+    def setup(ctx: BenchContext, n: int) -> None:
+        now = datetime.utcnow()
+        rows = [{
+            "title": f"{pool} {i}",
+            "description": "",
+            "community_id": ctx.random_id("communities"),
+            "organization_id": ctx.random_id("organizations"),
+            "status": CampaignStatus.DRAFT,
+            "goal_amount": 1000.0,
+            "current_amount": 0.0,
+            "story_title": "",
+            "story_narrative": "",
+            "start_date": now,
+            "end_date": now + timedelta(days=30),
+            "views": 0,
+            "shares": 0,
+            "created_at": now,
+            "updated_at": now,
+            "content_updated_at": now,
+        } for i in range(n)]
+        with ctx.engine.begin() as conn:
+            conn.execute(insert(Campaign), rows)
+            ids = conn.execute(
+                select(Campaign.id).where(Campaign.title.like(f"{pool} %"))
+            ).scalars().all()
+        ctx.pools[pool] = list(ids)
+    return setup
+
+
+def _make_communities(pool: str) -> Callable[[BenchContext, int], None]:
+    """Setup hook inserting throwaway communities for the delete scenario."""
+    def setup(ctx: BenchContext, n: int) -> None:
+        now = datetime.utcnow()
+        rows = [{
+            "name": f"{pool} {i}",
+            "country": "Ghana",
+            "region": "Northern",
+            "poverty_index": 0.5,
+            "menstrual_health_score": 50.0,
+            "data_quality_score": 0.5,
+            "created_at": now,
+            "updated_at": now,
+        } for i in range(n)]
+        with ctx.engine.begin() as conn:
+            conn.execute(insert(Community), rows)
+            ids = conn.execute(
+                select(Community.id).where(Community.name.like(f"{pool} %"))
+            ).scalars().all()
+        ctx.pools[pool] = list(ids)
+    return setup
+
+
+SCENARIOS: List[Scenario] = [
+    # campaigns
+    Scenario(
+        "campaigns.list",
+        lambda ctx: ("GET", f"{API}/campaigns?limit=100", None),
+    ),
+    Scenario(
+        "campaigns.list_active",
+        lambda ctx: ("GET", f"{API}/campaigns?status_filter=active&limit=100", None),
+    ),
+    Scenario(
+        "campaigns.search",
+        lambda ctx: ("GET", f"{API}/campaigns/search?q=campaign&limit=20", None),
+        check=lambda body: body["total"] > 0 and bool(body["results"]),
+    ),
+    Scenario(
+        "campaigns.batch",
+        lambda ctx: (
+            "GET",
+            f"{API}/campaigns/batch?ids="
+            + ",".join(str(ctx.random_id("campaigns")) for _ in range(20)),
+            None,
+        ),
+    ),
+    Scenario(
+        "campaigns.get",
+        lambda ctx: ("GET", f"{API}/campaigns/{ctx.random_id('campaigns')}", None),
+    ),
+    Scenario(
+        "campaigns.create",
+        lambda ctx: ("POST", f"{API}/campaigns", _campaign_payload(ctx)),
+        expected_status=(201,),
+    ),
+    Scenario(
+        "campaigns.update",
+        lambda ctx: (
+            "PUT",
+            f"{API}/campaigns/{ctx.random_id('campaigns')}",
+            {"description": "Updated by benchmark"},
+        ),
+    ),
+    Scenario(
+        "campaigns.publish",
+        lambda ctx: ("POST", f"{API}/campaigns/{ctx.pop_id('publish')}/publish", None),
+        setup=_make_drafts("publish"),
+    ),
+    Scenario(
+        "campaigns.delete",
+        lambda ctx: ("DELETE", f"{API}/campaigns/{ctx.pop_id('delete_campaign')}", None),
+        setup=_make_drafts("delete_campaign"),
+        expected_status=(204,),
+    ),
+    # communities
+    Scenario(
+        "communities.list",
+        lambda ctx: ("GET", f"{API}/communities?limit=100", None),
+    ),
+    Scenario(
+        "communities.list_country",
+        lambda ctx: ("GET", f"{API}/communities?country=Ghana&limit=100", None),
+    ),
+    Scenario(
+        "communities.priority",
+        lambda ctx: ("GET", f"{API}/communities/priority?country=Ghana&limit=10", None),
+    ),
+    Scenario(
+        "communities.get",
+        lambda ctx: ("GET", f"{API}/communities/{ctx.random_id('communities')}", None),
+    ),
+    Scenario(
+        "communities.create",
+        lambda ctx: ("POST", f"{API}/communities", _community_payload(ctx)),
+        expected_status=(201,),
+    ),
+    Scenario(
+        "communities.update",
+        lambda ctx: (
+            "PUT",
+            f"{API}/communities/{ctx.random_id('communities')}",
+            {"poverty_index": round(ctx.rng.random(), 3)},
+        ),
+    ),
+    Scenario(
+        "communities.delete",
+        lambda ctx: (
+            "DELETE", f"{API}/communities/{ctx.pop_id('delete_community')}", None
+        ),
+        setup=_make_communities("delete_community"),
+        expected_status=(204,),
+    ),
+    # ml
+    Scenario(
+        "ml.match_donors",
+        lambda ctx: (
+            "POST",
+            f"{API}/ml/match-donors",
+            {"donor_id": ctx.random_id("users"), "limit": 5},
+        ),
+    ),
+    Scenario(
+        "ml.predict_impact",
+        lambda ctx: (
+            "POST",
+            f"{API}/ml/predict-impact",
+            {
+                "campaign_id": ctx.random_id("campaigns"),
+                "current_funding": 2500.0,
+                "days_remaining": 30,
+            },
+        ),
+    ),
+    Scenario(
+        "ml.generate_story",
+        lambda ctx: (
+            "POST",
+            f"{API}/ml/generate-story",
+            {
+                "community_id": ctx.random_id("communities"),
+                "campaign_title": "Pads for Girls",
+                "goal_amount": 5000.0,
+                "tone": ctx.rng.choice(["inspirational", "urgent", "hopeful"]),
+            },
+        ),
+    ),
+    Scenario(
+        "ml.dashboard_metrics",
+        lambda ctx: ("GET", f"{API}/ml/dashboard-metrics", None),
+    ),
+    Scenario(
+        "ml.funding_forecast",
+        lambda ctx: ("GET", f"{API}/ml/funding-forecast/{ctx.random_id('campaigns')}", None),
+    ),
+    Scenario(
+        "ml.donation_trend",
+        lambda ctx: ("GET", f"{API}/ml/donation-trend?start=2024-01-01T00:00:00&interval=week", None),
+    ),
+    Scenario(
+        "ml.impact_totals",
+        lambda ctx: ("GET", f"{API}/ml/impact-totals?campaign_id={ctx.random_id('campaigns')}", None),
+    ),
+    Scenario(
+        "analytics.metrics",
+        lambda ctx: ("GET", f"{API}/analytics/metrics", None),
+    ),
+    Scenario(
+        "analytics.coverage",
+        lambda ctx: ("GET", f"{API}/analytics/coverage?group_by=region", None),
+    ),
+    Scenario(
+        "analytics.funding_trends",
+        lambda ctx: ("GET", f"{API}/analytics/funding-trends?start=2024-01-01T00:00:00&interval=week", None),
+    ),
+]
@@ -0,0 +1,20 @@
+"""Seed a benchmark database with synthetic data at a configurable scale."""
+from typing import Dict
+from sqlalchemy.engine import Engine
+from benchmarks.generate import generate, scale_counts
+
+# Number of donations per named scale; every other table is derived from it
+SCALES = {
+    "1k": 1_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+__all__ = ["SCALES", "scale_counts", "seed_database"]
+
+
+def seed_database(engine: Engine, donations: int, seed: int = 42) -> Dict[str, int]:
+    """Drop, recreate and populate all tables. Returns the row counts."""
+    counts = scale_counts(donations)
+    generate(engine, counts, seed=seed)
+    return counts
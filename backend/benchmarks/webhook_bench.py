@@ -0,0 +1,183 @@
+"""
+Payment webhook ingestion benchmark.
+
+Seeds a small database, then replays a burst of signed Stripe-style events
+from a local stand-in generator against /payments/webhook. The burst includes
+redeliveries, a second event type for some payments, and event types that
+create nothing. Reports ingest throughput, acknowledgement lag (request
+latency, which includes the wait for the batch commit), outcomes, the
+average batch size, and checks that every payment was stored exactly once.
+
+    python -m benchmarks.webhook_bench --events 5000 --concurrency 64
+    python -m benchmarks.webhook_bench --batch-size 1   # one commit per event
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+WEBHOOK_SECRET = "whsec_benchmark"
+
+
+class StripeEventGenerator:
+    """Produces signed webhook deliveries shaped like Stripe's."""
+
+    def __init__(self, campaign_ids: List[int], donor_ids: List[int], seed: int = 42,
+                 redelivery_rate: float = 0.1, checkout_rate: float = 0.3,
+                 noise_rate: float = 0.05):
+        self.random = random.Random(seed)
+        self.campaign_ids = campaign_ids
+        self.donor_ids = donor_ids
+        self.redelivery_rate = redelivery_rate
+        self.checkout_rate = checkout_rate
+        self.noise_rate = noise_rate
+        self.payments = 0
+        self._events = 0
+
+    def _event(self, event_type: str, payment: Dict) -> Dict:
+        self._events += 1
+        return {
+            "id": f"evt_bench_{self._events}",
+            "object": "event",
+            "type": event_type,
+            "created": int(time.time()),
+            "data": {"object": payment},
+        }
+
+    def deliveries(self, count: int) -> Iterator[Dict]:
+        """Yield `count` deliveries; redeliveries repeat an earlier event."""
+        sent: List[Dict] = []
+        while count > 0:
+            roll = self.random.random()
+            if sent and roll < self.redelivery_rate:
+                event = self.random.choice(sent)
+            elif roll < self.redelivery_rate + self.noise_rate:
+                event = self._event("payment_intent.created", {"id": "pi_pending"})
+            else:
+                self.payments += 1
+                intent = f"pi_bench_{self.payments}"
+                amount = self.random.choice([500, 1000, 2500, 5000, 10000])
+                metadata = {
+                    "campaign_id": str(self.random.choice(self.campaign_ids)),
+                    "donor_id": str(self.random.choice(self.donor_ids)),
+                }
+                event = self._event("payment_intent.succeeded", {
+                    "id": intent, "object": "payment_intent", "amount": amount,
+                    "amount_received": amount, "currency": "usd", "metadata": metadata,
+                })
+                if self.random.random() < self.checkout_rate:
+                    # The same payment, reported again by Checkout
+                    sent.append(self._event("checkout.session.completed", {
+                        "id": f"cs_bench_{self.payments}", "object": "checkout.session",
+                        "payment_intent": intent, "payment_status": "paid",
+                        "amount_total": amount, "currency": "usd", "metadata": metadata,
+                    }))
+            sent.append(event)
+            yield event
+            count -= 1
+
+
+def signed(event: Dict, secret: str) -> Tuple[bytes, Dict[str, str]]:
+    from app.services.payments import sign_payload
+
+    payload = json.dumps(event).encode()
+    return payload, {"stripe-signature": sign_payload(payload, secret),
+                     "content-type": "application/json"}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Payment webhook ingestion benchmark")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--flush-ms", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ["STRIPE_WEBHOOK_SECRET"] = WEBHOOK_SECRET
+    os.environ.setdefault("PAYMENT_WEBHOOK_MAX_PENDING", str(args.events))
+    if args.batch_size is not None:
+        os.environ["PAYMENT_WEBHOOK_BATCH_SIZE"] = str(args.batch_size)
+    if args.flush_ms is not None:
+        os.environ["PAYMENT_WEBHOOK_FLUSH_MS"] = str(args.flush_ms)
+    return asyncio.run(run(args))
+
+
+async def run(args: argparse.Namespace) -> int:
+    import httpx
+    from sqlalchemy import func, select
+    from app.core.config import settings
+    from app.core.database import engine
+    from app.core.metrics import metrics
+    from app.main import app
+    from app.models.models import Campaign, Donation, User
+    from app.services.payments import payment_ingestor
+    from benchmarks.generate import generate, scale_counts
+    from benchmarks.report import summarize
+
+    generate(engine, scale_counts(1_000), seed=args.seed)
+    with engine.connect() as conn:
+        campaign_ids = list(conn.scalars(select(Campaign.id)))
+        donor_ids = list(conn.scalars(select(User.id)))
+        donations_before = conn.scalar(select(func.count(Donation.id)))
+
+    generator = StripeEventGenerator(campaign_ids, donor_ids, seed=args.seed)
+    deliveries = [signed(event, WEBHOOK_SECRET) for event in generator.deliveries(args.events)]
+    url = f"{settings.api_v1_prefix}/payments/webhook"
+
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    errors = 0
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        pending = iter(deliveries)
+
+        async def worker():
+            nonlocal errors
+            for payload, headers in pending:
+                started = time.perf_counter()
+                response = await client.post(url, content=payload, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code == 200:
+                    outcomes[response.json()["outcome"]] += 1
+                else:
+                    errors += 1
+                    outcomes[str(response.status_code)] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+    await payment_ingestor.stop()
+
+    with engine.connect() as conn:
+        stored = conn.scalar(select(func.count(Donation.id))) - donations_before
+
+    summary = summarize(latencies, wall, 0, errors)
+    rendered = metrics.render()
+    batches = sum(
+        float(line.rsplit(" ", 1)[1]) for line in rendered.splitlines()
+        if line.startswith(f"{metrics.namespace}_payment_webhook_batches_total")
+    )
+    print(f"batch size={settings.payment_webhook_batch_size} "
+          f"flush={settings.payment_webhook_flush_ms:g}ms concurrency={args.concurrency}")
+    print(f"{len(deliveries):,} deliveries in {wall:.2f}s: "
+          f"{summary['throughput_rps']:.0f} events/s")
+    print(f"ack lag p50={summary['p50_ms']:.1f}ms p95={summary['p95_ms']:.1f}ms "
+          f"p99={summary['p99_ms']:.1f}ms")
+    print("outcomes: " + ", ".join(f"{k}={v}" for k, v in sorted(outcomes.items())))
+    if batches:
+        print(f"{batches:.0f} batches, {outcomes['created'] / batches:.1f} new donations/batch")
+    print(f"payments generated={generator.payments} stored={stored}")
+    return 0 if stored == generator.payments and not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
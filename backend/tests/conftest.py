@@ -0,0 +1,43 @@
+"""
+Shared fixtures: the app against a throwaway SQLite database seeded with
+the benchmark generator. Settings are read at import time, so the
+environment is set before anything from `app` is imported.
+"""
+import os
+import tempfile
+import pytest
+
+_TEST_DIR = tempfile.mkdtemp(prefix="period-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["COMMUNITY_CACHE_BACKEND"] = "local"
+# Keep saved models and archived donations out of the working tree
+os.environ["ML_MODELS_PATH"] = os.path.join(_TEST_DIR, "ml-models")
+os.environ["DONATION_ARCHIVE_PATH"] = os.path.join(_TEST_DIR, "archive")
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from app.core.database import engine
+    return engine
+
+
+@pytest.fixture(scope="session")
+def seeded(engine):
+    """Synthetic data at the 1k-donation scale; returns the row counts."""
+    from benchmarks.generate import generate, scale_counts
+
+    counts = scale_counts(1_000)
+    generate(engine, counts)
+    return counts
+
+
+@pytest.fixture(scope="session")
+def client(seeded):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,30 @@
+"""Incremental refresh of the analytics snapshot."""
+from datetime import datetime
+
+from app.core.database import SessionLocal
+from app.models.models import Donation
+from app.services.analytics import AnalyticsSnapshot
+
+
+def test_donation_completed_late_is_picked_up_incrementally(seeded):
+    snapshot = AnalyticsSnapshot(overlap_seconds=60.0, reload_seconds=3600.0)
+    snapshot.refresh(full=True)
+    db = SessionLocal()
+    try:
+        donation = Donation(
+            campaign_id=1, amount=7.0, status="pending",
+            created_at=datetime(2000, 1, 1)
+        )
+        db.add(donation)
+        db.commit()
+        assert donation.id not in set(snapshot.refresh().donations["id"])
+
+        donation.status = "completed"
+        db.commit()
+        ids = snapshot.refresh().donations["id"]
+        assert list(ids).count(donation.id) == 1
+        assert list(snapshot.refresh().donations["id"]).count(donation.id) == 1
+    finally:
+        db.delete(donation)
+        db.commit()
+        db.close()
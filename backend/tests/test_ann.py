@@ -0,0 +1,41 @@
+"""Campaign IVF index upkeep."""
+import numpy as np
+
+from app.core.database import SessionLocal
+from app.ml.ann import IVFIndex, _campaign_rows, _vectors, campaign_index
+from app.models.models import Campaign, CampaignStatus, Community
+
+
+def test_incremental_adds_retrain_the_lists():
+    rng = np.random.default_rng(0)
+    index = IVFIndex(dimensions=8).build([], np.zeros((0, 8)))
+    for item_id in range(2_500):
+        index.add(item_id, rng.normal(size=8))
+    assert len(index) == 2_500
+    assert not index.drifted()
+    assert len(index.centroids) >= 25
+
+    for item_id in range(2_400):
+        index.remove(item_id)
+    assert not index.drifted()
+    assert len(index.centroids) <= 20
+
+
+def test_community_update_reindexes_its_campaigns(seeded):
+    db = SessionLocal()
+    try:
+        campaign_index.ensure_ready(db)
+        campaign = db.query(Campaign).filter(
+            Campaign.status == CampaignStatus.ACTIVE, Campaign.community_id.isnot(None)
+        ).order_by(Campaign.id).first()
+        community = db.get(Community, campaign.community_id)
+        community.poverty_index = 1.0 - (community.poverty_index or 0.0)
+        db.commit()
+
+        expected = _vectors(_campaign_rows(db, [campaign.id]))[0]
+        index = campaign_index.index
+        label = index._list_of[campaign.id]
+        stored = index._vectors[label][index._ids[label] == campaign.id][0]
+        assert np.allclose(stored, expected)
+    finally:
+        db.close()
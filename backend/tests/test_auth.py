@@ -0,0 +1,69 @@
+"""Token refresh."""
+import pytest
+from fastapi import HTTPException
+
+from app.core.database import SessionLocal
+from app.core.security import create_access_token, verify_token_cached
+from app.models.models import User
+
+
+def _refresh(client, subject):
+    token = create_access_token({"sub": subject})
+    return client.post("/api/v1/auth/refresh", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_refresh_issues_token(client):
+    response = _refresh(client, "1")
+    assert response.status_code == 200
+    assert response.json()["access_token"]
+
+
+def test_refresh_rejects_non_numeric_subject(client):
+    assert _refresh(client, "not-a-user-id").status_code == 401
+
+
+def test_refresh_rejects_unknown_user(client):
+    assert _refresh(client, "999999").status_code == 401
+
+
+def test_logout_revokes_the_token(client):
+    token = create_access_token({"sub": "1"})
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/api/v1/auth/logout", headers=headers).status_code == 204
+    assert client.post("/api/v1/auth/refresh", headers=headers).status_code == 401
+    assert _refresh(client, "1").status_code == 200
+
+
+def test_disabling_a_user_revokes_their_tokens(client):
+    db = SessionLocal()
+    try:
+        user = db.query(User).order_by(User.id.desc()).first()
+        token = create_access_token({"sub": str(user.id)})
+        assert verify_token_cached(token)["sub"] == str(user.id)
+        user.is_active = False
+        db.commit()
+        with pytest.raises(HTTPException) as error:
+            verify_token_cached(token)
+        assert error.value.status_code == 401
+    finally:
+        user.is_active = True
+        db.commit()
+        db.close()
+
+
+def test_bulk_action_rejects_non_numeric_subject(client):
+    token = create_access_token({"sub": "not-a-user-id", "role": "admin"})
+    response = client.post(
+        "/api/v1/campaigns/bulk",
+        json={"campaign_ids": [1], "action": "pause"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 401
+
+
+def test_recommendations_reject_non_numeric_subject(client):
+    token = create_access_token({"sub": "not-a-user-id"})
+    response = client.get(
+        "/api/v1/ml/recommendations", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 401
@@ -0,0 +1,36 @@
+"""Community row cache."""
+import time
+
+from app.core.cache import ModelCache
+from app.core.database import SessionLocal
+from app.models.models import Community
+
+
+def test_replica_reads_are_cached_unless_recently_invalidated(seeded):
+    cache = ModelCache(Community, "test_replica", backend="local", replica_lag_seconds=60.0)
+    db = SessionLocal()
+    db.info["replica"] = True
+    try:
+        first, second = [row.id for row in db.query(Community.id).order_by(Community.id).limit(2)]
+        cache.get(db, first)
+        assert first in cache._entries
+
+        cache.invalidate([second])
+        cache.get(db, second)
+        assert second not in cache._entries
+    finally:
+        db.close()
+
+
+def test_publish_backs_off_while_redis_is_down():
+    cache = ModelCache(
+        Community, "test_publish", backend="redis",
+        redis_url="redis://127.0.0.1:6399/0", redis_timeout=0.05, retry_redis_after=60.0
+    )
+    cache.invalidate([1])
+    assert cache._publish_down_until > time.monotonic()
+
+    started = time.perf_counter()
+    for key in range(2, 50):
+        cache.invalidate([key])
+    assert time.perf_counter() - started < 0.05
@@ -0,0 +1,61 @@
+"""In-memory models kept current by Donation ORM events."""
+import pytest
+from app.core.database import SessionLocal
+from app.ml.collaborative import item_recommender
+from app.ml.features import donor_features
+from app.models.models import Donation, DonorProfile
+
+
+@pytest.fixture
+def db(seeded):
+    db = SessionLocal()
+    donor_features.load(db)
+    yield db
+    db.close()
+
+
+def _donor_id(db) -> int:
+    return db.query(DonorProfile.user_id).order_by(DonorProfile.user_id).first()[0]
+
+
+def test_donation_counted_once_on_transition_to_completed(db):
+    donor_id = _donor_id(db)
+    before = donor_features.get(donor_id).donation_count
+
+    donation = Donation(campaign_id=1, donor_id=donor_id, amount=10.0, status="pending")
+    db.add(donation)
+    db.commit()
+    assert donor_features.get(donor_id).donation_count == before
+
+    donation.status = "completed"
+    db.commit()
+    assert donor_features.get(donor_id).donation_count == before + 1
+
+    donation.amount = 20.0
+    db.commit()
+    donation.status = "completed"
+    db.commit()
+    assert donor_features.get(donor_id).donation_count == before + 1
+
+
+def test_completed_insert_counted(db):
+    donor_id = _donor_id(db)
+    before = donor_features.get(donor_id).donation_count
+    db.add(Donation(campaign_id=2, donor_id=donor_id, amount=5.0))
+    db.commit()
+    assert donor_features.get(donor_id).donation_count == before + 1
+
+
+def test_collaborative_model_sees_completed_donation(db, monkeypatch):
+    added = []
+    monkeypatch.setattr(item_recommender, "add_donation", lambda *pair: added.append(pair))
+    donor_id = _donor_id(db)
+
+    donation = Donation(campaign_id=3, donor_id=donor_id, amount=10.0, status="pending")
+    db.add(donation)
+    db.commit()
+    donation.status = "completed"
+    db.commit()
+    donation.amount = 15.0
+    db.commit()
+    assert added == [(donor_id, 3)]
@@ -0,0 +1,20 @@
+"""Funding forecast priors outside the leader's refresh job."""
+from app.core.database import SessionLocal
+from app.ml.forecast import funding_forecaster
+from app.services.forecasts import forecast_campaigns
+
+
+def test_priors_are_refit_once_stale(seeded, monkeypatch):
+    db = SessionLocal()
+    try:
+        monkeypatch.setattr(funding_forecaster, "priors_ttl", 3600.0)
+        forecast_campaigns(db, [1])
+        fitted_at = funding_forecaster.priors_fitted_at
+        forecast_campaigns(db, [1])
+        assert funding_forecaster.priors_fitted_at == fitted_at
+
+        monkeypatch.setattr(funding_forecaster, "priors_ttl", 0.0)
+        forecast_campaigns(db, [1])
+        assert funding_forecaster.priors_fitted_at > fitted_at
+    finally:
+        db.close()
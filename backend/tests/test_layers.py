@@ -0,0 +1,19 @@
+"""Module dependencies between layers."""
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_ml_does_not_import_services():
+    # A fresh interpreter, so modules the other tests loaded do not count
+    code = (
+        "import sys, app.ml.ann, app.ml.collaborative, app.ml.features, "
+        "app.ml.forecast, app.ml.predictor; "
+        "print(','.join(sorted(m for m in sys.modules if m.startswith('app.services'))))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=BACKEND
+    )
+    assert result.stdout.strip() == ""
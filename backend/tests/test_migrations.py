@@ -0,0 +1,77 @@
+"""Migrating a database created before the latest models."""
+import pytest
+from sqlalchemy import Index, create_engine, inspect, text
+from app.core.database import Base
+from app.core.migrations import MIGRATIONS, applied_versions, migrate
+
+
+@pytest.fixture
+def old_engine(tmp_path):
+    """A database with every migrated column and index removed, and a few rows."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for migration in MIGRATIONS:
+            for name in migration.indexes:
+                conn.execute(text(f"DROP INDEX {name}"))
+            for name in migration.columns:
+                table, column = name.split(".")
+                conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        conn.execute(text(
+            "INSERT INTO communities (id, name, country, region, poverty_index, girls_count) "
+            "VALUES (1, 'Old', 'Ghana', 'Northern', 0.8, 1200)"
+        ))
+        conn.execute(text(
+            "INSERT INTO campaigns (id, title, community_id, status, updated_at) "
+            "VALUES (1, 'Old', 1, 'ACTIVE', '2025-01-02 00:00:00')"
+        ))
+    return engine
+
+
+def test_migrate_adds_columns_and_indexes(old_engine):
+    assert migrate(old_engine) == [m.version for m in MIGRATIONS]
+    inspector = inspect(old_engine)
+    for migration in MIGRATIONS:
+        for name in migration.columns:
+            table, column = name.split(".")
+            assert column in {c["name"] for c in inspector.get_columns(table)}, name
+    indexes = {
+        index["name"] for table in inspector.get_table_names()
+        for index in inspector.get_indexes(table)
+    }
+    assert {name for m in MIGRATIONS for name in m.indexes} <= indexes
+
+    assert migrate(old_engine) == []
+    assert applied_versions(old_engine) == [m.version for m in MIGRATIONS]
+
+
+def test_migrate_backfills(old_engine):
+    migrate(old_engine)
+    with old_engine.connect() as conn:
+        campaign = conn.execute(text("SELECT updated_at, content_updated_at FROM campaigns")).one()
+        community = conn.execute(text("SELECT need_score, need_score_key FROM communities")).one()
+    assert campaign.content_updated_at == campaign.updated_at
+    assert 0 < community.need_score <= 1
+    assert community.need_score_key is not None
+
+
+def test_every_declared_index_is_migrated():
+    declared = {
+        item.name for mapper in Base.registry.mappers
+        for item in getattr(mapper.class_, "__table_args__", ())
+        if isinstance(item, Index)
+    }
+    assert declared <= {name for m in MIGRATIONS for name in m.indexes}
+
+
+def test_migrate_removes_duplicate_matches(old_engine):
+    with old_engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO matching_records (id, donor_id, campaign_id, match_score, status) VALUES "
+            "(1, 7, 1, 0.5, 'pending'), (2, 7, 1, 0.6, 'accepted'), (3, 7, 1, 0.7, 'pending'), "
+            "(4, 8, 1, 0.5, 'pending'), (5, 8, 1, 0.6, 'pending')"
+        ))
+    migrate(old_engine)
+    with old_engine.connect() as conn:
+        kept = conn.execute(text("SELECT id FROM matching_records ORDER BY id")).scalars().all()
+    assert kept == [2, 4]
@@ -0,0 +1,9 @@
+"""Per-route statement time budgets."""
+from app.core.overload import statement_timeouts
+from app.main import app
+
+
+def test_every_budgeted_route_exists():
+    paths = {getattr(route, "path", None) for route in app.routes}
+    assert statement_timeouts.routes
+    assert set(statement_timeouts.routes) <= paths
@@ -0,0 +1,79 @@
+"""
+Statement budgets for the hot read endpoints. A failure lists the
+statements executed, grouped, so an N+1 shows up as one repeated query.
+"""
+import pytest
+from app.core.profiling import assert_max_queries
+
+
+@pytest.fixture
+def community_cache():
+    from app.core.cache import community_cache
+
+    community_cache.invalidate_all()
+    yield community_cache
+    community_cache.invalidate_all()
+
+
+def test_list_campaigns(client, seeded):
+    response = assert_max_queries(client, 1, "GET", "/api/v1/campaigns")
+    assert response.status_code == 200
+    assert len(response.json()) == seeded["campaigns"]
+
+
+def test_list_campaigns_by_ids(client):
+    response = assert_max_queries(client, 1, "GET", "/api/v1/campaigns?ids=3,1,2")
+    assert response.status_code == 200
+    assert [campaign["id"] for campaign in response.json()] == [3, 1, 2]
+
+
+def test_get_campaign(client):
+    # Load, count the view, reload after commit
+    response = assert_max_queries(client, 3, "GET", "/api/v1/campaigns/1")
+    assert response.status_code == 200
+    assert response.json()["id"] == 1
+
+
+def test_batch_campaigns_with_communities(client):
+    response = assert_max_queries(client, 1, "GET", "/api/v1/campaigns/batch?ids=1,2,3,4,5")
+    assert response.status_code == 200
+    body = response.json()
+    assert [campaign["id"] for campaign in body] == [1, 2, 3, 4, 5]
+    assert all(campaign["community"]["id"] == campaign["community_id"] for campaign in body)
+
+
+def test_list_communities(client, seeded):
+    response = assert_max_queries(client, 1, "GET", "/api/v1/communities")
+    assert response.status_code == 200
+    assert len(response.json()) == seeded["communities"]
+
+
+def test_list_communities_by_ids(client):
+    response = assert_max_queries(client, 1, "GET", "/api/v1/communities?ids=2,1")
+    assert response.status_code == 200
+    assert [community["id"] for community in response.json()] == [2, 1]
+
+
+def test_get_community_cached(client, community_cache):
+    response = assert_max_queries(client, 1, "GET", "/api/v1/communities/1")
+    assert response.status_code == 200
+    response = assert_max_queries(client, 0, "GET", "/api/v1/communities/1")
+    assert response.json()["id"] == 1
+
+
+def test_failed_statement_leaves_no_timing_behind(engine):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app.core.metrics import RequestStats, _current_request, instrument_engine
+
+    instrument_engine(engine)
+    stats = RequestStats()
+    token = _current_request.set(stats)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            assert not conn.info.get("laafitech_query_start")
+    finally:
+        _current_request.reset(token)
+    assert stats.queries == 1
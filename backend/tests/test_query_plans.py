@@ -0,0 +1,23 @@
+"""
+benchmarks/plan_check over every scenario: no request may read a table of
+1,000 rows or more without an index. It seeds its own database, at a scale
+where donations and users are well past that size.
+"""
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_no_unindexed_scans(tmp_path):
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.plan_check",
+            "--database-url", f"sqlite:///{tmp_path / 'plans.db'}",
+            "--scale", "50000",
+        ],
+        capture_output=True, text=True, cwd=BACKEND,
+        env={**os.environ, "ML_MODELS_PATH": str(tmp_path / "ml-models")},
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,30 @@
+"""Incremental recommendation refresh."""
+from app.core.database import SessionLocal
+from app.models.models import Campaign, CampaignStatus
+from app.services.recommendations import recommendation_service
+
+
+def _refresh(full=False):
+    db = SessionLocal()
+    try:
+        return recommendation_service.refresh(db, full=full)
+    finally:
+        db.close()
+
+
+def test_views_and_counters_do_not_mark_campaigns_changed(client):
+    db = SessionLocal()
+    try:
+        campaign_id = db.query(Campaign.id).filter(
+            Campaign.status == CampaignStatus.ACTIVE
+        ).order_by(Campaign.id).first()[0]
+    finally:
+        db.close()
+    _refresh(full=True)
+
+    assert client.get(f"/api/v1/campaigns/{campaign_id}").status_code == 200
+    assert _refresh()["changed_campaigns"] == 0
+
+    response = client.put(f"/api/v1/campaigns/{campaign_id}", json={"goal_amount": 12345.0})
+    assert response.status_code == 200
+    assert _refresh()["changed_campaigns"] == 1
@@ -0,0 +1,68 @@
+"""Scheduler leader lock fallback."""
+import asyncio
+import logging
+from app.core.database import SessionLocal, engine
+from app.core.scheduler import LocalLeaderLock, Scheduler, create_fallback_lock
+
+
+class UnreachableLock:
+    def __init__(self):
+        self.attempts = 0
+
+    async def acquire(self) -> bool:
+        self.attempts += 1
+        raise ConnectionError("connection refused")
+
+    async def release(self) -> None:
+        return None
+
+
+def _run(scheduler: Scheduler, ticks: int) -> None:
+    async def main():
+        await scheduler.start()
+        await asyncio.sleep(scheduler.tick * ticks)
+        await scheduler.stop()
+    asyncio.run(main())
+
+
+def test_falls_back_when_lock_unreachable_at_start(seeded):
+    runs = []
+    scheduler = Scheduler(SessionLocal, UnreachableLock(), tick_seconds=0.01,
+                          fallback_lock=LocalLeaderLock())
+    scheduler.add_job("probe", lambda db: runs.append(1), interval=3600)
+    _run(scheduler, 20)
+    assert isinstance(scheduler.lock, LocalLeaderLock)
+    assert runs == [1]
+
+
+def test_stays_follower_without_fallback(seeded):
+    runs = []
+    lock = UnreachableLock()
+    scheduler = Scheduler(SessionLocal, lock, tick_seconds=0.01)
+    scheduler.add_job("probe", lambda db: runs.append(1), interval=3600)
+    _run(scheduler, 20)
+    assert scheduler.lock is lock
+    assert lock.attempts > 1
+    assert not scheduler.is_leader
+    assert runs == []
+
+
+def test_no_local_fallback_off_postgresql():
+    assert create_fallback_lock(engine) is None
+
+
+def test_lock_lost_later_is_logged_once(caplog):
+    lock = UnreachableLock()
+    scheduler = Scheduler(SessionLocal, LocalLeaderLock(), tick_seconds=0.01)
+
+    async def main():
+        await scheduler.start()
+        scheduler.lock = lock
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+
+    with caplog.at_level(logging.WARNING, logger="app.core.scheduler"):
+        asyncio.run(main())
+    assert lock.attempts > 1
+    assert not scheduler.is_leader
+    assert sum("lock unavailable" in r.message for r in caplog.records) == 1
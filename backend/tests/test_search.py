@@ -0,0 +1,25 @@
+"""Campaign full-text index kept in step with campaigns."""
+from sqlalchemy import text
+from app.services.search import SQLITE_TRIGGERS, campaign_search
+
+
+def _search_total(client, query="campaign"):
+    response = client.get(f"/api/v1/campaigns/search?q={query}")
+    assert response.status_code == 200
+    return response.json()["total"]
+
+
+def test_generated_campaigns_are_searchable(client, seeded):
+    assert _search_total(client) == seeded["campaigns"]
+
+
+def test_setup_rebuilds_after_writes_without_triggers(client, engine, seeded):
+    with engine.begin() as conn:
+        for name in SQLITE_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER {name}"))
+        conn.execute(text("UPDATE campaigns SET title = 'Zanzibar kits' WHERE id = 1"))
+    assert _search_total(client, "zanzibar") == 0
+
+    campaign_search.setup(engine)
+    assert _search_total(client, "zanzibar") == 1
+    assert _search_total(client) == seeded["campaigns"] - 1
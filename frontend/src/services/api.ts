@@ -45,10 +45,11 @@ export const donorAPI = {
 };
 
 // Analytics API
+// Filters: start, end, country, region, community_id, campaign_id
 export const analyticsAPI = {
-  getDashboardMetrics: () => api.get('/analytics/metrics'),
-  getCommunityCoverage: () => api.get('/analytics/coverage'),
-  getFundingTrends: () => api.get('/analytics/funding-trends'),
+  getDashboardMetrics: (params?: any) => api.get('/analytics/metrics', { params }),
+  getCommunityCoverage: (params?: any) => api.get('/analytics/coverage', { params }),
+  getFundingTrends: (params?: any) => api.get('/analytics/funding-trends', { params }),
 };
 
 // ML API